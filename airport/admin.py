@@ -10,6 +10,7 @@ from airport.models import (
     Order,
     Ticket,
     Payment,
+    Refund,
 )
 
 
@@ -66,4 +67,10 @@ class PaymentAdmin(admin.ModelAdmin):
     list_display = ("order", "status_payment", "date_payment")
 
 
+@admin.register(Refund)
+class RefundAdmin(admin.ModelAdmin):
+    list_display = ("payment", "amount", "status", "attempts", "created_at")
+    list_filter = ("status",)
+
+
 admin.site.register(AirplaneType)
@@ -0,0 +1,173 @@
+"""
+Crews of many flights set at once.
+
+Every assignment replaces the crews of its flight. They are validated
+together, against each other and the other flights of the crews, then
+the links of the flights are diffed with the requested ones and the
+differences inserted and deleted in bulk, all in one transaction.
+"""
+from django.db import transaction
+from rest_framework.exceptions import ValidationError
+
+from airport.duty import FlightChange, change_violations, violation_message
+from airport.models import Crew, Flight
+from airport.scheduling import (
+    FlightCrew,
+    IntervalIndex,
+    crew_conflict_message,
+    crew_flight_rows,
+    schedule_integrity_errors,
+)
+
+MAX_ASSIGNMENTS = 1000
+
+
+def does_not_exist(pk):
+    return f'Invalid pk "{pk}" - object does not exist.'
+
+
+def reference_errors(assignments, flights, crews):
+    """Errors of the unknown flights and crews, by assignment"""
+    errors = [{} for _ in assignments]
+    seen = set()
+
+    for error, assignment in zip(errors, assignments):
+        flight_id = assignment["flight"]
+
+        if flight_id not in flights:
+            error["flight"] = [does_not_exist(flight_id)]
+        elif flights[flight_id].cancelled_at is not None:
+            error["flight"] = ["The flight is cancelled."]
+        elif flight_id in seen:
+            error["flight"] = ["The flight is assigned more than once."]
+        seen.add(flight_id)
+
+        unknown = [pk for pk in assignment["crews"] if pk not in crews]
+        if unknown:
+            error["crews"] = [does_not_exist(pk) for pk in unknown]
+
+    return errors
+
+
+def schedule_errors(assignments, flights, crews):
+    """Errors of the crews flying overlapping flights, by assignment"""
+    errors = [{} for _ in assignments]
+    flight_ids = [assignment["flight"] for assignment in assignments]
+
+    # The other flights of the crews, then the assigned ones
+    rows = list(crew_flight_rows(list(crews), exclude_flights=flight_ids))
+    rows.extend(
+        (
+            crew_id,
+            flights[assignment["flight"]].departure_time,
+            flights[assignment["flight"]].arrival_time,
+            assignment["flight"],
+        )
+        for assignment in assignments
+        for crew_id in assignment["crews"]
+    )
+    index = IntervalIndex(rows)
+
+    for error, assignment in zip(errors, assignments):
+        flight = flights[assignment["flight"]]
+
+        for crew_id in assignment["crews"]:
+            overlapping = [
+                value
+                for _, _, value in index.overlapping(
+                    crew_id, flight.departure_time, flight.arrival_time
+                )
+                if value != flight.id
+            ]
+            if overlapping:
+                error.setdefault("crews", []).append(
+                    crew_conflict_message(crew_id, overlapping)
+                )
+
+    violations = change_violations(
+        [
+            FlightChange(
+                assignment["flight"],
+                flights[assignment["flight"]].departure_time,
+                flights[assignment["flight"]].arrival_time,
+                [
+                    (crew_id, crews[crew_id].position)
+                    for crew_id in assignment["crews"]
+                ],
+            )
+            for assignment in assignments
+        ]
+    )
+    errors_of_flights = dict(zip(flight_ids, errors))
+    for violation in violations:
+        for flight_id in set(violation["flights"]):
+            if flight_id in errors_of_flights:
+                errors_of_flights[flight_id].setdefault("crews", []).append(
+                    violation_message(violation)
+                )
+
+    return errors
+
+
+def raise_errors(errors):
+    if any(errors):
+        raise ValidationError({"assignments": errors})
+
+
+def assign_crews(assignments):
+    """
+    Replace the crews of the flights of the assignments, a list of
+    {"flight": id, "crews": [id, ...]}, and return what changed per flight
+    """
+    assignments = [
+        {"flight": item["flight"], "crews": list(dict.fromkeys(item["crews"]))}
+        for item in assignments
+    ]
+    flight_ids = [assignment["flight"] for assignment in assignments]
+    crew_ids = {crew_id for item in assignments for crew_id in item["crews"]}
+
+    with schedule_integrity_errors(), transaction.atomic():
+        # Locked, so their times can't change until the links are written
+        flights = Flight.objects.select_for_update().in_bulk(flight_ids)
+        crews = Crew.objects.only("id", "position").in_bulk(crew_ids)
+
+        raise_errors(reference_errors(assignments, flights, crews))
+        raise_errors(schedule_errors(assignments, flights, crews))
+
+        wanted = {
+            (assignment["flight"], crew_id)
+            for assignment in assignments
+            for crew_id in assignment["crews"]
+        }
+        existing = {
+            (flight_id, crew_id): pk
+            for pk, flight_id, crew_id in FlightCrew.objects.filter(
+                flight_id__in=flight_ids
+            ).values_list("id", "flight_id", "crew_id")
+        }
+        removed = sorted(set(existing) - wanted)
+        added = sorted(wanted - set(existing))
+
+        FlightCrew.objects.filter(
+            id__in=[existing[link] for link in removed]
+        ).delete()
+        FlightCrew.objects.bulk_create(
+            FlightCrew(flight_id=flight_id, crew_id=crew_id)
+            for flight_id, crew_id in added
+        )
+
+    changes = {flight_id: ([], []) for flight_id in flight_ids}
+    for flight_id, crew_id in added:
+        changes[flight_id][0].append(crew_id)
+    for flight_id, crew_id in removed:
+        changes[flight_id][1].append(crew_id)
+
+    return [
+        {
+            "flight": assignment["flight"],
+            "crews": assignment["crews"],
+            "added": changes[assignment["flight"]][0],
+            "removed": changes[assignment["flight"]][1],
+        }
+        for assignment in assignments
+    ]
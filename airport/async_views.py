@@ -0,0 +1,257 @@
+"""
+Async read endpoints for flights, served by an ASGI server.
+
+They return the same JSON as the flight viewset and only read plain
+column values, so a request waiting on the database or on a slow client
+does not occupy a worker thread. The authentication, permission and
+throttle checks of the viewset still run first, in a thread as they
+read the cache and the users table synchronously.
+"""
+from asgiref.sync import sync_to_async
+from django.http import JsonResponse, HttpResponseNotAllowed
+from rest_framework.exceptions import APIException
+from rest_framework.permissions import SAFE_METHODS
+from rest_framework.utils.urls import replace_query_param, remove_query_param
+
+from airport.models import Flight, Crew, Ticket
+from airport.serializers import ValuesSerializer, FlightListValuesSerializer
+from airport.views import (
+    ApiPagination,
+    FlightViewSet,
+    annotate_tickets_available,
+    filter_flights,
+)
+
+FLIGHT_VALUES = (
+    "id",
+    "airplane_id",
+    "airplane__name",
+    "airplane__airplane_type__name",
+    "airplane__image",
+    "airplane__image_variants",
+    "airplane__rows",
+    "airplane__seats_in_row",
+    "route_id",
+    "route__source_id",
+    "route__source__name",
+    "route__source__closest_big_city",
+    "route__destination_id",
+    "route__destination__name",
+    "route__destination__closest_big_city",
+    "route__distance",
+    "departure_time",
+    "arrival_time",
+    "cancelled_at",
+)
+
+
+def _check_request(request, action):
+    """
+    Run the checks of the `action` of the flight viewset on the request,
+    returns the error response of the first failing one or None
+    """
+    view = FlightViewSet(
+        action_map={"get": action, "head": action},
+        args=(),
+        kwargs={},
+        headers={},
+    )
+    view.request = view.initialize_request(request)
+
+    try:
+        view.initial(view.request)
+    except APIException as exc:
+        error = view.handle_exception(exc)
+        response = JsonResponse(error.data, status=error.status_code)
+        # Retry-After of the throttles, WWW-Authenticate of a bad token
+        for header, value in error.items():
+            response[header] = value
+
+        return response
+
+    return None
+
+
+check_request = sync_to_async(_check_request)
+
+
+def _not_found(detail="Not found."):
+    return JsonResponse({"detail": detail}, status=404)
+
+
+def _page_number(request):
+    try:
+        page = int(request.GET.get(ApiPagination.page_query_param, 1))
+    except ValueError:
+        return None
+
+    return page if page >= 1 else None
+
+
+def _page_link(request, page, count):
+    url = request.build_absolute_uri()
+
+    if page < 1 or (page - 1) * ApiPagination.page_size >= count:
+        return None
+
+    if page == 1:
+        return remove_query_param(url, ApiPagination.page_query_param)
+
+    return replace_query_param(url, ApiPagination.page_query_param, page)
+
+
+async def flight_list(request):
+    """Paginated list of flights, filtered as /flights/ is"""
+    if request.method not in SAFE_METHODS:
+        return HttpResponseNotAllowed(SAFE_METHODS)
+
+    error = await check_request(request, "list")
+    if error is not None:
+        return error
+
+    page = _page_number(request)
+    page_size = ApiPagination.page_size
+    queryset = filter_flights(
+        annotate_tickets_available(Flight.objects), request.GET
+    ).order_by("id")
+
+    if page is None:
+        return _not_found("Invalid page.")
+
+    count = await queryset.acount()
+
+    if page > 1 and (page - 1) * page_size >= count:
+        return _not_found("Invalid page.")
+
+    offset = (page - 1) * page_size
+    serializer = FlightListValuesSerializer(context={"request": request})
+    rows = serializer.values_queryset(queryset)[offset:offset + page_size]
+
+    return JsonResponse(
+        {
+            "count": count,
+            "next": _page_link(request, page + 1, count),
+            "previous": _page_link(request, page - 1, count),
+            "results": [
+                serializer.to_representation(row) async for row in rows
+            ],
+        }
+    )
+
+
+async def flight_detail(request, pk: int):
+    """Flight with its airplane, route, crews and taken places"""
+    if request.method not in SAFE_METHODS:
+        return HttpResponseNotAllowed(SAFE_METHODS)
+
+    error = await check_request(request, "retrieve")
+    if error is not None:
+        return error
+
+    try:
+        flight = await Flight.objects.values(*FLIGHT_VALUES).aget(pk=pk)
+    except Flight.DoesNotExist:
+        return _not_found()
+
+    serializer = ValuesSerializer(context={"request": request})
+
+    crews = Crew.objects.filter(flight__id=pk).values(
+        "id", "position", "first_name", "last_name"
+    )
+    taken_places = Ticket.objects.filter(
+        flight_id=pk, cancelled_at__isnull=True
+    ).values("row", "seat")
+
+    return JsonResponse(
+        {
+            "id": flight["id"],
+            "airplane": {
+                "id": flight["airplane_id"],
+                "name": flight["airplane__name"],
+                "airplane_type_name": (
+                    flight["airplane__airplane_type__name"]
+                ),
+                "image": serializer.file_url(flight["airplane__image"]),
+                "image_variants": serializer.image_variant_urls(
+                    flight["airplane__image_variants"]
+                ),
+                "rows": flight["airplane__rows"],
+                "seats_in_row": flight["airplane__seats_in_row"],
+                "capacity": (
+                    flight["airplane__rows"]
+                    * flight["airplane__seats_in_row"]
+                ),
+            },
+            "crews": [
+                {
+                    "id": crew["id"],
+                    "position": crew["position"],
+                    "full_name": f"{crew['first_name']} {crew['last_name']}",
+                }
+                async for crew in crews
+            ],
+            "route": {
+                "id": flight["route_id"],
+                "source": {
+                    "id": flight["route__source_id"],
+                    "name": flight["route__source__name"],
+                    "closest_big_city": (
+                        flight["route__source__closest_big_city"]
+                    ),
+                },
+                "destination": {
+                    "id": flight["route__destination_id"],
+                    "name": flight["route__destination__name"],
+                    "closest_big_city": (
+                        flight["route__destination__closest_big_city"]
+                    ),
+                },
+                "distance": flight["route__distance"],
+            },
+            "departure_time": serializer.format_datetime(
+                flight["departure_time"]
+            ),
+            "arrival_time": serializer.format_datetime(flight["arrival_time"]),
+            "cancelled_at": serializer.format_datetime(
+                flight["cancelled_at"]
+            ),
+            "taken_places": [place async for place in taken_places],
+        }
+    )
+
+
+async def flight_seats(request, pk: int):
+    """Seat map of a flight: its layout, taken places and free seats"""
+    if request.method not in SAFE_METHODS:
+        return HttpResponseNotAllowed(SAFE_METHODS)
+
+    error = await check_request(request, "retrieve")
+    if error is not None:
+        return error
+
+    try:
+        airplane = await Flight.objects.values(
+            "airplane__rows", "airplane__seats_in_row"
+        ).aget(pk=pk)
+    except Flight.DoesNotExist:
+        return _not_found()
+
+    rows = airplane["airplane__rows"]
+    seats_in_row = airplane["airplane__seats_in_row"]
+    taken_places = [
+        place async for place in
+        Ticket.objects.filter(
+            flight_id=pk, cancelled_at__isnull=True
+        ).values("row", "seat")
+    ]
+
+    return JsonResponse(
+        {
+            "flight": pk,
+            "rows": rows,
+            "seats_in_row": seats_in_row,
+            "capacity": rows * seats_in_row,
+            "tickets_available": rows * seats_in_row - len(taken_places),
+            "taken_places": taken_places,
+        }
+    )
@@ -0,0 +1,371 @@
+"""
+Cancellation of flights, orders and tickets, and the refunds it owes.
+
+Nothing is deleted, so the tickets, orders and payments keep their
+history. The cancelled tickets release their seats, the orders left
+without tickets are cancelled, the payments that were paid get a pending
+`Refund` of the cancelled tickets and the unpaid ones are repriced to
+what is left of their order, with their open checkout sessions expired
+(a session paid anyway is refunded by `record_payment`). Every step is
+one statement over all the rows involved, so cancelling a full flight
+costs the same few queries as an empty one.
+
+The refunds are sent to Stripe later by the `process_refunds` command,
+with the refund id as idempotency key so a retry can't pay twice.
+
+A seat has at most one active ticket, enforced by a partial unique
+constraint, so a released seat can be sold again once its cancellation
+is committed. Until then the constraint validation of `Ticket.save()`
+still sees the active ticket and the order gets a 400 at once. An order
+inserting a ticket on a seat another uncommitted order inserted waits
+for that order on the unique index, and gets a 400 from
+`taken_seat_errors` if it commits.
+"""
+import logging
+from contextlib import contextmanager
+from decimal import Decimal
+
+import stripe
+from django.conf import settings
+from django.core.exceptions import NON_FIELD_ERRORS
+from django.core.exceptions import ValidationError as DjangoValidationError
+from django.db import IntegrityError, transaction
+from django.db.models import (
+    CharField,
+    DecimalField,
+    Exists,
+    ExpressionWrapper,
+    F,
+    OuterRef,
+    Q,
+    Subquery,
+    Sum,
+    Value,
+)
+from django.db.models.functions import Cast, Coalesce, Length
+from django.utils import timezone
+from rest_framework.exceptions import NotFound, ValidationError
+
+from airport.models import Flight, Order, Payment, Refund, Ticket
+from airport.scheduling import FlightCrew
+
+logger = logging.getLogger(__name__)
+
+# SQLSTATE of the error raised by the seat constraint
+UNIQUE_VIOLATION = "23505"
+
+SEAT_TAKEN = "This seat of the flight is already taken."
+
+# Statuses of the payments whose money was received
+CAPTURED = (Payment.PAID, Payment.REFUND_PENDING, Payment.REFUNDED)
+
+MONEY = DecimalField(max_digits=10, decimal_places=2)
+
+
+def ticket_cost():
+    """Ticket.get_cost() as an expression"""
+    return ExpressionWrapper(
+        F("price") * Length(Cast("seat", CharField())), output_field=MONEY
+    )
+
+
+def active_cost(order):
+    """Cost of the tickets left in `order`, an OuterRef"""
+    costs = (
+        Ticket.objects.filter(order=order, cancelled_at__isnull=True)
+        .order_by()
+        .values("order")
+        .annotate(total=Sum(ticket_cost()))
+        .values("total")
+    )
+
+    return Coalesce(
+        Subquery(costs, output_field=MONEY),
+        Value(Decimal(0)),
+        output_field=MONEY,
+    )
+
+
+def expire_checkout_sessions(session_ids):
+    """Close the Stripe checkout sessions, so they can't be paid anymore"""
+    for session_id in session_ids:
+        try:
+            stripe.checkout.Session.expire(
+                session_id, api_key=settings.STRIPE_SECRET_KEY
+            )
+        except stripe.error.StripeError:
+            # Already completed or expired, a late payment is refunded
+            # by `record_payment`
+            logger.exception("Checkout session %s not expired", session_id)
+
+
+def release_tickets(tickets, reason, now=None):
+    """
+    Cancel the active tickets of the `tickets` queryset, cancel the
+    orders left empty and queue the refunds of their paid payments.
+    Returns how many tickets, orders and refunds it touched.
+    """
+    now = now or timezone.now()
+
+    released = tickets.filter(cancelled_at__isnull=True).update(
+        cancelled_at=now
+    )
+    if not released:
+        return {"tickets_released": 0, "orders_cancelled": 0, "refunds": []}
+
+    # Read back by their cancellation time, exactly the released ones
+    costs = dict(
+        tickets.filter(cancelled_at=now)
+        .order_by()
+        .values_list("order_id")
+        .annotate(total=Sum(ticket_cost()))
+    )
+
+    orders_cancelled = (
+        Order.objects.filter(pk__in=costs, cancelled_at__isnull=True)
+        .filter(
+            ~Exists(
+                Ticket.objects.filter(
+                    order=OuterRef("pk"), cancelled_at__isnull=True
+                )
+            )
+        )
+        .update(cancelled_at=now)
+    )
+
+    payments = Payment.objects.filter(order_id__in=costs)
+    refunds = []
+    owed = dict(costs)
+    # An order can have several payments, each refunds what it can
+    for order_id, payment_id, amount, refunded in (
+        payments.filter(status_payment__in=CAPTURED)
+        .order_by("id")
+        .annotate(
+            refunded=Coalesce(
+                Sum(
+                    "refunds__amount",
+                    filter=~Q(refunds__status=Refund.FAILED),
+                ),
+                Decimal(0),
+            )
+        )
+        .values_list("order_id", "id", "amount", "refunded")
+    ):
+        share = owed[order_id]
+        if amount is not None:
+            share = min(share, amount - refunded)
+        if share > 0:
+            owed[order_id] -= share
+            refunds.append(
+                Refund(payment_id=payment_id, amount=share, reason=reason)
+            )
+
+    Refund.objects.bulk_create(refunds)
+    Payment.objects.filter(
+        pk__in=[refund.payment_id for refund in refunds]
+    ).update(status_payment=Payment.REFUND_PENDING)
+
+    # Their checkout sessions were opened for the former amount, they are
+    # expired once the cancellation is committed
+    unpaid = payments.exclude(status_payment__in=CAPTURED)
+    open_sessions = list(
+        unpaid.exclude(session_id="")
+        .filter(session_expires_at__gt=now)
+        .values_list("session_id", flat=True)
+    )
+    unpaid.update(
+        amount=active_cost(OuterRef("order")),
+        session_url="",
+        session_expires_at=None,
+    )
+    unpaid.filter(order__cancelled_at__isnull=False).update(
+        status_payment=Payment.CANCELLED
+    )
+    if open_sessions:
+        transaction.on_commit(
+            lambda: expire_checkout_sessions(open_sessions)
+        )
+
+    return {
+        "tickets_released": released,
+        "orders_cancelled": orders_cancelled,
+        "refunds": refunds,
+    }
+
+
+def cancel_flight(flight_id):
+    """
+    Cancel the flight, release its seats and crews and queue the refunds
+    of its paid tickets, all in one transaction
+    """
+    with transaction.atomic():
+        flight = Flight.objects.select_for_update().get(pk=flight_id)
+        if flight.cancelled_at is not None:
+            raise ValidationError("The flight is already cancelled.")
+
+        flight.cancelled_at = timezone.now()
+        flight.save(update_fields=["cancelled_at"])
+
+        crews_released, _ = FlightCrew.objects.filter(flight=flight).delete()
+        released = release_tickets(
+            Ticket.objects.filter(flight=flight),
+            f"Flight {flight.pk} cancelled",
+            now=flight.cancelled_at,
+        )
+
+    return {
+        "flight": flight.pk,
+        "cancelled_at": flight.cancelled_at,
+        "crews_released": crews_released,
+        "tickets_released": released["tickets_released"],
+        "orders_cancelled": released["orders_cancelled"],
+        "refunds_queued": len(released["refunds"]),
+    }
+
+
+def cancel_order(order_id, ticket_ids=None):
+    """
+    Cancel the tickets of the order, all of them without `ticket_ids`,
+    and queue the refund of what was paid for them
+    """
+    with transaction.atomic():
+        # One cancellation of the order at a time
+        order = Order.objects.select_for_update().get(pk=order_id)
+        if order.cancelled_at is not None:
+            raise ValidationError("The order is already cancelled.")
+
+        tickets = Ticket.objects.filter(order=order)
+        if ticket_ids is not None:
+            tickets = tickets.filter(pk__in=ticket_ids)
+            found = dict(tickets.values_list("id", "cancelled_at"))
+            for ticket_id in ticket_ids:
+                if ticket_id not in found:
+                    raise NotFound(f"Ticket {ticket_id} is not in the order.")
+                if found[ticket_id] is not None:
+                    raise ValidationError(
+                        f"Ticket {ticket_id} is already cancelled."
+                    )
+
+        if tickets.filter(
+            cancelled_at__isnull=True,
+            flight__departure_time__lte=timezone.now(),
+        ).exists():
+            raise ValidationError(
+                "Tickets of departed flights can't be cancelled."
+            )
+
+        released = release_tickets(tickets, f"Order {order.pk} cancelled")
+        order.refresh_from_db(fields=["cancelled_at"])
+
+    refunds = released["refunds"]
+
+    return {
+        "order": order.pk,
+        "cancelled_at": order.cancelled_at,
+        "tickets_released": released["tickets_released"],
+        "refund": (
+            sum(refund.amount for refund in refunds) if refunds else None
+        ),
+    }
+
+
+@contextmanager
+def taken_seat_errors():
+    """Turn a seat sold meanwhile by a concurrent order into a 400"""
+    try:
+        yield
+    except IntegrityError as error:
+        if getattr(error.__cause__, "pgcode", None) != UNIQUE_VIOLATION:
+            raise
+        raise ValidationError({"tickets": [SEAT_TAKEN]})
+    except DjangoValidationError as error:
+        # The seat constraint is the only check of a whole ticket
+        if NON_FIELD_ERRORS in getattr(error, "error_dict", {}):
+            raise ValidationError({"tickets": [SEAT_TAKEN]})
+        raise ValidationError({"tickets": error.messages})
+
+
+def record_payment(session_id, paid):
+    """
+    Mark the payment of the checkout session paid with the `paid` amount,
+    and queue a refund of what is above the amount due, all of it once
+    the order is cancelled. Returns the payment and its refund, if any.
+    """
+    with transaction.atomic():
+        payment = (
+            Payment.objects.select_for_update()
+            .select_related("order")
+            .get(session_id=session_id)
+        )
+        # A second visit of the success page
+        if payment.status_payment in CAPTURED:
+            return payment, None
+
+        due = paid if payment.amount is None else payment.amount
+        if payment.order.cancelled_at is not None:
+            due = Decimal(0)
+
+        refund = None
+        payment.amount = paid
+        payment.status_payment = Payment.PAID
+        if paid > due:
+            refund = Refund.objects.create(
+                payment=payment,
+                amount=paid - due,
+                reason="Paid above the amount due",
+            )
+            payment.status_payment = Payment.REFUND_PENDING
+        payment.save(update_fields=["amount", "status_payment"])
+
+    return payment, refund
+
+
+def send_refund(refund_id):
+    """
+    Send a pending refund to Stripe, or count a failed attempt. Returns
+    the refund, or None when it isn't pending or another worker has it.
+    """
+    with transaction.atomic():
+        refund = (
+            Refund.objects.select_for_update(skip_locked=True)
+            .select_related("payment")
+            .filter(pk=refund_id, status=Refund.PENDING)
+            .first()
+        )
+        if refund is None:
+            return None
+
+        refund.attempts += 1
+        refund.processed_at = timezone.now()
+
+        try:
+            session = stripe.checkout.Session.retrieve(
+                refund.payment.session_id,
+                api_key=settings.STRIPE_SECRET_KEY,
+            )
+            stripe_refund = stripe.Refund.create(
+                payment_intent=session.payment_intent,
+                amount=int(refund.amount * 100),
+                idempotency_key=f"refund-{refund.pk}",
+                api_key=settings.STRIPE_SECRET_KEY,
+            )
+        except stripe.error.StripeError as error:
+            refund.error = str(error)
+            if refund.attempts >= settings.REFUND_MAX_ATTEMPTS:
+                refund.status = Refund.FAILED
+        else:
+            refund.status = Refund.SUCCEEDED
+            refund.stripe_refund_id = stripe_refund.id
+            refund.error = ""
+
+        refund.save()
+
+        # Failed refunds keep the payment pending for a manual refund
+        if not Refund.objects.filter(payment_id=refund.payment_id).exclude(
+            status=Refund.SUCCEEDED
+        ).exists():
+            Payment.objects.filter(
+                pk=refund.payment_id, status_payment=Payment.REFUND_PENDING
+            ).update(status_payment=Payment.REFUNDED)
+
+    return refund
@@ -0,0 +1,62 @@
+import sys
+
+from django.conf import settings
+from django.core.checks import Error
+from django.core.exceptions import ImproperlyConfigured
+
+
+def check_production_profile(app_configs, **kwargs):
+    """Refuse debug components when the production profile is active"""
+    if not getattr(settings, "PRODUCTION", False):
+        return []
+
+    errors = []
+
+    if settings.DEBUG:
+        errors.append(
+            Error(
+                "DEBUG must be False in the production profile.",
+                id="airport.E001",
+            )
+        )
+
+    for app in getattr(settings, "DEBUG_APPS", ()):
+        if app in settings.INSTALLED_APPS:
+            errors.append(
+                Error(
+                    f"{app} must not be installed in the production profile.",
+                    id="airport.E002",
+                )
+            )
+
+        if any(
+            middleware.split(".")[0] == app
+            for middleware in settings.MIDDLEWARE
+        ):
+            errors.append(
+                Error(
+                    f"{app} middleware must not be used "
+                    f"in the production profile.",
+                    id="airport.E003",
+                )
+            )
+
+        if app in sys.modules:
+            errors.append(
+                Error(
+                    f"{app} must not be imported in the production profile.",
+                    id="airport.E004",
+                )
+            )
+
+    return errors
+
+
+def enforce_production_profile():
+    """Stop the server from booting a production profile with debug parts"""
+    errors = check_production_profile(None)
+
+    if errors:
+        raise ImproperlyConfigured(
+            "\n".join(f"{error.id}: {error.msg}" for error in errors)
+        )
@@ -0,0 +1,205 @@
+"""
+Delays of flights and their impact on the next flights.
+
+A flight can't depart before its airplane and every member of its crew
+are back from their previous flight plus FLIGHT_MIN_TURNAROUND_MINUTES.
+Delaying a flight can then push back the next flights of its airplane
+and crews, which push back the next flights of theirs, and so on.
+
+The flights of the DELAY_PROPAGATION_HOURS following the delayed one
+are swept once by departure, keeping the time every delayed airplane
+and crew member is ready again. A flight departing before one of its
+airplane or crews is ready is pushed back, the others absorb the delay
+of theirs.
+"""
+from collections import defaultdict
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F
+from rest_framework.exceptions import ValidationError
+
+from airport.duty import FlightChange, change_violations, violation_message
+from airport.models import Flight
+from airport.scheduling import (
+    FlightCrew,
+    defer_schedule_constraints,
+    is_interval,
+    schedule_integrity_errors,
+    validate_airplane_schedule,
+    validate_crew_schedule,
+)
+
+
+def turnaround():
+    return timedelta(minutes=settings.FLIGHT_MIN_TURNAROUND_MINUTES)
+
+
+def resources(airplane_id, crew_ids):
+    return [("airplane", airplane_id)] + [
+        ("crew", crew_id) for crew_id in crew_ids
+    ]
+
+
+def propagate_delay(flight, delay):
+    """
+    Flights pushed back by delaying `flight`, in departure order, as
+    {"flight", "delay", "departure_time", "arrival_time", "reasons"}
+    """
+    arrival = flight.arrival_time + delay
+    window = (
+        Flight.objects.filter(
+            departure_time__gte=flight.departure_time,
+            departure_time__lt=arrival
+            + timedelta(hours=settings.DELAY_PROPAGATION_HOURS),
+            cancelled_at__isnull=True,
+        )
+        .filter(departure_time__lt=F("arrival_time"))
+        .exclude(pk=flight.pk)
+    )
+
+    crews = defaultdict(list)
+    for flight_id, crew_id in FlightCrew.objects.filter(
+        flight__in=window
+    ).values_list("flight_id", "crew_id"):
+        crews[flight_id].append(crew_id)
+
+    # When the delayed airplanes and crew members are ready again
+    ready = {
+        resource: arrival + turnaround()
+        for resource in resources(
+            flight.airplane_id,
+            FlightCrew.objects.filter(flight=flight).values_list(
+                "crew_id", flat=True
+            ),
+        )
+    }
+    affected = []
+
+    for flight_id, airplane_id, departure_time, arrival_time in (
+        window.order_by("departure_time", "id").values_list(
+            "id", "airplane_id", "departure_time", "arrival_time"
+        )
+    ):
+        if not ready:
+            break
+
+        used = resources(airplane_id, crews[flight_id])
+        late = [
+            resource
+            for resource in used
+            if resource in ready and ready[resource] > departure_time
+        ]
+
+        if not late:
+            # Enough slack, the delays of these stop here
+            for resource in used:
+                ready.pop(resource, None)
+            continue
+
+        new_departure = max(ready[resource] for resource in late)
+        shift = new_departure - departure_time
+        affected.append(
+            {
+                "flight": flight_id,
+                "delay": shift,
+                "departure_time": new_departure,
+                "arrival_time": arrival_time + shift,
+                "reasons": [f"{kind} {pk}" for kind, pk in late],
+            }
+        )
+        for resource in used:
+            ready[resource] = arrival_time + shift + turnaround()
+
+    return affected
+
+
+def delay_changes(flight, affected):
+    """FlightChange of the delayed flight and of the `affected` ones"""
+    times = {flight.pk: (flight.departure_time, flight.arrival_time)}
+    times.update(
+        (item["flight"], (item["departure_time"], item["arrival_time"]))
+        for item in affected
+    )
+
+    crews = defaultdict(list)
+    for flight_id, crew_id, position in FlightCrew.objects.filter(
+        flight_id__in=times
+    ).values_list("flight_id", "crew_id", "crew__position"):
+        crews[flight_id].append((crew_id, position))
+
+    return [
+        FlightChange(flight_id, departure_time, arrival_time, crews[flight_id])
+        for flight_id, (departure_time, arrival_time) in times.items()
+    ]
+
+
+def delay_flight(flight_id, delay, cascade=False, dry_run=False):
+    """
+    Delay the flight, and with `cascade` the flights it pushes back.
+    Without it the flight can't overlap the next ones of its airplane
+    and crews. The moved flights can't break the duty rules of their
+    crews either. Nothing is saved for a `dry_run`, which returns the
+    duty violations instead.
+    """
+    with schedule_integrity_errors(), transaction.atomic():
+        flight = Flight.objects.select_for_update().get(pk=flight_id)
+        if flight.cancelled_at is not None:
+            raise ValidationError("The flight is cancelled.")
+        if not is_interval(flight.departure_time, flight.arrival_time):
+            raise ValidationError("The flight has no schedule to delay.")
+
+        affected = propagate_delay(flight, delay)
+        flight.departure_time += delay
+        flight.arrival_time += delay
+
+        # The crews' duty and rest with the flights moved
+        violations = change_violations(
+            delay_changes(flight, affected if cascade else [])
+        )
+        if violations and not dry_run:
+            raise ValidationError(
+                {"crews": [violation_message(item) for item in violations]}
+            )
+
+        if cascade and not dry_run:
+            # Checked once every flight has moved
+            defer_schedule_constraints()
+            Flight.objects.bulk_update(
+                [flight]
+                + [
+                    Flight(
+                        pk=item["flight"],
+                        departure_time=item["departure_time"],
+                        arrival_time=item["arrival_time"],
+                    )
+                    for item in affected
+                ],
+                ["departure_time", "arrival_time"],
+            )
+        elif not dry_run:
+            validate_airplane_schedule(
+                flight.airplane_id,
+                flight.departure_time,
+                flight.arrival_time,
+                flight.pk,
+            )
+            validate_crew_schedule(
+                flight.crews.all(),
+                flight.departure_time,
+                flight.arrival_time,
+                flight.pk,
+            )
+            flight.save(update_fields=["departure_time", "arrival_time"])
+
+    return {
+        "flight": flight.pk,
+        "delay": delay,
+        "departure_time": flight.departure_time,
+        "arrival_time": flight.arrival_time,
+        "applied": not dry_run,
+        "cascaded": cascade and not dry_run,
+        "affected": affected,
+        "violations": violations,
+    }
@@ -0,0 +1,315 @@
+"""
+Duty time and rest rules of the crews, by position (CREW_DUTY_RULES).
+
+Flights of a crew member separated by less than `min_rest_hours` belong
+to the same duty period, which can't last longer than `max_duty_hours`
+from its first departure to its last arrival: a rest too short keeps
+the crew on duty. Flight hours of a roster month can't exceed
+`max_monthly_hours`.
+
+A month is evaluated for every crew member at once: the assignments are
+loaded in one query sorted by crew and departure, then swept once.
+"""
+from collections import namedtuple
+from datetime import datetime, timedelta
+from itertools import groupby
+from operator import itemgetter
+
+from django.conf import settings
+from django.db.models import (
+    DurationField,
+    Exists,
+    ExpressionWrapper,
+    F,
+    OuterRef,
+    Subquery,
+    Sum,
+    Value,
+)
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+from rest_framework.exceptions import ValidationError
+
+from airport.models import Crew
+from airport.scheduling import FlightCrew, is_interval
+
+DUTY_PERIOD = "duty_period"
+MONTHLY_HOURS = "monthly_hours"
+
+DutyRule = namedtuple("DutyRule", ["max_duty", "min_rest", "max_monthly"])
+
+# A change of the roster: the flight (None for a new one), its times
+# and its crews as (id, position) pairs
+FlightChange = namedtuple(
+    "FlightChange", ["flight", "departure_time", "arrival_time", "crews"]
+)
+
+
+def duty_rules():
+    """{position: DutyRule}, "default" applies to the other positions"""
+    return {
+        position: DutyRule(
+            timedelta(hours=limits["max_duty_hours"]),
+            timedelta(hours=limits["min_rest_hours"]),
+            timedelta(hours=limits["max_monthly_hours"]),
+        )
+        for position, limits in settings.CREW_DUTY_RULES.items()
+    }
+
+
+def month_bounds(moment):
+    """Start and end of the roster month of a date or datetime"""
+    start = timezone.make_aware(datetime(moment.year, moment.month, 1))
+
+    if moment.month == 12:
+        return start, start.replace(year=moment.year + 1, month=1)
+
+    return start, start.replace(month=moment.month + 1)
+
+
+def lookback(rules):
+    """How far a duty period reaching into a month can start before it"""
+    return max(rule.max_duty + rule.min_rest for rule in rules.values())
+
+
+def hours(duration):
+    return duration.total_seconds() / 3600
+
+
+def duty_violations(rows, start, end, rules):
+    """
+    Violations in [start, end) from (crew id, position, flight id,
+    departure, arrival) rows sorted by crew and departure
+    """
+    violations = []
+
+    def violation(crew_id, rule, since, until, duration, limit, flights):
+        violations.append(
+            {
+                "crew": crew_id,
+                "rule": rule,
+                "start": since,
+                "end": until,
+                "hours": hours(duration),
+                "limit": hours(limit),
+                "flights": flights,
+            }
+        )
+
+    for crew_id, crew_rows in groupby(rows, key=itemgetter(0)):
+        rule = None
+        periods = []
+        month_hours = timedelta()
+        month_flights = []
+
+        for _, position, flight_id, departure, arrival in crew_rows:
+            if rule is None:
+                rule = rules.get(position, rules["default"])
+
+            if not is_interval(departure, arrival):
+                continue
+
+            if periods and departure - periods[-1][1] < rule.min_rest:
+                periods[-1][1] = max(periods[-1][1], arrival)
+                periods[-1][2].append(flight_id)
+            else:
+                periods.append([departure, arrival, [flight_id]])
+
+            if departure < end and arrival > start:
+                month_hours += min(arrival, end) - max(departure, start)
+                month_flights.append(flight_id)
+
+        for since, until, flights in periods:
+            if until - since > rule.max_duty and since < end and until > start:
+                violation(
+                    crew_id,
+                    DUTY_PERIOD,
+                    since,
+                    until,
+                    until - since,
+                    rule.max_duty,
+                    flights,
+                )
+
+        if month_hours > rule.max_monthly:
+            violation(
+                crew_id,
+                MONTHLY_HOURS,
+                start,
+                end,
+                month_hours,
+                rule.max_monthly,
+                month_flights,
+            )
+
+    return violations
+
+
+def duty_rows(start, end, rules, crew_ids=None, exclude_flights=()):
+    """Assignments around [start, end), sorted by crew and departure"""
+    rows = (
+        FlightCrew.objects.filter(
+            flight__departure_time__lt=end + lookback(rules),
+            flight__arrival_time__gt=start - lookback(rules),
+        )
+        .filter(flight__departure_time__lt=F("flight__arrival_time"))
+        .exclude(flight_id__in=exclude_flights)
+    )
+
+    if crew_ids is not None:
+        rows = rows.filter(crew_id__in=crew_ids)
+
+    return list(
+        rows.order_by("crew_id", "flight__departure_time").values_list(
+            "crew_id",
+            "crew__position",
+            "flight_id",
+            "flight__departure_time",
+            "flight__arrival_time",
+        )
+    )
+
+
+def month_violations(moment):
+    """Violations of every crew member in the roster month of `moment`"""
+    rules = duty_rules()
+    start, end = month_bounds(moment)
+
+    return duty_violations(duty_rows(start, end, rules), start, end, rules)
+
+
+def available_crews(start, end):
+    """
+    Crew members without a flight in [start, end), annotated with the
+    `duty_time` of their flights in its roster month, fewest first
+    """
+    busy = FlightCrew.objects.filter(
+        crew_id=OuterRef("pk"),
+        flight__departure_time__lt=end,
+        flight__arrival_time__gt=start,
+    ).filter(flight__departure_time__lt=F("flight__arrival_time"))
+
+    month_start, month_end = month_bounds(timezone.localtime(start))
+    duty_time = (
+        FlightCrew.objects.filter(
+            crew_id=OuterRef("pk"),
+            flight__departure_time__lt=month_end,
+            flight__departure_time__gte=month_start,
+        )
+        .filter(flight__departure_time__lt=F("flight__arrival_time"))
+        .values("crew_id")
+        .annotate(
+            total=Sum(
+                ExpressionWrapper(
+                    F("flight__arrival_time") - F("flight__departure_time"),
+                    output_field=DurationField(),
+                )
+            )
+        )
+        .values("total")
+    )
+
+    return (
+        Crew.objects.filter(~Exists(busy))
+        .annotate(
+            duty_time=Coalesce(
+                Subquery(duty_time, output_field=DurationField()),
+                Value(timedelta(), output_field=DurationField()),
+            )
+        )
+        .order_by("duty_time", "last_name", "first_name", "id")
+    )
+
+
+def change_violations(changes):
+    """
+    Violations the changes would introduce: those of the changed
+    roster involving a changed flight, in the months of the changes
+    """
+    changes = [
+        change
+        for change in changes
+        if is_interval(change.departure_time, change.arrival_time)
+    ]
+    if not changes:
+        return []
+
+    rules = duty_rules()
+    changed_flights = {change.flight for change in changes}
+    crew_ids = {
+        crew_id for change in changes for crew_id, _ in change.crews
+    }
+    months = sorted(
+        {
+            month_bounds(timezone.localtime(moment))
+            for change in changes
+            for moment in (
+                change.departure_time,
+                change.arrival_time - timedelta(microseconds=1),
+            )
+        }
+    )
+
+    violations = []
+    seen = set()
+    for start, end in months:
+        rows = duty_rows(
+            start,
+            end,
+            rules,
+            crew_ids=crew_ids,
+            exclude_flights=[
+                flight for flight in changed_flights if flight is not None
+            ],
+        )
+        rows.extend(
+            (
+                crew_id,
+                position,
+                change.flight,
+                change.departure_time,
+                change.arrival_time,
+            )
+            for change in changes
+            for crew_id, position in change.crews
+        )
+        rows.sort(key=itemgetter(0, 3))
+
+        for violation in duty_violations(rows, start, end, rules):
+            # A duty period across two months is found in both
+            key = (violation["crew"], violation["rule"], violation["start"])
+            if key not in seen and changed_flights.intersection(
+                violation["flights"]
+            ):
+                seen.add(key)
+                violations.append(violation)
+
+    return violations
+
+
+def violation_message(violation):
+    return (
+        f"Crew {violation['crew']} would exceed "
+        f"{violation['limit']:g} hours of "
+        f"{violation['rule'].replace('_', ' ')} "
+        f"({violation['hours']:g} hours)."
+    )
+
+
+def validate_crew_duty(crews, departure_time, arrival_time, flight_id):
+    """Raise a ValidationError if the flight breaks a duty rule"""
+    violations = change_violations(
+        [
+            FlightChange(
+                flight_id,
+                departure_time,
+                arrival_time,
+                [(crew.id, crew.position) for crew in crews],
+            )
+        ]
+    )
+
+    if violations:
+        raise ValidationError(
+            {"crews": [violation_message(item) for item in violations]}
+        )
@@ -0,0 +1,276 @@
+"""
+`?fields=` and `?expand=` query parameters of the read endpoints.
+
+`fields` lists the fields to return, dotted names select the fields of
+nested objects: `/orders/?fields=id,tickets.row,tickets.flight.route`.
+`expand` lists the nested objects to return, the others are replaced by
+their primary key: `/orders/?expand=tickets` returns the tickets with
+the id of their flight. Without `expand` every nested object is returned.
+
+The queryset is then rebuilt for the fields left: only their columns are
+loaded and only the relations they read are joined or prefetched.
+"""
+from django.core.exceptions import FieldDoesNotExist
+from django.db.models import Prefetch
+from rest_framework import serializers
+from rest_framework.permissions import SAFE_METHODS
+from rest_framework.relations import ManyRelatedField
+
+
+def parse_field_tree(value):
+    """`a,b.c,b.d` -> {"a": {}, "b": {"c": {}, "d": {}}}"""
+    if value is None:
+        return None
+
+    tree = {}
+    for name in value.split(","):
+        node = tree
+        for part in name.strip().split("."):
+            if part:
+                node = node.setdefault(part, {})
+
+    return tree
+
+
+def subtree(tree, path):
+    if tree is None:
+        return None
+
+    for name in path:
+        tree = tree.get(name, {})
+
+    return tree
+
+
+def is_nested(field):
+    return isinstance(field, serializers.BaseSerializer)
+
+
+def is_primary_key(field):
+    if isinstance(field, ManyRelatedField):
+        field = field.child_relation
+
+    return isinstance(field, serializers.PrimaryKeyRelatedField)
+
+
+class DynamicFieldsMixin:
+    """
+    Serializer trimmed by the `fields` and `expand` trees of the context.
+    `Meta.field_lookups` names the model fields read by the fields that
+    are not model fields themselves, e.g. properties.
+    """
+
+    def field_path(self):
+        path = []
+        node = self
+
+        while node.parent is not None:
+            # The child of a ListSerializer has no name of its own
+            if node.field_name:
+                path.append(node.field_name)
+            node = node.parent
+
+        return path[::-1]
+
+    def get_fields(self):
+        fields = super().get_fields()
+        path = self.field_path()
+
+        selected = subtree(self.context.get("fields"), path)
+        if selected:
+            fields = {
+                name: field
+                for name, field in fields.items()
+                if name in selected
+            }
+
+        expand = subtree(self.context.get("expand"), path)
+        if expand is not None:
+            for name, field in fields.items():
+                if is_nested(field) and name not in expand:
+                    fields[name] = serializers.PrimaryKeyRelatedField(
+                        source=field.source,
+                        many=isinstance(field, serializers.ListSerializer),
+                        read_only=True,
+                    )
+
+        return fields
+
+
+class DynamicFieldsModelSerializer(
+    DynamicFieldsMixin, serializers.ModelSerializer
+):
+    pass
+
+
+class QueryPlan:
+    """Columns and relations of a model the serialized fields read"""
+
+    def __init__(self, model, annotations=()):
+        self.model = model
+        self.annotations = set(annotations)
+        self.columns = set()
+        # Relations loaded with all their columns, "" is the model itself
+        self.full = set()
+        self.select = set()
+        self.prefetch = {}
+
+    def add_fields(self, fields, model, prefix="", lookups=None):
+        lookups = lookups or {}
+
+        for name, field in fields.items():
+            if name in lookups:
+                for lookup in lookups[name]:
+                    self.add_source(model, prefix, lookup.split("__"))
+            elif field.source == "*":
+                if is_nested(field):
+                    self.add_serializer(field, model, prefix)
+                else:
+                    self.full.add(prefix[:-2])
+            else:
+                self.add_source(model, prefix, field.source_attrs, field)
+
+    def add_serializer(self, serializer, model, prefix=""):
+        if isinstance(serializer, serializers.ListSerializer):
+            serializer = serializer.child
+
+        meta = getattr(serializer, "Meta", None)
+        self.add_fields(
+            serializer.fields,
+            model,
+            prefix,
+            getattr(meta, "field_lookups", None),
+        )
+
+    def add_source(self, model, prefix, attrs, field=None):
+        attr, rest = attrs[0], attrs[1:]
+        lookup = prefix + attr
+
+        try:
+            model_field = model._meta.get_field(attr)
+        except FieldDoesNotExist:
+            # A property or a method could read any column
+            if prefix or attr not in self.annotations:
+                self.full.add(prefix[:-2])
+            return
+
+        if not model_field.is_relation:
+            self.columns.add(lookup)
+            return
+
+        related_model = model_field.related_model
+
+        if model_field.many_to_many or model_field.one_to_many:
+            plan = self.prefetch.setdefault(lookup, QueryPlan(related_model))
+            if model_field.one_to_many:
+                # Prefetched objects are matched on their foreign key
+                plan.columns.add(model_field.field.name)
+
+            if rest:
+                plan.add_source(related_model, "", rest, field)
+            elif is_nested(field):
+                plan.add_serializer(field, related_model)
+            elif not is_primary_key(field):
+                plan.full.add("")
+            return
+
+        if model_field.concrete:
+            self.columns.add(lookup)
+            if not rest and is_primary_key(field):
+                return
+
+        self.select.add(lookup)
+
+        if rest:
+            self.add_source(related_model, f"{lookup}__", rest, field)
+        elif is_nested(field):
+            self.add_serializer(field, related_model, f"{lookup}__")
+        else:
+            self.full.add(lookup)
+
+    def apply(self, queryset):
+        queryset = queryset.select_related(None).prefetch_related(None)
+
+        if self.select:
+            queryset = queryset.select_related(*self.select)
+
+        if "" not in self.full:
+            # Mentioning a column of a relation restricts it to those
+            prefixes = tuple(f"{path}__" for path in self.full)
+            columns = {
+                column
+                for column in self.columns
+                if not prefixes or not column.startswith(prefixes)
+            }
+            queryset = queryset.only(*columns or ("pk",))
+
+        for lookup, plan in self.prefetch.items():
+            queryset = queryset.prefetch_related(
+                Prefetch(
+                    lookup,
+                    queryset=plan.apply(plan.model._default_manager.all()),
+                )
+            )
+
+        return queryset
+
+
+def optimize_queryset(queryset, serializer):
+    """Load only what the fields of the serializer read"""
+    plan = QueryPlan(queryset.model, queryset.query.annotations)
+    plan.add_serializer(serializer, queryset.model)
+
+    return plan.apply(queryset)
+
+
+class DynamicFieldsViewMixin:
+    """
+    Read endpoints trimmed by the `fields` and `expand` query parameters,
+    in their serializer output and in their queryset
+    """
+
+    def field_trees(self):
+        request = getattr(self, "request", None)
+
+        if (
+            request is None
+            or request.method not in SAFE_METHODS
+            or getattr(self, "swagger_fake_view", False)
+        ):
+            return None, None
+
+        return (
+            parse_field_tree(request.query_params.get("fields")),
+            parse_field_tree(request.query_params.get("expand")),
+        )
+
+    def wants_field(self, name):
+        fields, _ = self.field_trees()
+
+        return not fields or name in fields
+
+    def get_serializer_context(self):
+        context = super().get_serializer_context()
+        fields, expand = self.field_trees()
+
+        if fields is not None:
+            context["fields"] = fields
+        if expand is not None:
+            context["expand"] = expand
+
+        return context
+
+    def filter_queryset(self, queryset):
+        queryset = super().filter_queryset(queryset)
+        fields, expand = self.field_trees()
+
+        if fields is None and expand is None:
+            return queryset
+
+        serializer = self.get_serializer()
+
+        # Rows read with .values() are trimmed by their serializer
+        if not isinstance(serializer, serializers.ModelSerializer):
+            return queryset
+
+        return optimize_queryset(queryset, serializer)
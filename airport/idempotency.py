@@ -0,0 +1,112 @@
+import hashlib
+import json
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+from drf_spectacular.types import OpenApiTypes
+from drf_spectacular.utils import extend_schema, OpenApiParameter
+from rest_framework import status
+from rest_framework.exceptions import ValidationError
+from rest_framework.response import Response
+
+from airport.models import IdempotencyKey
+
+IDEMPOTENCY_KEY_HEADER = "Idempotency-Key"
+IDEMPOTENCY_KEY_MAX_LENGTH = 255
+
+
+def request_fingerprint(request) -> str:
+    """Hash of everything that makes two create requests the same"""
+    data = request.data
+    if hasattr(data, "lists"):
+        data = dict(data.lists())
+
+    payload = json.dumps(data, sort_keys=True, cls=DjangoJSONEncoder)
+
+    return hashlib.sha256(
+        f"{request.method}:{request.path}:{payload}".encode()
+    ).hexdigest()
+
+
+class IdempotentCreateMixin:
+    """
+    Replay the stored response of a create request sent again
+    with the same Idempotency-Key instead of running it twice
+    """
+
+    def _replay(self, record, fingerprint):
+        if record.fingerprint != fingerprint:
+            return Response(
+                {
+                    "detail": f"{IDEMPOTENCY_KEY_HEADER} was already used "
+                              f"for a different request"
+                },
+                status=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            )
+
+        return Response(
+            record.response_body,
+            status=record.status_code,
+            headers={"Idempotent-Replayed": "true"},
+        )
+
+    @extend_schema(
+        parameters=[
+            OpenApiParameter(
+                IDEMPOTENCY_KEY_HEADER,
+                type=OpenApiTypes.STR,
+                location=OpenApiParameter.HEADER,
+                description=(
+                    "Unique key of the request, a retry with the same key "
+                    "returns the first response"
+                ),
+            ),
+        ]
+    )
+    def create(self, request, *args, **kwargs):
+        key = request.headers.get(IDEMPOTENCY_KEY_HEADER)
+
+        if not key:
+            return super().create(request, *args, **kwargs)
+
+        if len(key) > IDEMPOTENCY_KEY_MAX_LENGTH:
+            raise ValidationError(
+                {
+                    IDEMPOTENCY_KEY_HEADER: (
+                        f"Ensure this header has no more than "
+                        f"{IDEMPOTENCY_KEY_MAX_LENGTH} characters."
+                    )
+                }
+            )
+
+        fingerprint = request_fingerprint(request)
+        now = timezone.now()
+
+        IdempotencyKey.objects.filter(
+            user=request.user, key=key, expires_at__lte=now
+        ).delete()
+
+        with transaction.atomic():
+            try:
+                with transaction.atomic():
+                    record = IdempotencyKey.objects.create(
+                        user=request.user,
+                        key=key,
+                        fingerprint=fingerprint,
+                        expires_at=now + settings.IDEMPOTENCY_KEY_TTL,
+                    )
+            except IntegrityError:
+                record = IdempotencyKey.objects.get(
+                    user=request.user, key=key
+                )
+                return self._replay(record, fingerprint)
+
+            response = super().create(request, *args, **kwargs)
+
+            record.status_code = response.status_code
+            record.response_body = response.data
+            record.save(update_fields=["status_code", "response_body"])
+
+        return response
@@ -0,0 +1,248 @@
+"""
+Image variants of airplane photos.
+
+After an upload the original is rewritten without its metadata (EXIF,
+GPS position, comments), then resized to IMAGE_VARIANT_WIDTHS in each of
+IMAGE_VARIANT_FORMATS. The work runs in a pool of IMAGE_WORKERS threads
+of the process once the upload is committed, Pillow releases the GIL
+while it decodes, resizes and encodes. With IMAGE_VARIANTS_INLINE it
+runs in the request instead, which the tests rely on.
+
+`Airplane.image_variants` maps every variant name, e.g. `webp-640`, to
+the name of its file in the storage.
+
+Saving a file shared by content hash may only return the name of a file
+already stored, which the cleanup of unused files could delete before
+the airplane referring to it again is committed. The saves and their
+airplane update hold `image_files_lock()` shared, the cleanup holds it
+exclusively, so it waits for the saves in progress and sees their rows.
+"""
+import io
+import logging
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+
+from PIL import Image, ImageOps
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.db import close_old_connections, connection, transaction
+
+from airport.models import Airplane
+
+logger = logging.getLogger(__name__)
+
+# Key of the PostgreSQL advisory lock of the image files
+IMAGE_FILES_LOCK = 7_263_001
+
+FORMATS = {
+    "webp": ("WEBP", ".webp"),
+    "jpeg": ("JPEG", ".jpg"),
+}
+
+
+@contextmanager
+def image_files_lock(exclusive=False):
+    """
+    Transaction holding the lock of the image files, shared by the saves
+    and exclusive for the cleanup. SQLite runs one write at a time anyway.
+    """
+    with transaction.atomic():
+        if connection.vendor == "postgresql":
+            function = (
+                "pg_advisory_xact_lock"
+                if exclusive
+                else "pg_advisory_xact_lock_shared"
+            )
+            with connection.cursor() as cursor:
+                cursor.execute(f"SELECT {function}(%s)", [IMAGE_FILES_LOCK])
+
+        yield
+
+
+def variant_name(image_name, variant_format, width):
+    stem, _ = os.path.splitext(os.path.basename(image_name))
+    _, extension = FORMATS[variant_format]
+
+    return f"uploads/airplanes/variants/{stem}-{width}w{extension}"
+
+
+def _flatten(image):
+    """RGB copy of the image, transparent parts on a white background"""
+    if image.mode in ("RGBA", "LA", "P"):
+        image = image.convert("RGBA")
+        background = Image.new("RGB", image.size, "white")
+        background.paste(image, mask=image.getchannel("A"))
+        return background
+
+    return image.convert("RGB")
+
+
+def strip_metadata(data):
+    """Re-encode an image without its metadata, keeping its format"""
+    with Image.open(io.BytesIO(data)) as image:
+        image_format = image.format
+        transposed = ImageOps.exif_transpose(image)
+        options = {}
+
+        if image_format == "JPEG":
+            # Keep the quality of the original unless it was rotated
+            options["quality"] = "keep" if transposed is image else 95
+
+        output = io.BytesIO()
+        transposed.save(output, format=image_format, **options)
+
+    return output.getvalue()
+
+
+def render_variants(data, widths, formats, quality):
+    """{(format, width): encoded bytes} of the image in `data`"""
+    variants = {}
+
+    with Image.open(io.BytesIO(data)) as image:
+        image = ImageOps.exif_transpose(image)
+        image.load()
+
+        for width in sorted(widths):
+            # Never upscale, the original width is the last variant
+            width = min(width, image.width)
+            if any(key[1] == width for key in variants):
+                continue
+
+            height = max(1, round(image.height * width / image.width))
+            resized = image.resize((width, height), Image.Resampling.LANCZOS)
+
+            for variant_format in formats:
+                pillow_format, _ = FORMATS[variant_format]
+                output = io.BytesIO()
+
+                if pillow_format == "JPEG":
+                    _flatten(resized).save(
+                        output,
+                        format="JPEG",
+                        quality=quality,
+                        optimize=True,
+                        progressive=True,
+                    )
+                else:
+                    if resized.mode not in ("RGB", "RGBA"):
+                        resized = resized.convert("RGBA")
+                    resized.save(
+                        output, format=pillow_format, quality=quality
+                    )
+
+                variants[(variant_format, width)] = output.getvalue()
+
+    return variants
+
+
+def process_airplane_image(airplane_id):
+    """Strip the metadata of the airplane image and make its variants"""
+    airplane = Airplane.objects.filter(pk=airplane_id).first()
+
+    if airplane is None or not airplane.image:
+        return None
+
+    field = airplane.image
+    storage = field.storage
+    original_name = field.name
+
+    with storage.open(original_name, "rb") as original:
+        data = original.read()
+
+    stripped = strip_metadata(data)
+    variants = render_variants(
+        stripped,
+        settings.IMAGE_VARIANT_WIDTHS,
+        settings.IMAGE_VARIANT_FORMATS,
+        settings.IMAGE_VARIANT_QUALITY,
+    )
+
+    with image_files_lock():
+        image_name = storage.save(
+            field.field.generate_filename(airplane, original_name),
+            ContentFile(stripped),
+        )
+        image_variants = {
+            f"{variant_format}-{width}": storage.save(
+                variant_name(image_name, variant_format, width),
+                ContentFile(content),
+            )
+            for (variant_format, width), content in variants.items()
+        }
+
+        # The image may have been replaced in the meantime
+        updated = Airplane.objects.filter(
+            pk=airplane_id, image=original_name
+        ).update(image=image_name, image_variants=image_variants)
+
+    if updated:
+        stale = [original_name, *airplane.image_variants.values()]
+    else:
+        stale = [image_name, *image_variants.values()]
+
+    delete_unused_files(storage, stale)
+
+    return image_variants if updated else None
+
+
+def delete_unused_files(storage, names):
+    """
+    Delete the files no airplane refers to. With a content hash storage
+    airplanes with the same image share it and its variants.
+    """
+    used = set()
+
+    with image_files_lock(exclusive=True):
+        # A background job reading one small row per airplane with an image
+        for image, variants in Airplane.objects.exclude(
+            image=""
+        ).values_list("image", "image_variants"):
+            used.add(image)
+            used.update(variants.values())
+
+        for name in set(names) - used:
+            storage.delete(name)
+
+
+class ImageWorkerPool:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._pid = None
+        self._executor = None
+
+    def _get_executor(self):
+        # Threads don't survive a fork, each worker process needs its own
+        with self._lock:
+            if self._pid != os.getpid():
+                self._executor = ThreadPoolExecutor(
+                    max_workers=settings.IMAGE_WORKERS,
+                    thread_name_prefix="image-worker",
+                )
+                self._pid = os.getpid()
+
+            return self._executor
+
+    def submit(self, job, airplane_id):
+        return self._get_executor().submit(_run_in_worker, job, airplane_id)
+
+
+image_workers = ImageWorkerPool()
+
+
+def _run_in_worker(job, airplane_id):
+    try:
+        return job(airplane_id)
+    except Exception:
+        logger.exception("Image job of airplane %s failed", airplane_id)
+    finally:
+        close_old_connections()
+
+
+def schedule_image_processing(airplane, job=process_airplane_image):
+    """Run `job(airplane_id)` once the transaction is committed"""
+    if settings.IMAGE_VARIANTS_INLINE:
+        transaction.on_commit(lambda: job(airplane.pk))
+    else:
+        transaction.on_commit(lambda: image_workers.submit(job, airplane.pk))
@@ -0,0 +1,82 @@
+import random
+import time
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from airport.duty import duty_rules, duty_violations, month_bounds
+from airport.models import Crew
+
+POSITIONS = [position for position, _ in Crew.POSITION_CHOICES]
+
+
+class Command(BaseCommand):
+    """
+    Django command to measure the duty rules sweep of a roster month of
+    --crews crew members flying --flights flights each
+    """
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--crews",
+            type=int,
+            default=5000,
+            help="Number of crew members of the roster",
+        )
+        parser.add_argument(
+            "--flights",
+            type=int,
+            default=40,
+            help="Number of flights of every crew member in the month",
+        )
+        parser.add_argument(
+            "--seed",
+            type=int,
+            default=0,
+            help="Seed of the random roster",
+        )
+
+    def roster(self, start, crews, flights, seed):
+        # Assignment rows as loaded by airport.duty.duty_rows
+        generator = random.Random(seed)
+        rows = []
+
+        for crew_id in range(crews):
+            position = generator.choice(POSITIONS)
+            departure = start + timedelta(hours=generator.randint(0, 12))
+
+            for flight in range(flights):
+                arrival = departure + timedelta(
+                    minutes=generator.randint(45, 300)
+                )
+                rows.append(
+                    (
+                        crew_id,
+                        position,
+                        crew_id * flights + flight,
+                        departure,
+                        arrival,
+                    )
+                )
+                departure = arrival + timedelta(
+                    minutes=generator.choice((40, 60, 90, 720, 900))
+                )
+
+        return rows
+
+    def handle(self, *args, **options):
+        rules = duty_rules()
+        start, end = month_bounds(timezone.localdate())
+        rows = self.roster(
+            start, options["crews"], options["flights"], options["seed"]
+        )
+
+        started = time.perf_counter()
+        violations = duty_violations(rows, start, end, rules)
+        elapsed = time.perf_counter() - started
+
+        self.stdout.write(
+            f"{options['crews']} crews, {len(rows)} assignments: "
+            f"{len(violations)} violations in {elapsed * 1000:.1f} ms"
+        )
@@ -0,0 +1,249 @@
+import os
+import runpy
+import subprocess
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from unittest import mock
+
+import requests
+import uvicorn
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.core.wsgi import get_wsgi_application
+from gunicorn.app.base import Application
+from django.test import override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from airport.models import Airport, Route, AirplaneType, Airplane, Flight
+from airport.views import FlightViewSet
+
+
+GUNICORN_CONFIG = os.path.join(settings.BASE_DIR, "gunicorn.conf.py")
+
+
+class WSGIServer(Application):
+    """gunicorn configured by gunicorn.conf.py, as in production"""
+
+    def __init__(self, port):
+        self.port = port
+        super().__init__()
+
+    def load_config(self):
+        self.load_config_from_file(GUNICORN_CONFIG)
+        self.cfg.set("bind", f"127.0.0.1:{self.port}")
+        self.cfg.set("accesslog", None)
+
+    def load(self):
+        return get_wsgi_application()
+
+
+class Command(BaseCommand):
+    """
+    Django command to compare the throughput of the sync /flights/
+    viewset with the async /async/flights/ endpoints on the same data,
+    served over HTTP as deployed: the viewset by gunicorn with
+    gunicorn.conf.py, the async views by uvicorn
+    """
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--requests",
+            type=int,
+            default=200,
+            help="Number of requests sent to every endpoint",
+        )
+        parser.add_argument(
+            "--concurrency",
+            type=int,
+            default=20,
+            help="Number of requests in flight at the same time",
+        )
+        parser.add_argument(
+            "--port",
+            type=int,
+            default=8002,
+            help="Port of the gunicorn server, uvicorn gets the next one",
+        )
+        parser.add_argument(
+            "--serve",
+            choices=["wsgi", "asgi"],
+            help="Run a benchmarked server itself (used internally)",
+        )
+        parser.add_argument(
+            "--seed",
+            type=int,
+            default=0,
+            help="Create this many sample flights before measuring",
+        )
+
+    def seed(self, count):
+        source = Airport.objects.create(
+            name="Benchmark source", closest_big_city="Source city"
+        )
+        destination = Airport.objects.create(
+            name="Benchmark destination", closest_big_city="Target city"
+        )
+        route = Route.objects.create(
+            source=source, destination=destination, distance=1000
+        )
+        airplane_type, _ = AirplaneType.objects.get_or_create(
+            name="Benchmark"
+        )
+        airplane = Airplane.objects.create(
+            name="Benchmark airplane",
+            rows=30,
+            seats_in_row=6,
+            airplane_type=airplane_type,
+        )
+        departure = timezone.now()
+        Flight.objects.bulk_create(
+            Flight(
+                route=route,
+                airplane=airplane,
+                departure_time=departure + timedelta(hours=3 * i),
+                arrival_time=departure + timedelta(hours=3 * i + 2),
+            )
+            for i in range(count)
+        )
+
+    def serve(self, server, port):
+        # Throttling would turn most of the requests into 429s, the
+        # gunicorn workers are forked with the patch applied
+        with override_settings(
+            ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, "127.0.0.1"]
+        ), mock.patch.object(FlightViewSet, "throttle_classes", ()):
+            if server == "wsgi":
+                WSGIServer(port).run()
+            else:
+                uvicorn.run(
+                    "airport_service.asgi:application",
+                    port=port,
+                    log_level="warning",
+                )
+
+    def start_server(self, server, port):
+        process = subprocess.Popen(
+            [
+                sys.executable,
+                "-m",
+                "django",
+                "benchmark_flight_reads",
+                f"--serve={server}",
+                f"--port={port}",
+            ],
+            cwd=settings.BASE_DIR,
+            env={
+                **os.environ,
+                "DJANGO_SETTINGS_MODULE": settings.SETTINGS_MODULE,
+            },
+        )
+
+        deadline = time.monotonic() + 30
+        while time.monotonic() < deadline:
+            if process.poll() is not None:
+                raise CommandError(f"The {server} server didn't start")
+            try:
+                requests.get(f"http://127.0.0.1:{port}/", timeout=1)
+            except requests.ConnectionError:
+                time.sleep(0.2)
+            else:
+                return process
+
+        process.terminate()
+        raise CommandError(f"The {server} server didn't answer in 30s")
+
+    def describe_servers(self):
+        config = runpy.run_path(GUNICORN_CONFIG)
+        worker_class = config["worker_class"]
+        if worker_class == "sync" and config["threads"] > 1:
+            worker_class = "gthread"
+
+        return {
+            "sync": (
+                f"gunicorn WSGI, {config['workers']} {worker_class} "
+                f"workers x {config['threads']} threads"
+            ),
+            "async": "uvicorn ASGI, 1 process",
+        }
+
+    def measure(self, url, requests_count, concurrency):
+        local = threading.local()
+
+        def fetch(_):
+            # One keep-alive connection per client thread
+            if not hasattr(local, "session"):
+                local.session = requests.Session()
+            return local.session.get(url).status_code
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            statuses = list(executor.map(fetch, range(requests_count)))
+
+        return time.perf_counter() - started, statuses
+
+    def report(self, label, elapsed, statuses):
+        failed = sum(1 for code in statuses if code != 200)
+        self.stdout.write(
+            f"{label:<28} {len(statuses) / elapsed:10.1f} req/s "
+            f"{elapsed * 1000 / len(statuses):8.2f} ms/req "
+            f"({failed} failed)"
+        )
+
+    def handle(self, *args, **options):
+        if options["serve"]:
+            self.serve(options["serve"], options["port"])
+            return
+
+        if options["seed"]:
+            self.seed(options["seed"])
+
+        flight = Flight.objects.order_by("id").first()
+        if flight is None:
+            self.stderr.write("No flights to read, use --seed to add some")
+            return
+
+        self.stdout.write(
+            f"{Flight.objects.count()} flights, "
+            f"{options['requests']} requests per endpoint, "
+            f"concurrency {options['concurrency']}"
+        )
+        for side, description in self.describe_servers().items():
+            self.stdout.write(f"{side}: {description}")
+
+        endpoints = (
+            (
+                "list",
+                reverse("airport:flight-list"),
+                reverse("airport:async-flight-list"),
+            ),
+            (
+                "detail",
+                reverse("airport:flight-detail", args=[flight.id]),
+                reverse("airport:async-flight-detail", args=[flight.id]),
+            ),
+        )
+
+        ports = {"sync": options["port"], "async": options["port"] + 1}
+        servers = []
+        try:
+            servers.append(self.start_server("wsgi", ports["sync"]))
+            servers.append(self.start_server("asgi", ports["async"]))
+
+            for name, sync_path, async_path in endpoints:
+                for side, path in (("sync", sync_path), ("async", async_path)):
+                    self.report(
+                        f"{side} {name}",
+                        *self.measure(
+                            f"http://127.0.0.1:{ports[side]}{path}",
+                            options["requests"],
+                            options["concurrency"],
+                        ),
+                    )
+        finally:
+            for server in servers:
+                server.terminate()
+                server.wait()
@@ -0,0 +1,114 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.test import override_settings
+from rest_framework import serializers
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+
+from airport.models import Airplane, AirplaneType
+from airport.serializers import AirplaneListSerializer
+
+VARIANTS = ("webp-160", "jpeg-160", "webp-640", "jpeg-640")
+
+
+class RequestURLsSerializer(AirplaneListSerializer):
+    """Airplane list with its URLs built by the request for every row"""
+
+    image = serializers.ImageField(read_only=True)
+    image_variants = serializers.SerializerMethodField()
+
+    def get_image_variants(self, airplane):
+        request = self.context["request"]
+        storage = Airplane._meta.get_field("image").storage
+
+        return {
+            name: request.build_absolute_uri(storage.url(file_name))
+            for name, file_name in sorted(airplane.image_variants.items())
+        }
+
+
+class Command(BaseCommand):
+    """
+    Django command to compare media URLs built by the request for every
+    row with the precomputed prefix, on an airplane list of --rows rows
+    """
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--rows",
+            type=int,
+            default=1000,
+            help="Number of airplanes of the serialized list",
+        )
+        parser.add_argument(
+            "--rounds",
+            type=int,
+            default=20,
+            help="Number of times the list is serialized",
+        )
+
+    def airplanes(self, count):
+        # Unsaved instances, only the serializers are measured
+        airplane_type = AirplaneType(id=1, name="Benchmark")
+
+        return [
+            Airplane(
+                id=i,
+                name=f"Airplane {i}",
+                rows=30,
+                seats_in_row=6,
+                airplane_type=airplane_type,
+                image=f"uploads/airplanes/{i:032x}.jpg",
+                image_variants={
+                    name: f"uploads/airplanes/variants/{i:031x}{n}.webp"
+                    for n, name in enumerate(VARIANTS)
+                },
+            )
+            for i in range(count)
+        ]
+
+    def measure(self, label, serializer_class, airplanes, rounds):
+        started = time.perf_counter()
+
+        for _ in range(rounds):
+            # A new request per round, as its URL prefix is cached on it
+            request = Request(APIRequestFactory().get("/airplanes/"))
+            data = serializer_class(
+                airplanes, many=True, context={"request": request}
+            ).data
+
+        elapsed = (time.perf_counter() - started) / rounds
+        self.stdout.write(f"{label:<24} {elapsed * 1000:10.2f} ms/list")
+
+        return elapsed, data
+
+    def handle(self, *args, **options):
+        airplanes = self.airplanes(options["rows"])
+        rounds = options["rounds"]
+
+        self.stdout.write(f"{len(airplanes)} airplanes, {rounds} rounds")
+
+        with override_settings(ALLOWED_HOSTS=["testserver"]):
+            per_row, expected = self.measure(
+                "request per row", RequestURLsSerializer, airplanes, rounds
+            )
+            prefix, data = self.measure(
+                "precomputed prefix", AirplaneListSerializer, airplanes, rounds
+            )
+
+            with override_settings(
+                MEDIA_BASE_URL="https://cdn.example.com/media/"
+            ):
+                cdn, _ = self.measure(
+                    "MEDIA_BASE_URL", AirplaneListSerializer, airplanes, rounds
+                )
+
+        if data != expected:
+            self.stderr.write("The serializers disagree")
+            return
+
+        self.stdout.write(
+            f"speedup: prefix x{per_row / prefix:.1f}, "
+            f"cdn x{per_row / cdn:.1f}"
+        )
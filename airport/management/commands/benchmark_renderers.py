@@ -0,0 +1,172 @@
+import io
+import time
+from datetime import timedelta
+from decimal import Decimal
+from unittest import mock
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.test import override_settings
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.parsers import JSONParser
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIClient
+
+from airport.models import (
+    Airport,
+    Route,
+    AirplaneType,
+    Airplane,
+    Flight,
+    Order,
+    Ticket,
+)
+from airport.parsers import ORJSONParser
+from airport.renderers import ORJSONRenderer, orjson
+from airport.views import FlightViewSet, OrderViewSet
+
+BENCHMARK_EMAIL = "benchmark-renderers@example.com"
+
+
+class Command(BaseCommand):
+    """
+    Django command to compare DRF's JSONRenderer and JSONParser with the
+    orjson backed ones on the /flights/ and /orders/ list pages
+    """
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--rounds",
+            type=int,
+            default=1000,
+            help="Number of times every page is rendered and parsed",
+        )
+        parser.add_argument(
+            "--seed",
+            type=int,
+            default=0,
+            help="Create this many sample flights and orders first",
+        )
+
+    def seed(self, count, user):
+        source = Airport.objects.create(
+            name="Benchmark source", closest_big_city="Source city"
+        )
+        destination = Airport.objects.create(
+            name="Benchmark destination", closest_big_city="Target city"
+        )
+        route = Route.objects.create(
+            source=source, destination=destination, distance=1000
+        )
+        airplane_type, _ = AirplaneType.objects.get_or_create(
+            name="Benchmark"
+        )
+        airplane = Airplane.objects.create(
+            name="Benchmark airplane",
+            rows=30,
+            seats_in_row=6,
+            airplane_type=airplane_type,
+        )
+        departure = timezone.now()
+        flights = Flight.objects.bulk_create(
+            Flight(
+                route=route,
+                airplane=airplane,
+                departure_time=departure + timedelta(hours=3 * i),
+                arrival_time=departure + timedelta(hours=3 * i + 2),
+            )
+            for i in range(count)
+        )
+        orders = Order.objects.bulk_create(
+            Order(user=user) for _ in range(count)
+        )
+        Ticket.objects.bulk_create(
+            Ticket(
+                row=1 + seat // 6,
+                seat=1 + seat % 6,
+                price=Decimal("99.90"),
+                flight=flight,
+                order=order,
+            )
+            for flight, order in zip(flights, orders)
+            for seat in range(3)
+        )
+
+    def measure(self, label, func, rounds):
+        started = time.perf_counter()
+        for _ in range(rounds):
+            func()
+        elapsed = time.perf_counter() - started
+
+        self.stdout.write(
+            f"{label:<24} {elapsed * 1_000_000 / rounds:10.1f} us/page"
+        )
+
+        return elapsed
+
+    def handle(self, *args, **options):
+        if orjson is None:
+            self.stderr.write("orjson is not installed, nothing to compare")
+            return
+
+        user, _ = get_user_model().objects.get_or_create(
+            email=BENCHMARK_EMAIL, defaults={"username": BENCHMARK_EMAIL}
+        )
+        if options["seed"]:
+            self.seed(options["seed"], user)
+
+        client = APIClient()
+        client.force_authenticate(user)
+
+        # Throttling would answer most of the warm up requests with 429
+        with override_settings(
+            ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, "testserver"]
+        ), mock.patch.object(
+            FlightViewSet, "throttle_classes", ()
+        ), mock.patch.object(
+            OrderViewSet, "throttle_classes", ()
+        ):
+            pages = {
+                "flights": client.get(reverse("airport:flight-list")).data,
+                "orders": client.get(reverse("airport:order-list")).data,
+            }
+
+        rounds = options["rounds"]
+        for name, data in pages.items():
+            stdlib = JSONRenderer().render(data)
+            fast = ORJSONRenderer().render(data)
+
+            if stdlib != fast:
+                self.stderr.write(f"{name}: the renderers disagree")
+                continue
+
+            self.stdout.write(
+                f"{name}: {data['count']} items, "
+                f"{len(data['results'])} per page, {len(stdlib)} bytes"
+            )
+            render_stdlib = self.measure(
+                "  render JSONRenderer",
+                lambda: JSONRenderer().render(data),
+                rounds,
+            )
+            render_fast = self.measure(
+                "  render ORJSONRenderer",
+                lambda: ORJSONRenderer().render(data),
+                rounds,
+            )
+            parse_stdlib = self.measure(
+                "  parse JSONParser",
+                lambda: JSONParser().parse(io.BytesIO(stdlib)),
+                rounds,
+            )
+            parse_fast = self.measure(
+                "  parse ORJSONParser",
+                lambda: ORJSONParser().parse(io.BytesIO(stdlib)),
+                rounds,
+            )
+            self.stdout.write(
+                f"  speedup: render x{render_stdlib / render_fast:.1f}, "
+                f"parse x{parse_stdlib / parse_fast:.1f}"
+            )
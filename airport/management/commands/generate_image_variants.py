@@ -0,0 +1,34 @@
+from django.core.management.base import BaseCommand
+
+from airport.images import process_airplane_image
+from airport.models import Airplane
+
+
+class Command(BaseCommand):
+    """
+    Django command to strip the metadata of airplane images and make
+    their variants, for the images uploaded before they existed
+    """
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--all",
+            action="store_true",
+            help="Remake the variants of every image, not only missing ones",
+        )
+
+    def handle(self, *args, **options):
+        airplanes = Airplane.objects.exclude(image="").exclude(
+            image__isnull=True
+        )
+        if not options["all"]:
+            airplanes = airplanes.filter(image_variants={})
+
+        processed = 0
+        for airplane_id in airplanes.values_list("id", flat=True):
+            if process_airplane_image(airplane_id) is not None:
+                processed += 1
+
+        self.stdout.write(
+            self.style.SUCCESS(f"Made the variants of {processed} images")
+        )
@@ -0,0 +1,36 @@
+from django.core.management.base import BaseCommand
+
+from airport.cancellation import send_refund
+from airport.models import Refund
+
+
+class Command(BaseCommand):
+    """Django command to send the pending refunds to Stripe"""
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--limit",
+            type=int,
+            default=100,
+            help="Most refunds sent by this run",
+        )
+
+    def handle(self, *args, **options):
+        pending = Refund.objects.filter(status=Refund.PENDING).values_list(
+            "id", flat=True
+        )[:options["limit"]]
+        sent = failed = 0
+
+        for refund_id in list(pending):
+            refund = send_refund(refund_id)
+            if refund is None:
+                continue
+            if refund.status == Refund.SUCCEEDED:
+                sent += 1
+            else:
+                failed += 1
+                self.stderr.write(f"Refund {refund.id}: {refund.error}")
+
+        self.stdout.write(
+            self.style.SUCCESS(f"Sent {sent} refunds, {failed} failed")
+        )
@@ -0,0 +1,117 @@
+"""
+Media files served with long-lived cache headers.
+
+Names of the content hash storage never change their bytes, so they are
+served as immutable for MEDIA_CACHE_MAX_AGE seconds with their hash as
+ETag. With MEDIA_OFFLOAD the response only carries the file location in
+X-Sendfile (Apache, lighttpd) or X-Accel-Redirect (nginx, under the
+internal MEDIA_ACCEL_REDIRECT_LOCATION) and the web server sends the
+file, otherwise Django streams it.
+
+Serializers build media URLs from `media_url_prefix`: MEDIA_BASE_URL
+(a CDN) when set, otherwise the absolute MEDIA_URL of the request,
+computed once per request instead of once per file.
+"""
+import mimetypes
+import os
+import posixpath
+from urllib.parse import quote
+
+from django.conf import settings
+from django.core.exceptions import SuspiciousFileOperation
+from django.core.files.storage import default_storage
+from django.http import (
+    FileResponse,
+    Http404,
+    HttpResponse,
+    HttpResponseNotAllowed,
+    HttpResponseNotModified,
+)
+from django.utils._os import safe_join
+from django.utils.encoding import filepath_to_uri
+from django.utils.http import quote_etag
+
+from airport.storage import ContentHashStorage
+
+
+def media_url_prefix(request=None):
+    """URL the names of media files are appended to"""
+    if settings.MEDIA_BASE_URL:
+        return settings.MEDIA_BASE_URL.rstrip("/") + "/"
+
+    if request is None:
+        return settings.MEDIA_URL
+
+    prefix = getattr(request, "_media_url_prefix", None)
+
+    if prefix is None:
+        prefix = request.build_absolute_uri(settings.MEDIA_URL)
+        request._media_url_prefix = prefix
+
+    return prefix
+
+
+def media_url(name, prefix):
+    """Same URL as FileSystemStorage.url() under the prefix"""
+    return prefix + filepath_to_uri(name).lstrip("/")
+
+
+def cache_headers(path):
+    stem, _ = os.path.splitext(posixpath.basename(path))
+
+    if isinstance(
+        default_storage, ContentHashStorage
+    ) and default_storage.is_content_hashed(path):
+        return {
+            "Cache-Control": (
+                f"public, max-age={settings.MEDIA_CACHE_MAX_AGE}, immutable"
+            ),
+            "ETag": quote_etag(stem),
+        }
+
+    return {"Cache-Control": "public, max-age=3600"}
+
+
+def serve_media(request, path):
+    if request.method not in ("GET", "HEAD"):
+        return HttpResponseNotAllowed(["GET", "HEAD"])
+
+    try:
+        full_path = safe_join(settings.MEDIA_ROOT, path)
+    except SuspiciousFileOperation:
+        raise Http404()
+
+    if not os.path.isfile(full_path):
+        raise Http404()
+
+    headers = cache_headers(path)
+
+    if "ETag" in headers and headers["ETag"] in request.headers.get(
+        "If-None-Match", ""
+    ):
+        response = HttpResponseNotModified()
+        for header, value in headers.items():
+            response.headers[header] = value
+        return response
+
+    if settings.MEDIA_OFFLOAD == "x-sendfile":
+        response = HttpResponse(headers={"X-Sendfile": full_path})
+    elif settings.MEDIA_OFFLOAD == "x-accel-redirect":
+        location = settings.MEDIA_ACCEL_REDIRECT_LOCATION.rstrip("/")
+        response = HttpResponse(
+            headers={"X-Accel-Redirect": f"{location}/{quote(path)}"}
+        )
+    else:
+        # Sent with the server's file wrapper (sendfile) when it has one
+        response = FileResponse(open(full_path, "rb"))
+
+    content_type, encoding = mimetypes.guess_type(full_path)
+    response.headers["Content-Type"] = (
+        content_type or "application/octet-stream"
+    )
+    if encoding:
+        response.headers["Content-Encoding"] = encoding
+    for header, value in headers.items():
+        response.headers[header] = value
+
+    return response
@@ -0,0 +1,24 @@
+# Generated by Django 4.2.3 on 2026-10-19 01:19
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("airport", "0006_alter_airport_name"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="payment",
+            name="amount",
+            field=models.DecimalField(
+                blank=True, decimal_places=2, max_digits=10, null=True
+            ),
+        ),
+        migrations.AddField(
+            model_name="payment",
+            name="session_expires_at",
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+    ]
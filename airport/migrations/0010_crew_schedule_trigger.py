@@ -0,0 +1,78 @@
+from django.db import migrations
+
+# Checked at commit, so a flight can be rescheduled and its crews
+# reassigned in one transaction
+CREATE_TRIGGERS = """
+CREATE FUNCTION airport_check_crew_schedule() RETURNS trigger AS $$
+DECLARE
+    checked_flight_id bigint;
+    conflict RECORD;
+BEGIN
+    IF TG_TABLE_NAME = 'airport_flight' THEN
+        checked_flight_id := NEW.id;
+    ELSE
+        checked_flight_id := NEW.flight_id;
+    END IF;
+
+    SELECT crew.crew_id, crew.flight_id, other_crew.flight_id AS other_id
+    INTO conflict
+    FROM airport_flight_crews crew
+    JOIN airport_flight flight ON flight.id = crew.flight_id
+    JOIN airport_flight_crews other_crew
+        ON other_crew.crew_id = crew.crew_id
+        AND other_crew.flight_id <> crew.flight_id
+    JOIN airport_flight other ON other.id = other_crew.flight_id
+    WHERE crew.flight_id = checked_flight_id
+    AND flight.departure_time < flight.arrival_time
+    AND other.departure_time < other.arrival_time
+    AND flight.departure_time < other.arrival_time
+    AND other.departure_time < flight.arrival_time
+    LIMIT 1;
+
+    IF FOUND THEN
+        RAISE EXCEPTION
+            'Crew % is already assigned to overlapping flights %.',
+            conflict.crew_id, conflict.other_id
+        USING ERRCODE = 'exclusion_violation';
+    END IF;
+
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE CONSTRAINT TRIGGER airport_flight_crews_schedule
+AFTER INSERT OR UPDATE ON airport_flight_crews
+DEFERRABLE INITIALLY DEFERRED
+FOR EACH ROW EXECUTE FUNCTION airport_check_crew_schedule();
+
+CREATE CONSTRAINT TRIGGER airport_flight_crew_schedule
+AFTER UPDATE OF departure_time, arrival_time ON airport_flight
+DEFERRABLE INITIALLY DEFERRED
+FOR EACH ROW EXECUTE FUNCTION airport_check_crew_schedule();
+"""
+
+DROP_TRIGGERS = """
+DROP TRIGGER airport_flight_crew_schedule ON airport_flight;
+DROP TRIGGER airport_flight_crews_schedule ON airport_flight_crews;
+DROP FUNCTION airport_check_crew_schedule();
+"""
+
+
+def create_triggers(apps, schema_editor):
+    if schema_editor.connection.vendor == "postgresql":
+        schema_editor.execute(CREATE_TRIGGERS, params=None)
+
+
+def drop_triggers(apps, schema_editor):
+    if schema_editor.connection.vendor == "postgresql":
+        schema_editor.execute(DROP_TRIGGERS, params=None)
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("airport", "0009_airplane_image_variants"),
+    ]
+
+    operations = [
+        migrations.RunPython(create_triggers, drop_triggers),
+    ]
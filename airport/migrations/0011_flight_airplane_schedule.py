@@ -0,0 +1,48 @@
+# Generated by Django 4.2.3 on 2026-10-19 02:38
+
+from django.db import migrations, models
+
+# Flights of an airplane can't overlap, back to back flights are fine.
+# Deferrable so rescheduling several flights can be checked at commit.
+# The airplane is compared as a one value range, which GiST indexes
+# without the btree_gist extension.
+CREATE_CONSTRAINT = """
+ALTER TABLE airport_flight ADD CONSTRAINT flight_airplane_no_overlap
+EXCLUDE USING gist (
+    int8range(airplane_id, airplane_id, '[]') WITH &&,
+    tstzrange(departure_time, arrival_time, '[)') WITH &&
+)
+WHERE (departure_time < arrival_time)
+DEFERRABLE INITIALLY IMMEDIATE;
+"""
+
+DROP_CONSTRAINT = """
+ALTER TABLE airport_flight DROP CONSTRAINT flight_airplane_no_overlap;
+"""
+
+
+def create_constraint(apps, schema_editor):
+    if schema_editor.connection.vendor == "postgresql":
+        schema_editor.execute(CREATE_CONSTRAINT, params=None)
+
+
+def drop_constraint(apps, schema_editor):
+    if schema_editor.connection.vendor == "postgresql":
+        schema_editor.execute(DROP_CONSTRAINT, params=None)
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("airport", "0010_crew_schedule_trigger"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="flight",
+            index=models.Index(
+                fields=["airplane", "departure_time"],
+                name="flight_airplane_departure_idx",
+            ),
+        ),
+        migrations.RunPython(create_constraint, drop_constraint),
+    ]
@@ -0,0 +1,140 @@
+# Generated by Django 4.2.3 on 2026-10-19 03:15
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+# Cancelled flights don't use their airplane anymore
+REPLACE_CONSTRAINT = """
+ALTER TABLE airport_flight DROP CONSTRAINT flight_airplane_no_overlap;
+ALTER TABLE airport_flight ADD CONSTRAINT flight_airplane_no_overlap
+EXCLUDE USING gist (
+    int8range(airplane_id, airplane_id, '[]') WITH &&,
+    tstzrange(departure_time, arrival_time, '[)') WITH &&
+)
+WHERE (departure_time < arrival_time AND cancelled_at IS NULL)
+DEFERRABLE INITIALLY IMMEDIATE;
+"""
+
+RESTORE_CONSTRAINT = """
+ALTER TABLE airport_flight DROP CONSTRAINT flight_airplane_no_overlap;
+ALTER TABLE airport_flight ADD CONSTRAINT flight_airplane_no_overlap
+EXCLUDE USING gist (
+    int8range(airplane_id, airplane_id, '[]') WITH &&,
+    tstzrange(departure_time, arrival_time, '[)') WITH &&
+)
+WHERE (departure_time < arrival_time)
+DEFERRABLE INITIALLY IMMEDIATE;
+"""
+
+
+def replace_constraint(apps, schema_editor):
+    if schema_editor.connection.vendor == "postgresql":
+        schema_editor.execute(REPLACE_CONSTRAINT, params=None)
+
+
+def restore_constraint(apps, schema_editor):
+    if schema_editor.connection.vendor == "postgresql":
+        schema_editor.execute(RESTORE_CONSTRAINT, params=None)
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("airport", "0011_flight_airplane_schedule"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="Refund",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("amount", models.DecimalField(decimal_places=2, max_digits=10)),
+                ("reason", models.CharField(max_length=255)),
+                (
+                    "status",
+                    models.CharField(
+                        choices=[
+                            ("Pending", "Pending"),
+                            ("Succeeded", "Succeeded"),
+                            ("Failed", "Failed"),
+                        ],
+                        default="Pending",
+                        max_length=10,
+                    ),
+                ),
+                ("attempts", models.PositiveSmallIntegerField(default=0)),
+                ("error", models.TextField(blank=True)),
+                ("stripe_refund_id", models.CharField(blank=True, max_length=255)),
+                ("created_at", models.DateTimeField(auto_now_add=True)),
+                ("processed_at", models.DateTimeField(blank=True, null=True)),
+            ],
+            options={
+                "ordering": ("created_at",),
+            },
+        ),
+        migrations.AlterUniqueTogether(
+            name="ticket",
+            unique_together=set(),
+        ),
+        migrations.AddField(
+            model_name="flight",
+            name="cancelled_at",
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.RunPython(replace_constraint, restore_constraint),
+        migrations.AddField(
+            model_name="order",
+            name="cancelled_at",
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name="ticket",
+            name="cancelled_at",
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AlterField(
+            model_name="payment",
+            name="status_payment",
+            field=models.CharField(
+                choices=[
+                    ("Pending", "Pending"),
+                    ("Paid", "Paid"),
+                    ("Cancelled", "Cancelled"),
+                    ("Refund pending", "Refund pending"),
+                    ("Refunded", "Refunded"),
+                ],
+                default="Pending",
+                max_length=20,
+            ),
+        ),
+        migrations.AddConstraint(
+            model_name="ticket",
+            constraint=models.UniqueConstraint(
+                condition=models.Q(("cancelled_at__isnull", True)),
+                fields=("flight", "row", "seat"),
+                name="unique_flight_active_seat",
+            ),
+        ),
+        migrations.AddField(
+            model_name="refund",
+            name="payment",
+            field=models.ForeignKey(
+                on_delete=django.db.models.deletion.CASCADE,
+                related_name="refunds",
+                to="airport.payment",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="refund",
+            index=models.Index(
+                fields=["status", "created_at"], name="refund_status_created_idx"
+            ),
+        ),
+    ]
@@ -0,0 +1,81 @@
+# Generated by Django 4.2.3 on 2026-10-19 03:38
+
+from django.db import migrations
+
+# The crews of the checked flight are locked before looking for overlaps,
+# so of two transactions adding overlapping flights for a crew member the
+# second waits for the first and, in a new snapshot, sees its flight.
+# NO KEY UPDATE doesn't conflict with the key share locks taken by the
+# foreign keys of airport_flight_crews, which would deadlock.
+CHECK_FUNCTION = """
+CREATE OR REPLACE FUNCTION airport_check_crew_schedule() RETURNS trigger AS $$
+DECLARE
+    checked_flight_id bigint;
+    conflict RECORD;
+BEGIN
+    IF TG_TABLE_NAME = 'airport_flight' THEN
+        checked_flight_id := NEW.id;
+    ELSE
+        checked_flight_id := NEW.flight_id;
+    END IF;
+    {lock}
+    SELECT crew.crew_id, crew.flight_id, other_crew.flight_id AS other_id
+    INTO conflict
+    FROM airport_flight_crews crew
+    JOIN airport_flight flight ON flight.id = crew.flight_id
+    JOIN airport_flight_crews other_crew
+        ON other_crew.crew_id = crew.crew_id
+        AND other_crew.flight_id <> crew.flight_id
+    JOIN airport_flight other ON other.id = other_crew.flight_id
+    WHERE crew.flight_id = checked_flight_id
+    AND flight.departure_time < flight.arrival_time
+    AND other.departure_time < other.arrival_time
+    AND flight.departure_time < other.arrival_time
+    AND other.departure_time < flight.arrival_time
+    LIMIT 1;
+
+    IF FOUND THEN
+        RAISE EXCEPTION
+            'Crew % is already assigned to overlapping flights %.',
+            conflict.crew_id, conflict.other_id
+        USING ERRCODE = 'exclusion_violation';
+    END IF;
+
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+"""
+
+LOCK_CREWS = """
+    PERFORM 1 FROM airport_crew
+    WHERE id IN (
+        SELECT crew_id FROM airport_flight_crews
+        WHERE flight_id = checked_flight_id
+    )
+    ORDER BY id
+    FOR NO KEY UPDATE;
+"""
+
+
+def lock_crews(apps, schema_editor):
+    if schema_editor.connection.vendor == "postgresql":
+        schema_editor.execute(
+            CHECK_FUNCTION.replace("{lock}", LOCK_CREWS), params=None
+        )
+
+
+def unlock_crews(apps, schema_editor):
+    if schema_editor.connection.vendor == "postgresql":
+        schema_editor.execute(
+            CHECK_FUNCTION.replace("{lock}", ""), params=None
+        )
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("airport", "0012_cancellation"),
+    ]
+
+    operations = [
+        migrations.RunPython(lock_crews, unlock_crews),
+    ]
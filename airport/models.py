@@ -1,9 +1,12 @@
 import os
 import uuid
+from datetime import timedelta
 
 from django.conf import settings
 from django.core.exceptions import ValidationError
+from django.core.serializers.json import DjangoJSONEncoder
 from django.db import models
+from django.utils import timezone
 from django.utils.text import slugify
 
 
@@ -52,6 +55,8 @@ class Airplane(models.Model):
     image = models.ImageField(
         null=True, upload_to=airplane_image_file_path
     )
+    # Resized copies of the image, see airport.images
+    image_variants = models.JSONField(default=dict, blank=True)
     airplane_type = models.ForeignKey(
         AirplaneType, on_delete=models.CASCADE, related_name="airplanes"
     )
@@ -108,16 +113,31 @@ class Flight(models.Model):
     departure_time = models.DateTimeField(blank=True, null=True)
     arrival_time = models.DateTimeField(blank=True, null=True)
     crews = models.ManyToManyField(Crew, blank=True)
+    cancelled_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            # Flights of an airplane around a time, see airport.scheduling
+            models.Index(
+                fields=["airplane", "departure_time"],
+                name="flight_airplane_departure_idx",
+            ),
+        ]
 
     def __str__(self):
         return str(self.id)
 
+    def active_tickets(self):
+        return self.flight_ticket.filter(cancelled_at__isnull=True)
+
 
 class Order(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     user = models.ForeignKey(
         settings.AUTH_USER_MODEL, on_delete=models.CASCADE
     )
+    # Set once none of its tickets is left
+    cancelled_at = models.DateTimeField(null=True, blank=True)
 
     class Meta:
         ordering = ["-created_at"]
@@ -126,7 +146,11 @@ class Order(models.Model):
         return str(self.created_at)
 
     def total_cost(self):
-        return sum(ticket.get_cost() for ticket in self.tickets.all())
+        return sum(
+            ticket.get_cost()
+            for ticket in self.tickets.all()
+            if ticket.cancelled_at is None
+        )
 
 
 class Ticket(models.Model):
@@ -141,9 +165,14 @@ class Ticket(models.Model):
     order = models.ForeignKey(
         Order, on_delete=models.CASCADE, related_name="tickets"
     )
+    # Cancelled tickets are kept, their seat can be sold again
+    cancelled_at = models.DateTimeField(null=True, blank=True)
 
     @staticmethod
     def validate_ticket(row, seat, flight, error_to_raise):
+        if flight.cancelled_at is not None:
+            raise error_to_raise({"flight": "The flight is cancelled."})
+
         airplane = flight.airplane
         for ticket_attr_value, ticket_attr_name, airplane_attr_name in [
             (row, "row", "rows"),
@@ -182,7 +211,13 @@ class Ticket(models.Model):
         )
 
     class Meta:
-        unique_together = ("flight", "row", "seat")
+        constraints = [
+            models.UniqueConstraint(
+                fields=["flight", "row", "seat"],
+                condition=models.Q(cancelled_at__isnull=True),
+                name="unique_flight_active_seat",
+            ),
+        ]
         ordering = ("row", "seat")
 
     def __str__(self):
@@ -198,22 +233,107 @@ class Payment(models.Model):
     PENDING = "Pending"
     PAID = "Paid"
     CANCELLED = "Cancelled"
+    REFUND_PENDING = "Refund pending"
+    REFUNDED = "Refunded"
 
     STATUS_CHOICES = [
         (PENDING, "Pending"),
         (PAID, "Paid"),
         (CANCELLED, "Cancelled"),
+        (REFUND_PENDING, "Refund pending"),
+        (REFUNDED, "Refunded"),
     ]
 
     order = models.ForeignKey(
         Order, on_delete=models.CASCADE, related_name="payments"
     )
     status_payment = models.CharField(
-        max_length=10, choices=STATUS_CHOICES, default=PENDING
+        max_length=20, choices=STATUS_CHOICES, default=PENDING
     )
     date_payment = models.DateTimeField(auto_now_add=True, null=True)
     session_url = models.URLField(max_length=500, blank=True)
     session_id = models.CharField(max_length=255, blank=True)
+    session_expires_at = models.DateTimeField(null=True, blank=True)
+    amount = models.DecimalField(
+        max_digits=10, decimal_places=2, null=True, blank=True
+    )
 
     def __str__(self) -> str:
         return f"Payment {self.id} ({self.order_id} - {self.order.user})"
+
+    def has_open_session(self, margin=timedelta(0)) -> bool:
+        """Whether the stored checkout session can still be reused"""
+        return bool(
+            self.session_id
+            and self.session_url
+            and self.session_expires_at
+            and self.session_expires_at > timezone.now() + margin
+        )
+
+
+class Refund(models.Model):
+    """Money owed back on a paid payment, sent by `process_refunds`"""
+
+    PENDING = "Pending"
+    SUCCEEDED = "Succeeded"
+    FAILED = "Failed"
+
+    STATUS_CHOICES = [
+        (PENDING, "Pending"),
+        (SUCCEEDED, "Succeeded"),
+        (FAILED, "Failed"),
+    ]
+
+    payment = models.ForeignKey(
+        Payment, on_delete=models.CASCADE, related_name="refunds"
+    )
+    amount = models.DecimalField(max_digits=10, decimal_places=2)
+    reason = models.CharField(max_length=255)
+    status = models.CharField(
+        max_length=10, choices=STATUS_CHOICES, default=PENDING
+    )
+    attempts = models.PositiveSmallIntegerField(default=0)
+    error = models.TextField(blank=True)
+    stripe_refund_id = models.CharField(max_length=255, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    processed_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ("created_at",)
+        indexes = [
+            models.Index(
+                fields=["status", "created_at"],
+                name="refund_status_created_idx",
+            ),
+        ]
+
+    def __str__(self) -> str:
+        return f"Refund {self.id} of payment {self.payment_id}"
+
+
+class IdempotencyKey(models.Model):
+    key = models.CharField(max_length=255)
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name="idempotency_keys"
+    )
+    fingerprint = models.CharField(max_length=64)
+    status_code = models.PositiveSmallIntegerField(null=True)
+    response_body = models.JSONField(null=True, encoder=DjangoJSONEncoder)
+    created_at = models.DateTimeField(auto_now_add=True)
+    expires_at = models.DateTimeField(db_index=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["user", "key"], name="unique_user_idempotency_key"
+            ),
+        ]
+
+    def __str__(self) -> str:
+        return f"{self.key} ({self.user_id})"
+
+    @property
+    def is_expired(self) -> bool:
+        return self.expires_at <= timezone.now()
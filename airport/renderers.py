@@ -0,0 +1,55 @@
+"""
+JSON renderer backed by orjson, when it is installed.
+
+It produces the same JSON as DRF's JSONRenderer: the values orjson
+doesn't encode the same way (Decimal, datetime, lazy translations, ...)
+are passed to DRF's encoder. Indented output, asked for by the browsable
+API, is left to the stdlib encoder.
+"""
+from django.db.models.fields.files import FieldFile
+from rest_framework.renderers import JSONRenderer
+from rest_framework.utils.encoders import JSONEncoder
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover
+    orjson = None
+
+LINE_SEPARATORS = (
+    ("\u2028".encode(), b"\\u2028"),
+    ("\u2029".encode(), b"\\u2029"),
+)
+
+_encoder = JSONEncoder()
+
+
+def encode_default(obj):
+    if isinstance(obj, FieldFile):
+        return obj.url if obj else None
+
+    return _encoder.default(obj)
+
+
+class ORJSONRenderer(JSONRenderer):
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if orjson is None or self.ensure_ascii:
+            return super().render(data, accepted_media_type, renderer_context)
+
+        if data is None:
+            return b""
+
+        if self.get_indent(accepted_media_type, renderer_context or {}):
+            return super().render(data, accepted_media_type, renderer_context)
+
+        ret = orjson.dumps(
+            data,
+            default=encode_default,
+            option=orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_NON_STR_KEYS,
+        )
+
+        # Keep the output a strict javascript subset, as JSONRenderer does
+        for separator, escaped in LINE_SEPARATORS:
+            if separator in ret:
+                ret = ret.replace(separator, escaped)
+
+        return ret
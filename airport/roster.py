@@ -0,0 +1,187 @@
+"""
+Flights of a crew member, as JSON or exported to CSV and iCalendar.
+
+The flights are read with their airplane, route and airport names in one
+query: prefetched for the JSON endpoints, streamed row by row for the
+exports, which can cover any period.
+"""
+import csv
+from datetime import timezone as dt_timezone
+
+from django.db.models import F, Prefetch
+from django.http import StreamingHttpResponse
+from django.utils import timezone
+
+from airport.models import Flight
+
+# Flights returned by the crew detail
+UPCOMING_FLIGHTS = 10
+
+# Rows read from the database at a time by the exports
+EXPORT_CHUNK_SIZE = 500
+
+CSV_HEADER = [
+    "flight",
+    "source",
+    "destination",
+    "airplane",
+    "departure_time",
+    "arrival_time",
+]
+
+
+def roster_flights(start, end=None):
+    """Flights in the air during [start, end), by departure"""
+    flights = Flight.objects.filter(arrival_time__gt=start)
+
+    if end is not None:
+        flights = flights.filter(departure_time__lt=end)
+
+    return (
+        flights.filter(departure_time__lt=F("arrival_time"))
+        .select_related("route__source", "route__destination", "airplane")
+        .only(
+            "id",
+            "departure_time",
+            "arrival_time",
+            "route__source__name",
+            "route__destination__name",
+            "airplane__name",
+        )
+        .order_by("departure_time", "id")
+    )
+
+
+def upcoming_flights_prefetch():
+    """The next flights of the crews, as their `upcoming_flights`"""
+    return Prefetch(
+        "flight_set",
+        queryset=roster_flights(timezone.now())[:UPCOMING_FLIGHTS],
+        to_attr="upcoming_flights",
+    )
+
+
+def roster_prefetch(start, end):
+    """The flights of the crews in the period, as their `roster_flights`"""
+    return Prefetch(
+        "flight_set",
+        queryset=roster_flights(start, end),
+        to_attr="roster_flights",
+    )
+
+
+class Echo:
+    """File-like object returning what is written, for csv.writer"""
+
+    def write(self, value):
+        return value
+
+
+def csv_lines(flights):
+    writer = csv.writer(Echo())
+    yield writer.writerow(CSV_HEADER)
+
+    for flight in flights:
+        yield writer.writerow(
+            [
+                flight.id,
+                flight.route.source.name,
+                flight.route.destination.name,
+                flight.airplane.name,
+                flight.departure_time.isoformat(),
+                flight.arrival_time.isoformat(),
+            ]
+        )
+
+
+def ics_text(value):
+    """Escape a TEXT value of iCalendar (RFC 5545 3.3.11)"""
+    return (
+        value.replace("\\", "\\\\")
+        .replace(";", "\\;")
+        .replace(",", "\\,")
+        .replace("\n", "\\n")
+    )
+
+
+def ics_time(value):
+    return value.astimezone(dt_timezone.utc).strftime("%Y%m%dT%H%M%SZ")
+
+
+def ics_line(line):
+    """Fold a content line at 75 octets, ended by CRLF"""
+    encoded = line.encode()
+    parts = []
+
+    while len(encoded) > 75:
+        cut = 75 if not parts else 74
+        # Don't split a multi-byte character
+        while encoded[cut] & 0xC0 == 0x80:
+            cut -= 1
+        parts.append(encoded[:cut].decode())
+        encoded = encoded[cut:]
+    parts.append(encoded.decode())
+
+    return "\r\n ".join(parts) + "\r\n"
+
+
+def ics_lines(crew, flights):
+    stamp = ics_time(timezone.now())
+
+    yield "".join(
+        ics_line(line)
+        for line in (
+            "BEGIN:VCALENDAR",
+            "VERSION:2.0",
+            "PRODID:-//Airport Management API//Crew roster//EN",
+            "CALSCALE:GREGORIAN",
+            f"X-WR-CALNAME:{ics_text(f'{crew.full_name} roster')}",
+        )
+    )
+
+    for flight in flights:
+        source = flight.route.source.name
+        destination = flight.route.destination.name
+
+        yield "".join(
+            ics_line(line)
+            for line in (
+                "BEGIN:VEVENT",
+                f"UID:flight-{flight.id}-crew-{crew.id}@airport",
+                f"DTSTAMP:{stamp}",
+                f"DTSTART:{ics_time(flight.departure_time)}",
+                f"DTEND:{ics_time(flight.arrival_time)}",
+                "SUMMARY:"
+                + ics_text(f"Flight {flight.id}: {source} - {destination}"),
+                f"LOCATION:{ics_text(source)}",
+                f"DESCRIPTION:{ics_text(f'Airplane {flight.airplane.name}')}",
+                "END:VEVENT",
+            )
+        )
+
+    yield ics_line("END:VCALENDAR")
+
+
+def roster_export(crew, start, end, export):
+    """StreamingHttpResponse of the flights of the crew as csv or ics"""
+    flights = (
+        roster_flights(start, end)
+        .filter(crews=crew)
+        .iterator(chunk_size=EXPORT_CHUNK_SIZE)
+    )
+
+    if export == "csv":
+        response = StreamingHttpResponse(
+            csv_lines(flights), content_type="text/csv"
+        )
+    else:
+        response = StreamingHttpResponse(
+            ics_lines(crew, flights),
+            content_type="text/calendar; charset=utf-8",
+        )
+
+    response["Content-Disposition"] = (
+        f'attachment; filename="crew-{crew.id}-roster.{export}"'
+    )
+
+    return response
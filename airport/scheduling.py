@@ -0,0 +1,321 @@
+"""
+Overlapping flights of crew members and airplanes.
+
+A crew member or an airplane can't fly two flights whose
+[departure_time, arrival_time) intervals overlap, back to back flights
+are fine. Flights without both times, or arriving before they depart,
+never conflict. Cancelled flights keep their airplane but not their
+crews (see airport.cancellation), and are skipped for the airplane.
+
+Crew writes are checked against an `IntervalIndex` of the flights of the
+crews involved, loaded in one query, and airplane writes with a range
+query on the (airplane, departure_time) index. On PostgreSQL a deferred
+constraint trigger (migrations 0010 and 0013) and an exclusion
+constraint (migration 0011) check the same in the database. The trigger
+locks the crews of the flight first, so concurrent assignments of a
+crew member are checked one after the other and can't both commit.
+Their errors are turned into a ValidationError by
+`schedule_integrity_errors`.
+"""
+from bisect import bisect_left
+from collections import defaultdict
+from contextlib import contextmanager
+from datetime import timedelta
+
+from django.db import IntegrityError, connection
+from django.db.models import (
+    DateTimeField,
+    DurationField,
+    ExpressionWrapper,
+    F,
+    Value,
+    Window,
+)
+from django.db.models.functions import Coalesce, Lag
+from rest_framework.exceptions import ValidationError
+
+from airport.models import Flight
+
+# SQLSTATE of the errors raised by the scheduling constraints
+EXCLUSION_VIOLATION = "23P01"
+
+AIRPLANE_CONSTRAINT = "flight_airplane_no_overlap"
+
+FlightCrew = Flight.crews.through
+
+
+def is_interval(start, end):
+    return start is not None and end is not None and start < end
+
+
+class IntervalIndex:
+    """
+    Intervals grouped by key, sorted by start. `max_ends[i]` is the
+    latest end of the first i + 1 intervals, so a search stops as soon
+    as no earlier interval can reach the start of the searched one.
+    """
+
+    def __init__(self, intervals=()):
+        grouped = defaultdict(list)
+
+        for key, start, end, value in intervals:
+            if is_interval(start, end):
+                grouped[key].append((start, end, value))
+
+        self._starts = {}
+        self._intervals = {}
+        self._max_ends = {}
+
+        for key, items in grouped.items():
+            items.sort(key=lambda item: item[0])
+            max_ends = []
+            for _, end, _ in items:
+                max_ends.append(max(end, max_ends[-1]) if max_ends else end)
+
+            self._starts[key] = [start for start, _, _ in items]
+            self._intervals[key] = items
+            self._max_ends[key] = max_ends
+
+    def overlapping(self, key, start, end):
+        """(start, end, value) of the intervals of `key` overlapping"""
+        if not is_interval(start, end) or key not in self._intervals:
+            return []
+
+        intervals = self._intervals[key]
+        max_ends = self._max_ends[key]
+        found = []
+
+        # Intervals starting before `end`, scanned while they can reach
+        i = bisect_left(self._starts[key], end) - 1
+        while i >= 0 and max_ends[i] > start:
+            if intervals[i][1] > start:
+                found.append(intervals[i])
+            i -= 1
+
+        return found[::-1]
+
+    def overlaps(self):
+        """(key, interval, other interval) of every overlapping pair"""
+        for key, intervals in self._intervals.items():
+            active = []
+
+            for interval in intervals:
+                active = [item for item in active if item[1] > interval[0]]
+                for other in active:
+                    yield key, other, interval
+                active.append(interval)
+
+
+def crew_flight_rows(crew_ids, exclude_flights=()):
+    """(crew id, departure, arrival, flight id) of the crews' flights"""
+    return (
+        FlightCrew.objects.filter(crew_id__in=crew_ids)
+        .exclude(flight_id__in=exclude_flights)
+        .values_list(
+            "crew_id",
+            "flight__departure_time",
+            "flight__arrival_time",
+            "flight_id",
+        )
+    )
+
+
+def crew_flight_index(crew_ids, exclude_flight=None):
+    """IntervalIndex of the flights of the crews, by crew id"""
+    return IntervalIndex(
+        crew_flight_rows(
+            crew_ids,
+            exclude_flights=[] if exclude_flight is None else [exclude_flight],
+        )
+    )
+
+
+def crew_conflict_message(crew_id, flight_ids):
+    return (
+        f"Crew {crew_id} is already assigned to overlapping "
+        f"flights {', '.join(map(str, flight_ids))}."
+    )
+
+
+def crew_conflicts(crew_ids, departure_time, arrival_time, flight_id=None):
+    """{crew id: ids of its other flights overlapping the interval}"""
+    index = crew_flight_index(crew_ids, exclude_flight=flight_id)
+    conflicts = {}
+
+    for crew_id in crew_ids:
+        overlapping = index.overlapping(crew_id, departure_time, arrival_time)
+        if overlapping:
+            conflicts[crew_id] = [value for _, _, value in overlapping]
+
+    return conflicts
+
+
+def validate_crew_schedule(crews, departure_time, arrival_time, flight_id):
+    """Raise a ValidationError if a crew member would fly two flights"""
+    conflicts = crew_conflicts(
+        [crew.id for crew in crews], departure_time, arrival_time, flight_id
+    )
+
+    if conflicts:
+        raise ValidationError(
+            {
+                "crews": [
+                    crew_conflict_message(crew_id, flight_ids)
+                    for crew_id, flight_ids in conflicts.items()
+                ]
+            }
+        )
+
+
+def validate_airplane_schedule(
+    airplane, departure_time, arrival_time, flight_id
+):
+    """Raise a ValidationError if the airplane is already flying"""
+    if airplane is None or not is_interval(departure_time, arrival_time):
+        return
+
+    overlapping = (
+        Flight.objects.filter(
+            airplane=airplane,
+            departure_time__lt=arrival_time,
+            arrival_time__gt=departure_time,
+            cancelled_at__isnull=True,
+        )
+        .exclude(pk=flight_id)
+        .values_list("id", flat=True)
+    )
+
+    if overlapping:
+        raise ValidationError(
+            {
+                "airplane": [
+                    "The airplane is already used by overlapping flights "
+                    f"{', '.join(map(str, overlapping))}."
+                ]
+            }
+        )
+
+
+def airplane_timeline(airplane, start, end):
+    """
+    Flights of the airplane in [start, end) and its idle gaps between
+    them. The end of the previous flight comes from a window function,
+    so every row carries its own gap.
+    """
+    previous_arrival = Coalesce(
+        Window(Lag("arrival_time"), order_by=F("departure_time").asc()),
+        Value(start, output_field=DateTimeField()),
+    )
+    flights = list(
+        Flight.objects.filter(
+            airplane=airplane,
+            departure_time__lt=end,
+            arrival_time__gt=start,
+            cancelled_at__isnull=True,
+        )
+        .filter(departure_time__lt=F("arrival_time"))
+        .annotate(
+            idle_since=previous_arrival,
+            idle_before=ExpressionWrapper(
+                F("departure_time") - previous_arrival,
+                output_field=DurationField(),
+            ),
+        )
+        .order_by("departure_time")
+        .values(
+            "id",
+            "route_id",
+            "departure_time",
+            "arrival_time",
+            "idle_since",
+            "idle_before",
+        )
+    )
+
+    gaps = [
+        {"start": flight["idle_since"], "end": flight["departure_time"]}
+        for flight in flights
+        if flight["idle_before"] > timedelta()
+    ]
+    last_arrival = flights[-1]["arrival_time"] if flights else start
+    if last_arrival < end:
+        gaps.append({"start": last_arrival, "end": end})
+
+    idle = sum((gap["end"] - gap["start"] for gap in gaps), timedelta())
+    busy = end - start - idle
+
+    return {
+        "airplane": airplane.id,
+        "start": start,
+        "end": end,
+        "flights": flights,
+        "gaps": gaps,
+        "busy_hours": busy.total_seconds() / 3600,
+        "utilization": busy / (end - start),
+    }
+
+
+def all_crew_conflicts(since=None):
+    """
+    Every pair of overlapping flights of a crew member, from one query
+    and one sweep of the flights sorted by crew and departure
+    """
+    rows = FlightCrew.objects.all()
+
+    if since is not None:
+        rows = rows.filter(flight__arrival_time__gt=since)
+
+    index = IntervalIndex(
+        rows.values_list(
+            "crew_id",
+            "flight__departure_time",
+            "flight__arrival_time",
+            "flight_id",
+        )
+    )
+
+    conflicts = [
+        {
+            "crew": crew_id,
+            "flight": first_id,
+            "other_flight": second_id,
+            "overlap_start": second_start,
+            "overlap_end": min(first_end, second_end),
+        }
+        for crew_id, (_, first_end, first_id), (
+            second_start, second_end, second_id
+        ) in index.overlaps()
+    ]
+    conflicts.sort(key=lambda item: (item["crew"], item["overlap_start"]))
+
+    return conflicts
+
+
+def defer_schedule_constraints():
+    """Check the airplane constraint at commit in this transaction"""
+    if connection.vendor == "postgresql":
+        with connection.cursor() as cursor:
+            cursor.execute(f"SET CONSTRAINTS {AIRPLANE_CONSTRAINT} DEFERRED")
+
+
+@contextmanager
+def schedule_integrity_errors():
+    """Turn the errors of the scheduling constraints into a 400"""
+    try:
+        yield
+    except IntegrityError as error:
+        cause = error.__cause__
+        if getattr(cause, "pgcode", None) != EXCLUSION_VIOLATION:
+            raise
+
+        if cause.diag.constraint_name == AIRPLANE_CONSTRAINT:
+            raise ValidationError(
+                {
+                    "airplane": [
+                        "The airplane is already used by an overlapping "
+                        "flight."
+                    ]
+                }
+            )
+
+        raise ValidationError({"crews": [cause.diag.message_primary]})
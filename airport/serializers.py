@@ -1,7 +1,19 @@
+from datetime import timedelta
+from operator import itemgetter
+
 from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+from django.utils.functional import cached_property
+from drf_spectacular.utils import extend_schema_field
 from rest_framework import serializers
 from rest_framework.exceptions import ValidationError
 
+from airport.assignments import MAX_ASSIGNMENTS
+from airport.cancellation import SEAT_TAKEN, taken_seat_errors
+from airport.duty import FlightChange, validate_crew_duty
+from airport.dynamic_fields import DynamicFieldsModelSerializer, subtree
+from airport.media import media_url, media_url_prefix
 from airport.models import (
     AirplaneType,
     Airport,
@@ -13,27 +25,32 @@ from airport.models import (
     Ticket,
     Payment,
 )
+from airport.scheduling import (
+    validate_airplane_schedule,
+    validate_crew_schedule,
+)
+from airport.uploads import CONTENT_TYPES
 
 
-class AirplaneTypeSerializer(serializers.ModelSerializer):
+class AirplaneTypeSerializer(DynamicFieldsModelSerializer):
     class Meta:
         model = AirplaneType
         fields = ("id", "name")
 
 
-class AirportSerializer(serializers.ModelSerializer):
+class AirportSerializer(DynamicFieldsModelSerializer):
     class Meta:
         model = Airport
         fields = ("id", "name", "closest_big_city")
 
 
-class RouteSerializer(serializers.ModelSerializer):
+class RouteSerializer(DynamicFieldsModelSerializer):
     class Meta:
         model = Route
         fields = ("id", "source", "destination", "distance")
 
 
-class RouteListSerializer(serializers.ModelSerializer):
+class RouteListSerializer(DynamicFieldsModelSerializer):
     source = AirportSerializer(read_only=True)
     destination = AirportSerializer(read_only=True)
 
@@ -42,7 +59,7 @@ class RouteListSerializer(serializers.ModelSerializer):
         fields = ("id", "source", "destination", "distance")
 
 
-class AirplaneSerializer(serializers.ModelSerializer):
+class AirplaneSerializer(DynamicFieldsModelSerializer):
     class Meta:
         model = Airplane
         fields = (
@@ -50,10 +67,43 @@ class AirplaneSerializer(serializers.ModelSerializer):
         )
 
 
-class AirplaneListSerializer(serializers.ModelSerializer):
+class MediaImageField(serializers.ImageField):
+    """ImageField output as a URL under media_url_prefix()"""
+
+    def to_representation(self, value):
+        if not value:
+            return None
+
+        prefix = media_url_prefix(self.context.get("request"))
+
+        return media_url(value.name, prefix)
+
+
+@extend_schema_field(
+    {"type": "object", "additionalProperties": {"type": "string"}}
+)
+class ImageVariantsField(serializers.Field):
+    """URLs of the image variants of an airplane, by variant name"""
+
+    def __init__(self, **kwargs):
+        kwargs["read_only"] = True
+        super().__init__(**kwargs)
+
+    def to_representation(self, value):
+        prefix = media_url_prefix(self.context.get("request"))
+
+        return {
+            name: media_url(file_name, prefix)
+            for name, file_name in sorted((value or {}).items())
+        }
+
+
+class AirplaneListSerializer(DynamicFieldsModelSerializer):
     airplane_type_name = serializers.CharField(
         source="airplane_type.name", read_only=True
     )
+    image = MediaImageField(read_only=True)
+    image_variants = ImageVariantsField()
 
     class Meta:
         model = Airplane
@@ -62,14 +112,18 @@ class AirplaneListSerializer(serializers.ModelSerializer):
             "name",
             "airplane_type_name",
             "image",
+            "image_variants",
             "rows",
             "seats_in_row",
             "capacity"
         )
+        field_lookups = {"capacity": ("rows", "seats_in_row")}
 
 
-class AirplaneDetailSerializer(serializers.ModelSerializer):
+class AirplaneDetailSerializer(DynamicFieldsModelSerializer):
     airplane_type = AirplaneTypeSerializer(many=False, read_only=True)
+    image = MediaImageField(read_only=True)
+    image_variants = ImageVariantsField()
 
     class Meta:
         model = Airplane
@@ -78,19 +132,99 @@ class AirplaneDetailSerializer(serializers.ModelSerializer):
             "name",
             "airplane_type",
             "image",
+            "image_variants",
             "rows",
             "seats_in_row",
             "capacity"
         )
+        field_lookups = {"capacity": ("rows", "seats_in_row")}
+
 
+class AirplaneImageSerializer(DynamicFieldsModelSerializer):
+    image = MediaImageField(max_length=100, allow_null=True, required=False)
 
-class AirplaneImageSerializer(serializers.ModelSerializer):
     class Meta:
         model = Airplane
         fields = ("id", "image")
 
 
-class CrewSerializer(serializers.ModelSerializer):
+class AirplaneImageUploadUrlSerializer(serializers.Serializer):
+    content_type = serializers.ChoiceField(
+        choices=list(CONTENT_TYPES), write_only=True
+    )
+    upload_url = serializers.URLField(read_only=True)
+    upload_key = serializers.CharField(read_only=True)
+    method = serializers.CharField(read_only=True)
+    headers = serializers.DictField(
+        child=serializers.CharField(), read_only=True
+    )
+    expires_in = serializers.IntegerField(read_only=True)
+
+
+class AirplaneImageFinalizeSerializer(serializers.Serializer):
+    upload_key = serializers.CharField(max_length=255)
+
+
+class TimelinePeriodSerializer(serializers.Serializer):
+    start = serializers.DateTimeField(required=False)
+    end = serializers.DateTimeField(required=False)
+
+    default_period = timedelta(days=7)
+
+    def max_period(self, attrs):
+        return timedelta(days=366)
+
+    def validate(self, attrs):
+        start = attrs.setdefault("start", timezone.now())
+        end = attrs.setdefault("end", start + self.default_period)
+
+        if end <= start:
+            raise ValidationError({"end": "The end must be after the start."})
+
+        max_period = self.max_period(attrs)
+        if max_period is not None and end - start > max_period:
+            raise ValidationError({"end": "The period can't exceed a year."})
+
+        return attrs
+
+
+class RosterPeriodSerializer(TimelinePeriodSerializer):
+    export = serializers.ChoiceField(choices=["csv", "ics"], required=False)
+
+    default_period = timedelta(days=30)
+
+    def max_period(self, attrs):
+        # Exports are streamed, they can cover any period
+        if attrs.get("export"):
+            return None
+
+        return super().max_period(attrs)
+
+
+class TimelineFlightSerializer(serializers.Serializer):
+    flight = serializers.IntegerField(source="id")
+    route = serializers.IntegerField(source="route_id")
+    departure_time = serializers.DateTimeField()
+    arrival_time = serializers.DateTimeField()
+    idle_before = serializers.DurationField()
+
+
+class TimelineGapSerializer(serializers.Serializer):
+    start = serializers.DateTimeField()
+    end = serializers.DateTimeField()
+
+
+class AirplaneTimelineSerializer(serializers.Serializer):
+    airplane = serializers.IntegerField()
+    start = serializers.DateTimeField()
+    end = serializers.DateTimeField()
+    flights = TimelineFlightSerializer(many=True)
+    gaps = TimelineGapSerializer(many=True)
+    busy_hours = serializers.FloatField()
+    utilization = serializers.FloatField()
+
+
+class CrewSerializer(DynamicFieldsModelSerializer):
     class Meta:
         model = Crew
         fields = (
@@ -98,32 +232,281 @@ class CrewSerializer(serializers.ModelSerializer):
         )
 
 
-class CrewListSerializer(serializers.ModelSerializer):
+class CrewListSerializer(DynamicFieldsModelSerializer):
     class Meta:
         model = Crew
         fields = (
             "id", "position", "full_name",
         )
+        field_lookups = {"full_name": ("first_name", "last_name")}
+
+
+class CrewFlightSerializer(DynamicFieldsModelSerializer):
+    source = serializers.CharField(source="route.source.name")
+    destination = serializers.CharField(source="route.destination.name")
+    airplane = serializers.CharField(source="airplane.name")
+    departure_time = serializers.DateTimeField(format="%Y-%m-%d %H:%M")
+    arrival_time = serializers.DateTimeField(format="%Y-%m-%d %H:%M")
+
+    class Meta:
+        model = Flight
+        fields = (
+            "id",
+            "source",
+            "destination",
+            "airplane",
+            "departure_time",
+            "arrival_time",
+        )
+
+
+class CrewDetailSerializer(DynamicFieldsModelSerializer):
+    upcoming_flights = CrewFlightSerializer(many=True, read_only=True)
+
+    class Meta:
+        model = Crew
+        fields = (
+            "id",
+            "position",
+            "first_name",
+            "last_name",
+            "upcoming_flights",
+        )
+
+
+class CrewRosterSerializer(DynamicFieldsModelSerializer):
+    flights = CrewFlightSerializer(
+        source="roster_flights", many=True, read_only=True
+    )
+
+    class Meta:
+        model = Crew
+        fields = ("id", "position", "full_name", "flights")
+        field_lookups = {"full_name": ("first_name", "last_name")}
+
+
+class CrewAvailabilitySerializer(serializers.Serializer):
+    position = serializers.CharField(required=False)
+
+    def get_fields(self):
+        # "from" is a keyword, it can't be declared as an attribute
+        fields = super().get_fields()
+        fields["from"] = serializers.DateTimeField()
+        fields["to"] = serializers.DateTimeField()
+
+        return fields
+
+    def validate(self, attrs):
+        if attrs["to"] <= attrs["from"]:
+            raise ValidationError({"to": "The end must be after the start."})
+
+        return attrs
+
+
+class CrewAvailableSerializer(serializers.ModelSerializer):
+    duty_hours = serializers.SerializerMethodField()
+
+    class Meta:
+        model = Crew
+        fields = ("id", "position", "full_name", "duty_hours")
+
+    def get_duty_hours(self, crew) -> float:
+        return crew.duty_time.total_seconds() / 3600
+
+
+class CrewConflictSerializer(serializers.Serializer):
+    crew = serializers.IntegerField()
+    flight = serializers.IntegerField()
+    other_flight = serializers.IntegerField()
+    overlap_start = serializers.DateTimeField()
+    overlap_end = serializers.DateTimeField()
+
+
+class CrewDutyMonthSerializer(serializers.Serializer):
+    month = serializers.DateField(input_formats=["%Y-%m"], required=False)
+
+
+class CrewDutyChangeSerializer(serializers.Serializer):
+    flight = serializers.PrimaryKeyRelatedField(
+        queryset=Flight.objects.all(), required=False, allow_null=True
+    )
+    departure_time = serializers.DateTimeField(required=False)
+    arrival_time = serializers.DateTimeField(required=False)
+    crews = serializers.PrimaryKeyRelatedField(
+        queryset=Crew.objects.all(), many=True, required=False
+    )
+
+    def validate(self, attrs):
+        flight = attrs.get("flight")
+
+        if flight is None and not (
+            "departure_time" in attrs and "arrival_time" in attrs
+        ):
+            raise ValidationError("The times of a new flight are required.")
+
+        departure_time = attrs.get(
+            "departure_time", getattr(flight, "departure_time", None)
+        )
+        arrival_time = attrs.get(
+            "arrival_time", getattr(flight, "arrival_time", None)
+        )
+
+        crews = attrs.get("crews")
+        if crews is None:
+            crews = list(flight.crews.all()) if flight else []
+
+        return FlightChange(
+            getattr(flight, "pk", None),
+            departure_time,
+            arrival_time,
+            [(crew.id, crew.position) for crew in crews],
+        )
+
+
+class CrewDutyCheckSerializer(serializers.Serializer):
+    changes = CrewDutyChangeSerializer(many=True, allow_empty=False)
+
+
+class CrewDutyViolationSerializer(serializers.Serializer):
+    crew = serializers.IntegerField()
+    rule = serializers.CharField()
+    start = serializers.DateTimeField()
+    end = serializers.DateTimeField()
+    hours = serializers.FloatField()
+    limit = serializers.FloatField()
+    flights = serializers.ListField(
+        child=serializers.IntegerField(allow_null=True)
+    )
 
 
-class FlightSerializer(serializers.ModelSerializer):
+class FlightSerializer(DynamicFieldsModelSerializer):
+
+    def validate(self, attrs):
+        data = super().validate(attrs)
+        instance = self.instance
+
+        departure_time = attrs.get(
+            "departure_time", getattr(instance, "departure_time", None)
+        )
+        arrival_time = attrs.get(
+            "arrival_time", getattr(instance, "arrival_time", None)
+        )
+        flight_id = getattr(instance, "pk", None)
+
+        crews = attrs.get("crews")
+        if crews is None:
+            crews = list(instance.crews.all()) if instance else []
+
+        validate_airplane_schedule(
+            attrs.get("airplane", getattr(instance, "airplane", None)),
+            departure_time,
+            arrival_time,
+            flight_id,
+        )
+        validate_crew_schedule(crews, departure_time, arrival_time, flight_id)
+        validate_crew_duty(crews, departure_time, arrival_time, flight_id)
+
+        return data
+
     class Meta:
         model = Flight
         fields = (
-            "id", "airplane", "route", "departure_time", "arrival_time"
+            "id",
+            "airplane",
+            "route",
+            "departure_time",
+            "arrival_time",
+            "crews",
         )
 
 
-class FlightListSerializer(serializers.ModelSerializer):
+class CrewAssignmentSerializer(serializers.Serializer):
+    flight = serializers.IntegerField()
+    crews = serializers.ListField(child=serializers.IntegerField())
+
+
+class BulkCrewAssignmentSerializer(serializers.Serializer):
+    assignments = CrewAssignmentSerializer(many=True, allow_empty=False)
+
+    def validate_assignments(self, value):
+        if len(value) > MAX_ASSIGNMENTS:
+            raise ValidationError(
+                f"Ensure there are no more than {MAX_ASSIGNMENTS} "
+                "assignments."
+            )
+
+        return value
+
+
+class CrewAssignmentResultSerializer(serializers.Serializer):
+    flight = serializers.IntegerField()
+    crews = serializers.ListField(child=serializers.IntegerField())
+    added = serializers.ListField(child=serializers.IntegerField())
+    removed = serializers.ListField(child=serializers.IntegerField())
+
+
+class FlightDelaySerializer(serializers.Serializer):
+    delay = serializers.DurationField()
+    cascade = serializers.BooleanField(default=False)
+    dry_run = serializers.BooleanField(default=False)
+
+    def validate_delay(self, value):
+        if value <= timedelta():
+            raise ValidationError("The delay must be positive.")
+
+        return value
+
+
+class DelayedFlightSerializer(serializers.Serializer):
+    flight = serializers.IntegerField()
+    delay = serializers.DurationField()
+    departure_time = serializers.DateTimeField()
+    arrival_time = serializers.DateTimeField()
+    reasons = serializers.ListField(child=serializers.CharField())
+
+
+class FlightDelayResultSerializer(serializers.Serializer):
+    flight = serializers.IntegerField()
+    delay = serializers.DurationField()
+    departure_time = serializers.DateTimeField()
+    arrival_time = serializers.DateTimeField()
+    applied = serializers.BooleanField()
+    cascaded = serializers.BooleanField()
+    affected = DelayedFlightSerializer(many=True)
+    violations = CrewDutyViolationSerializer(many=True)
+
+
+class OrderCancellationSerializer(serializers.Serializer):
+    order = serializers.IntegerField()
+    cancelled_at = serializers.DateTimeField(allow_null=True)
+    tickets_released = serializers.IntegerField()
+    refund = serializers.DecimalField(
+        max_digits=10, decimal_places=2, allow_null=True
+    )
+
+
+class FlightCancellationSerializer(serializers.Serializer):
+    flight = serializers.IntegerField()
+    cancelled_at = serializers.DateTimeField()
+    crews_released = serializers.IntegerField()
+    tickets_released = serializers.IntegerField()
+    orders_cancelled = serializers.IntegerField()
+    refunds_queued = serializers.IntegerField()
+
+
+class FlightListSerializer(DynamicFieldsModelSerializer):
     airplane_name = serializers.CharField(
         source="airplane.name", read_only=True
     )
     airplane_type = serializers.CharField(
         source="airplane.airplane_type.name", read_only=True
     )
-    airplane_image = serializers.ImageField(
+    airplane_image = MediaImageField(
         source="airplane.image", read_only=True
     )
+    airplane_image_variants = ImageVariantsField(
+        source="airplane.image_variants"
+    )
     route = serializers.StringRelatedField(read_only=True)
     departure_time = serializers.DateTimeField(format="%Y-%m-%d %H:%M")
     arrival_time = serializers.DateTimeField(format="%Y-%m-%d %H:%M")
@@ -139,15 +522,227 @@ class FlightListSerializer(serializers.ModelSerializer):
             "airplane_name",
             "airplane_type",
             "airplane_image",
+            "airplane_image_variants",
             "route",
             "departure_time",
             "arrival_time",
             "airplane_capacity",
             "tickets_available"
         )
+        field_lookups = {
+            "route": ("route__source__name", "route__destination__name"),
+            "airplane_capacity": (
+                "airplane__rows", "airplane__seats_in_row"
+            ),
+        }
+
+
+class ValuesSerializer(serializers.BaseSerializer):
+    """
+    Read-only serializer of the rows of `values_queryset()`.
+    It gives the JSON of a model serializer without building the model
+    instances, from the columns the fields need only.
+
+    `value_fields` maps every output field to the columns it is built
+    from by its `get_<field>(row)` method. The nested objects of
+    `expandable_fields` are output as the primary key column they map to
+    when `expand` leaves them out, and are trimmed to the dotted `fields`
+    selecting some of their fields by `nested()`.
+    """
+
+    value_fields = {}
+    expandable_fields = {}
+
+    @cached_property
+    def collapsed_fields(self):
+        expand = self.context.get("expand")
+
+        if expand is None:
+            return set()
+
+        return set(self.expandable_fields) - set(expand)
+
+    @cached_property
+    def getters(self):
+        selected = self.context.get("fields")
+        getters = []
+
+        for name in self.value_fields:
+            if selected and name not in selected:
+                continue
+
+            if name in self.collapsed_fields:
+                column = self.expandable_fields[name]
+                getters.append((name, itemgetter(column)))
+            else:
+                getters.append((name, getattr(self, f"get_{name}")))
+
+        return getters
+
+    def values_queryset(self, queryset):
+        columns = {}
+
+        for name, _ in self.getters:
+            if name in self.collapsed_fields:
+                columns[self.expandable_fields[name]] = None
+            else:
+                columns.update(dict.fromkeys(self.value_fields[name]))
+
+        # Prefetching does not apply to dictionaries
+        return queryset.prefetch_related(None).values(*columns)
+
+    def to_representation(self, row):
+        return {name: getter(row) for name, getter in self.getters}
+
+    def nested(self, name, item):
+        """The nested object `name`, with its fields selected by `fields`"""
+        selected = subtree(self.context.get("fields"), [name])
+
+        if not selected:
+            return item
+
+        return {key: value for key, value in item.items() if key in selected}
+
+    @staticmethod
+    def format_datetime(value, output_format="%Y-%m-%d %H:%M"):
+        """Same output as DateTimeField(format=output_format)"""
+        if value is None:
+            return None
+
+        if timezone.is_aware(value):
+            value = timezone.localtime(value)
+
+        return value.strftime(output_format)
+
+    @cached_property
+    def media_prefix(self):
+        return media_url_prefix(self.context.get("request"))
+
+    def file_url(self, name):
+        """Same output as MediaImageField"""
+        if not name:
+            return None
+
+        return media_url(name, self.media_prefix)
+
+    def image_variant_urls(self, variants):
+        """Same output as ImageVariantsField"""
+        return {
+            name: media_url(file_name, self.media_prefix)
+            for name, file_name in sorted((variants or {}).items())
+        }
+
+
+class RouteListValuesSerializer(ValuesSerializer):
+    """Output of RouteListSerializer"""
+
+    value_fields = {
+        "id": ("id",),
+        "source": (
+            "source_id", "source__name", "source__closest_big_city"
+        ),
+        "destination": (
+            "destination_id",
+            "destination__name",
+            "destination__closest_big_city",
+        ),
+        "distance": ("distance",),
+    }
+    expandable_fields = {
+        "source": "source_id",
+        "destination": "destination_id",
+    }
+
+    def get_id(self, row):
+        return row["id"]
+
+    def get_source(self, row):
+        return self.nested(
+            "source",
+            {
+                "id": row["source_id"],
+                "name": row["source__name"],
+                "closest_big_city": row["source__closest_big_city"],
+            },
+        )
+
+    def get_destination(self, row):
+        return self.nested(
+            "destination",
+            {
+                "id": row["destination_id"],
+                "name": row["destination__name"],
+                "closest_big_city": row["destination__closest_big_city"],
+            },
+        )
+
+    def get_distance(self, row):
+        return row["distance"]
+
+
+class FlightListValuesSerializer(ValuesSerializer):
+    """Output of FlightListSerializer, `tickets_available` is annotated"""
+
+    value_fields = {
+        "id": ("id",),
+        "airplane_name": ("airplane__name",),
+        "airplane_type": ("airplane__airplane_type__name",),
+        "airplane_image": ("airplane__image",),
+        "airplane_image_variants": ("airplane__image_variants",),
+        "route": (
+            "route_id", "route__source__name", "route__destination__name"
+        ),
+        "departure_time": ("departure_time",),
+        "arrival_time": ("arrival_time",),
+        "airplane_capacity": ("airplane_capacity",),
+        "tickets_available": ("tickets_available",),
+    }
+
+    def values_queryset(self, queryset):
+        if any(name == "airplane_capacity" for name, _ in self.getters):
+            queryset = queryset.annotate(
+                airplane_capacity=(
+                    F("airplane__rows") * F("airplane__seats_in_row")
+                )
+            )
+
+        return super().values_queryset(queryset)
+
+    def get_id(self, row):
+        return row["id"]
+
+    def get_airplane_name(self, row):
+        return row["airplane__name"]
+
+    def get_airplane_type(self, row):
+        return row["airplane__airplane_type__name"]
+
+    def get_airplane_image(self, row):
+        return self.file_url(row["airplane__image"])
+
+    def get_airplane_image_variants(self, row):
+        return self.image_variant_urls(row["airplane__image_variants"])
+
+    def get_route(self, row):
+        return (
+            f"{row['route_id']}: {row['route__source__name']} - "
+            f"{row['route__destination__name']}"
+        )
+
+    def get_departure_time(self, row):
+        return self.format_datetime(row["departure_time"])
+
+    def get_arrival_time(self, row):
+        return self.format_datetime(row["arrival_time"])
+
+    def get_airplane_capacity(self, row):
+        return row["airplane_capacity"]
 
+    def get_tickets_available(self, row):
+        return row["tickets_available"]
 
-class TicketSerializer(serializers.ModelSerializer):
+
+class TicketSerializer(DynamicFieldsModelSerializer):
 
     def validate(self, attrs):
         data = super(TicketSerializer, self).validate(attrs=attrs)
@@ -159,13 +754,22 @@ class TicketSerializer(serializers.ModelSerializer):
             ValidationError,
         )
 
+        if Ticket.objects.filter(
+            flight=attrs["flight"],
+            row=attrs["row"],
+            seat=attrs["seat"],
+            cancelled_at__isnull=True,
+        ).exists():
+            raise ValidationError({"seat": SEAT_TAKEN})
+
         return data
 
     class Meta:
         model = Ticket
         fields = (
-            "id", "flight", "row", "seat", "price"
+            "id", "flight", "row", "seat", "price", "cancelled_at"
         )
+        read_only_fields = ("cancelled_at",)
 
 
 class TicketSeatsSerializer(TicketSerializer):
@@ -178,14 +782,17 @@ class TicketListSerializer(TicketSerializer):
     flight = FlightListSerializer(many=False, read_only=True)
 
 
-class FlightDetailSerializer(serializers.ModelSerializer):
+class FlightDetailSerializer(DynamicFieldsModelSerializer):
     airplane = AirplaneListSerializer(many=False, read_only=True)
     crews = CrewListSerializer(many=True, read_only=True)
     route = RouteListSerializer(many=False, read_only=True)
     departure_time = serializers.DateTimeField(format="%Y-%m-%d %H:%M")
     arrival_time = serializers.DateTimeField(format="%Y-%m-%d %H:%M")
+    cancelled_at = serializers.DateTimeField(
+        format="%Y-%m-%d %H:%M", read_only=True
+    )
     taken_places = TicketSeatsSerializer(
-        source="flight_ticket", many=True, read_only=True
+        source="active_tickets", many=True, read_only=True
     )
 
     class Meta:
@@ -197,11 +804,12 @@ class FlightDetailSerializer(serializers.ModelSerializer):
             "route",
             "departure_time",
             "arrival_time",
+            "cancelled_at",
             "taken_places"
         )
 
 
-class PaymentSerializer(serializers.ModelSerializer):
+class PaymentSerializer(DynamicFieldsModelSerializer):
     order = serializers.PrimaryKeyRelatedField(
         queryset=Order.objects.select_related("user")
     )
@@ -214,6 +822,9 @@ class PaymentSerializer(serializers.ModelSerializer):
     )
     session_url = serializers.URLField(read_only=True)
     session_id = serializers.CharField(read_only=True)
+    amount = serializers.DecimalField(
+        max_digits=10, decimal_places=2, read_only=True
+    )
 
     class Meta:
         model = Payment
@@ -223,9 +834,15 @@ class PaymentSerializer(serializers.ModelSerializer):
             "user_full_name",
             "status_payment",
             "date_payment",
+            "amount",
             "session_url",
             "session_id",
         )
+        field_lookups = {
+            "user_full_name": (
+                "order__user__first_name", "order__user__last_name"
+            ),
+        }
 
 
 class PaymentListSerializer(PaymentSerializer):
@@ -244,7 +861,7 @@ class PaymentUpdateSerializer(PaymentSerializer):
     session_id = serializers.CharField(read_only=True)
 
 
-class OrderSerializer(serializers.ModelSerializer):
+class OrderSerializer(DynamicFieldsModelSerializer):
     tickets = TicketSerializer(
         many=True, read_only=False, allow_empty=False
     )
@@ -255,14 +872,47 @@ class OrderSerializer(serializers.ModelSerializer):
 
     class Meta:
         model = Order
-        fields = ("id", "tickets", "created_at", "total_cost", "payments")
+        fields = (
+            "id",
+            "tickets",
+            "created_at",
+            "cancelled_at",
+            "total_cost",
+            "payments",
+        )
+        read_only_fields = ("cancelled_at",)
+        field_lookups = {
+            "total_cost": (
+                "tickets__price", "tickets__seat", "tickets__cancelled_at"
+            )
+        }
+
+    def validate_tickets(self, tickets):
+        seats = [
+            (ticket["flight"].pk, ticket["row"], ticket["seat"])
+            for ticket in tickets
+        ]
+        if len(set(seats)) < len(seats):
+            raise ValidationError("A seat is ordered more than once.")
+
+        return tickets
 
     def create(self, validated_data):
-        with transaction.atomic():
+        with taken_seat_errors(), transaction.atomic():
             tickets_data = validated_data.pop("tickets")
             order = Order.objects.create(**validated_data)
             for ticket_data in tickets_data:
                 Ticket.objects.create(order=order, **ticket_data)
+
+            # Inserting a ticket waits for the cancellation of its flight
+            # in progress, which is seen from here on
+            if Flight.objects.filter(
+                pk__in=[ticket["flight"].pk for ticket in tickets_data],
+                cancelled_at__isnull=False,
+            ).exists():
+                raise ValidationError(
+                    {"tickets": ["The flight is cancelled."]}
+                )
             return order
 
 
@@ -0,0 +1,72 @@
+"""
+Media storage naming files by their content.
+
+A file is stored as the hash of its bytes in the directory `upload_to`
+gives, keeping the extension: the same photo uploaded for 40 airplanes
+is stored once, and a name always refers to the same bytes, so it can
+be cached forever. Saving content already stored returns its name
+without writing it again, also when a concurrent save of the same
+content wins the race to create the file.
+
+Files may be shared by several airplanes, `airport.images` only
+deletes the ones no airplane refers to anymore.
+"""
+import hashlib
+import os
+import posixpath
+
+from django.core.files import File
+from django.core.files.storage import FileSystemStorage
+
+
+class ContentHashStorage(FileSystemStorage):
+    # 128 bits, collisions are out of reach
+    hash_length = 32
+
+    def hashed_name(self, name, content):
+        digest = hashlib.sha256()
+        for chunk in content.chunks():
+            digest.update(chunk)
+        content.seek(0)
+
+        directory, basename = posixpath.split(name.replace("\\", "/"))
+        _, extension = os.path.splitext(basename)
+
+        return posixpath.join(
+            directory,
+            f"{digest.hexdigest()[:self.hash_length]}{extension.lower()}",
+        )
+
+    def save(self, name, content, max_length=None):
+        if name is None:
+            name = content.name
+
+        if not hasattr(content, "chunks"):
+            content = File(content, name)
+
+        name = self.hashed_name(name, content)
+
+        try:
+            return super().save(name, content, max_length=max_length)
+        except FileExistsError:
+            if not self.exists(name):
+                raise
+            return name
+
+    def get_available_name(self, name, max_length=None):
+        """
+        The hashed name itself, never another one. Raises FileExistsError
+        when it is taken, as it already holds these bytes, which also
+        stops the retries of `_save()` after losing a race to create it.
+        """
+        if self.exists(name):
+            raise FileExistsError(name)
+
+        return name
+
+    def is_content_hashed(self, name):
+        stem, _ = os.path.splitext(posixpath.basename(name))
+
+        return len(stem) == self.hash_length and all(
+            char in "0123456789abcdef" for char in stem
+        )
@@ -0,0 +1,230 @@
+from datetime import datetime, timedelta, timezone as dt_timezone
+from unittest import skipUnless
+
+from django.contrib.auth import get_user_model
+from django.db import connection, transaction
+from django.test import TestCase
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.exceptions import ValidationError
+from rest_framework.test import APIClient
+
+from airport.models import Airport, Route, AirplaneType, Airplane, Flight
+from airport.scheduling import schedule_integrity_errors
+
+FLIGHT_URL = reverse("airport:flight-list")
+
+START = datetime(2030, 7, 25, 8, tzinfo=dt_timezone.utc)
+
+
+def hours(count):
+    return START + timedelta(hours=count)
+
+
+def sample_route(**params):
+    airport1 = Airport.objects.create(name="Airport 1")
+    airport2 = Airport.objects.create(name="Airport 2")
+
+    defaults = {
+        "source": airport1,
+        "destination": airport2,
+        "distance": 1000
+    }
+    defaults.update(params)
+
+    return Route.objects.create(**defaults)
+
+
+def sample_airplane(**params):
+    airplane_type = AirplaneType.objects.create(name="Compact")
+
+    defaults = {
+        "name": "Boeing",
+        "rows": 30,
+        "seats_in_row": 6,
+        "airplane_type": airplane_type
+    }
+    defaults.update(params)
+
+    return Airplane.objects.create(**defaults)
+
+
+def sample_flight(**params):
+    defaults = {
+        "route": sample_route(),
+        "airplane": sample_airplane(),
+        "departure_time": hours(0),
+        "arrival_time": hours(2),
+    }
+    defaults.update(params)
+
+    return Flight.objects.create(**defaults)
+
+
+def detail_url(flight_id):
+    return reverse("airport:flight-detail", args=[flight_id])
+
+
+def timeline_url(airplane_id):
+    return reverse("airport:airplane-timeline", args=[airplane_id])
+
+
+class AirplaneScheduleApiTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            "admin@test.com",
+            "adminpass",
+            is_staff=True
+        )
+        self.client.force_authenticate(self.user)
+        self.airplane = sample_airplane()
+        self.flight = sample_flight(airplane=self.airplane)
+
+    def payload(self, departure, arrival):
+        return {
+            "route": sample_route().id,
+            "airplane": self.airplane.id,
+            "departure_time": departure,
+            "arrival_time": arrival,
+        }
+
+    def test_create_flight_with_busy_airplane(self):
+        response = self.client.post(
+            FLIGHT_URL, self.payload(hours(1), hours(3))
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn(str(self.flight.id), response.data["airplane"][0])
+
+    def test_create_back_to_back_flight(self):
+        response = self.client.post(
+            FLIGHT_URL, self.payload(hours(2), hours(4))
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+
+    def test_reschedule_into_overlap(self):
+        later = sample_flight(
+            airplane=self.airplane,
+            departure_time=hours(5),
+            arrival_time=hours(7),
+        )
+
+        response = self.client.patch(
+            detail_url(later.id), {"departure_time": hours(1)}
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn("airplane", response.data)
+
+    def test_update_keeps_own_schedule(self):
+        response = self.client.patch(
+            detail_url(self.flight.id), {"arrival_time": hours(3)}
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_timeline(self):
+        sample_flight(
+            airplane=self.airplane,
+            departure_time=hours(5),
+            arrival_time=hours(7),
+        )
+        sample_flight(
+            airplane=self.airplane,
+            departure_time=hours(7),
+            arrival_time=hours(8),
+        )
+        # Another airplane and a flight after the period are left out
+        sample_flight(departure_time=hours(3), arrival_time=hours(4))
+        sample_flight(
+            airplane=self.airplane,
+            departure_time=hours(12),
+            arrival_time=hours(13),
+        )
+
+        response = self.client.get(
+            timeline_url(self.airplane.id),
+            {"start": "2030-07-25T07:00:00Z", "end": "2030-07-25T18:00:00Z"},
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            [
+                (flight["departure_time"], flight["idle_before"])
+                for flight in response.data["flights"]
+            ],
+            [
+                ("2030-07-25T08:00:00Z", "01:00:00"),
+                ("2030-07-25T13:00:00Z", "03:00:00"),
+                ("2030-07-25T15:00:00Z", "00:00:00"),
+            ],
+        )
+        self.assertEqual(
+            [(gap["start"], gap["end"]) for gap in response.data["gaps"]],
+            [
+                ("2030-07-25T07:00:00Z", "2030-07-25T08:00:00Z"),
+                ("2030-07-25T10:00:00Z", "2030-07-25T13:00:00Z"),
+                ("2030-07-25T16:00:00Z", "2030-07-25T18:00:00Z"),
+            ],
+        )
+        self.assertEqual(response.data["busy_hours"], 5)
+        self.assertAlmostEqual(response.data["utilization"], 5 / 11)
+
+    def test_timeline_defaults_to_next_week(self):
+        response = self.client.get(timeline_url(self.airplane.id))
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["flights"], [])
+        self.assertEqual(len(response.data["gaps"]), 1)
+        self.assertEqual(response.data["busy_hours"], 0)
+
+    def test_timeline_invalid_period(self):
+        response = self.client.get(
+            timeline_url(self.airplane.id),
+            {"start": "2030-07-25T07:00:00Z", "end": "2030-07-25T06:00:00Z"},
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+@skipUnless(
+    connection.vendor == "postgresql",
+    "The exclusion constraint only exists on PostgreSQL",
+)
+class AirplaneScheduleConstraintTests(TestCase):
+    def test_overlapping_flight_is_rejected(self):
+        flight = sample_flight()
+
+        with self.assertRaises(ValidationError) as context:
+            with schedule_integrity_errors(), transaction.atomic():
+                sample_flight(
+                    airplane=flight.airplane,
+                    departure_time=hours(1),
+                    arrival_time=hours(3),
+                )
+
+        self.assertIn("airplane", context.exception.detail)
+
+    def test_swap_within_a_transaction(self):
+        airplane = sample_airplane()
+        first = sample_flight(airplane=airplane)
+        second = sample_flight(
+            airplane=airplane, departure_time=hours(2), arrival_time=hours(4)
+        )
+
+        with transaction.atomic():
+            with connection.cursor() as cursor:
+                cursor.execute("SET CONSTRAINTS ALL DEFERRED")
+            Flight.objects.filter(id=first.id).update(
+                departure_time=hours(2), arrival_time=hours(4)
+            )
+            Flight.objects.filter(id=second.id).update(
+                departure_time=hours(0), arrival_time=hours(2)
+            )
+            with connection.cursor() as cursor:
+                cursor.execute("SET CONSTRAINTS ALL IMMEDIATE")
+
+        first.refresh_from_db()
+        self.assertEqual(first.departure_time, hours(2))
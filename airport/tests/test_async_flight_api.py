@@ -0,0 +1,205 @@
+from datetime import datetime, timezone as dt_timezone
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.cache import caches
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from rest_framework import status
+
+from airport.models import (
+    Airport,
+    Route,
+    AirplaneType,
+    Airplane,
+    Crew,
+    Flight,
+    Order,
+    Ticket,
+)
+from airport.throttling import AnonSlidingWindowThrottle
+
+FLIGHT_URL = reverse("airport:flight-list")
+ASYNC_FLIGHT_URL = reverse("airport:async-flight-list")
+
+LOCAL_CACHE = {
+    "default": {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+        "LOCATION": "async-flight-tests",
+    }
+}
+
+
+def sample_route(**params):
+    airport1 = Airport.objects.create(name="Airport 1")
+    airport2 = Airport.objects.create(name="Airport 2")
+
+    defaults = {
+        "source": airport1,
+        "destination": airport2,
+        "distance": 1000
+    }
+    defaults.update(params)
+
+    return Route.objects.create(**defaults)
+
+
+def sample_airplane(**params):
+    airplane_type = AirplaneType.objects.create(name="Compact")
+
+    defaults = {
+        "name": "Boeing",
+        "rows": 30,
+        "seats_in_row": 6,
+        "airplane_type": airplane_type
+    }
+    defaults.update(params)
+
+    return Airplane.objects.create(**defaults)
+
+
+def sample_flight(**params):
+    defaults = {
+        "route": sample_route(),
+        "airplane": sample_airplane(),
+        "departure_time": datetime(2026, 5, 1, 10, tzinfo=dt_timezone.utc),
+        "arrival_time": datetime(2026, 5, 1, 12, tzinfo=dt_timezone.utc),
+    }
+    defaults.update(params)
+
+    return Flight.objects.create(**defaults)
+
+
+def sample_ticket(flight, row, seat):
+    user, _ = get_user_model().objects.get_or_create(
+        email="user@test.com", username="UserTest"
+    )
+    order = Order.objects.create(user=user)
+
+    return Ticket.objects.create(
+        flight=flight, order=order, row=row, seat=seat
+    )
+
+
+class AsyncFlightApiTests(TestCase):
+    def test_list_matches_sync_endpoint(self):
+        flight = sample_flight()
+        sample_flight(airplane=sample_airplane(name="Airbus"))
+        sample_ticket(flight, 1, 1)
+
+        sync_response = self.client.get(FLIGHT_URL)
+        async_response = self.client.get(ASYNC_FLIGHT_URL)
+
+        self.assertEqual(async_response.status_code, status.HTTP_200_OK)
+        self.assertEqual(async_response.json(), sync_response.json())
+
+    def test_list_is_filtered_and_paginated(self):
+        for i in range(12):
+            sample_flight(airplane=sample_airplane(name=f"Airbus {i}"))
+        sample_flight()
+
+        response = self.client.get(
+            ASYNC_FLIGHT_URL, {"airplane": "airbus", "page": 2}
+        )
+        data = response.json()
+
+        self.assertEqual(data["count"], 12)
+        self.assertEqual(len(data["results"]), 2)
+        self.assertIsNone(data["next"])
+        self.assertIn("airplane=airbus", data["previous"])
+
+    def test_invalid_page(self):
+        response = self.client.get(ASYNC_FLIGHT_URL, {"page": 5})
+
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_detail_matches_sync_endpoint(self):
+        flight = sample_flight()
+        flight.crews.add(
+            Crew.objects.create(
+                first_name="John", last_name="Doe", position=Crew.CAPTAIN
+            )
+        )
+        sample_ticket(flight, 2, 3)
+
+        sync_response = self.client.get(
+            reverse("airport:flight-detail", args=[flight.id])
+        )
+        async_response = self.client.get(
+            reverse("airport:async-flight-detail", args=[flight.id])
+        )
+
+        self.assertEqual(async_response.status_code, status.HTTP_200_OK)
+        self.assertEqual(async_response.json(), sync_response.json())
+
+    def test_detail_not_found(self):
+        response = self.client.get(
+            reverse("airport:async-flight-detail", args=[1])
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_seats(self):
+        flight = sample_flight()
+        sample_ticket(flight, 1, 2)
+
+        response = self.client.get(
+            reverse("airport:async-flight-seats", args=[flight.id])
+        )
+        data = response.json()
+
+        self.assertEqual(data["capacity"], 180)
+        self.assertEqual(data["tickets_available"], 179)
+        self.assertEqual(data["taken_places"], [{"row": 1, "seat": 2}])
+
+    def test_write_methods_are_not_allowed(self):
+        response = self.client.post(ASYNC_FLIGHT_URL)
+
+        self.assertEqual(
+            response.status_code, status.HTTP_405_METHOD_NOT_ALLOWED
+        )
+
+
+@override_settings(CACHES=LOCAL_CACHE, THROTTLE_BURSTS={})
+@mock.patch.object(
+    AnonSlidingWindowThrottle, "THROTTLE_RATES", {"anon": "2/min"}
+)
+class AsyncFlightThrottlingTests(TestCase):
+    def setUp(self):
+        caches["default"].clear()
+        self.flight = sample_flight()
+
+    def test_requests_over_rate_are_throttled(self):
+        for url in (
+            ASYNC_FLIGHT_URL,
+            reverse("airport:async-flight-detail", args=[self.flight.id]),
+        ):
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        response = self.client.get(
+            reverse("airport:async-flight-seats", args=[self.flight.id])
+        )
+
+        self.assertEqual(
+            response.status_code, status.HTTP_429_TOO_MANY_REQUESTS
+        )
+        self.assertIn("Retry-After", response)
+
+    def test_rate_is_shared_with_sync_endpoint(self):
+        self.client.get(FLIGHT_URL)
+        self.client.get(FLIGHT_URL)
+
+        response = self.client.get(ASYNC_FLIGHT_URL)
+
+        self.assertEqual(
+            response.status_code, status.HTTP_429_TOO_MANY_REQUESTS
+        )
+
+    def test_invalid_token(self):
+        response = self.client.get(
+            ASYNC_FLIGHT_URL, HTTP_AUTHORIZATION="Bearer invalid"
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+        self.assertIn("WWW-Authenticate", response)
@@ -0,0 +1,240 @@
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from airport.models import Airport, Route, AirplaneType, Airplane, Flight, Crew
+
+BULK_URL = reverse("airport:flight-set-crews")
+
+START = datetime(2030, 7, 25, 8, tzinfo=dt_timezone.utc)
+
+
+def hours(count):
+    return START + timedelta(hours=count)
+
+
+def sample_route(**params):
+    airport1 = Airport.objects.create(name="Airport 1")
+    airport2 = Airport.objects.create(name="Airport 2")
+
+    defaults = {
+        "source": airport1,
+        "destination": airport2,
+        "distance": 1000
+    }
+    defaults.update(params)
+
+    return Route.objects.create(**defaults)
+
+
+def sample_airplane(**params):
+    airplane_type = AirplaneType.objects.create(name="Compact")
+
+    defaults = {
+        "name": "Boeing",
+        "rows": 30,
+        "seats_in_row": 6,
+        "airplane_type": airplane_type
+    }
+    defaults.update(params)
+
+    return Airplane.objects.create(**defaults)
+
+
+def sample_flight(crews=(), **params):
+    defaults = {
+        "route": sample_route(),
+        "airplane": sample_airplane(),
+        "departure_time": hours(0),
+        "arrival_time": hours(2),
+    }
+    defaults.update(params)
+
+    flight = Flight.objects.create(**defaults)
+    flight.crews.add(*crews)
+
+    return flight
+
+
+def sample_crew(**params):
+    defaults = {
+        "first_name": "John",
+        "last_name": "Smith",
+        "position": Crew.CAPTAIN,
+    }
+    defaults.update(params)
+
+    return Crew.objects.create(**defaults)
+
+
+def crews_of(flight):
+    return set(flight.crews.values_list("id", flat=True))
+
+
+class BulkCrewAssignmentApiTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            "admin@test.com",
+            "adminpass",
+            is_staff=True
+        )
+        self.client.force_authenticate(self.user)
+        self.crew1 = sample_crew()
+        self.crew2 = sample_crew(first_name="Jane")
+        self.crew3 = sample_crew(first_name="Jim")
+        self.flight = sample_flight(crews=[self.crew1, self.crew2])
+        self.other = sample_flight(
+            departure_time=hours(24), arrival_time=hours(26)
+        )
+
+    def assign(self, *assignments):
+        return self.client.post(
+            BULK_URL,
+            {
+                "assignments": [
+                    {"flight": flight, "crews": crews}
+                    for flight, crews in assignments
+                ]
+            },
+            format="json",
+        )
+
+    def test_assignments_are_diffed(self):
+        response = self.assign(
+            (self.flight.id, [self.crew2.id, self.crew3.id]),
+            (self.other.id, [self.crew1.id, self.crew1.id]),
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            response.data,
+            [
+                {
+                    "flight": self.flight.id,
+                    "crews": [self.crew2.id, self.crew3.id],
+                    "added": [self.crew3.id],
+                    "removed": [self.crew1.id],
+                },
+                {
+                    "flight": self.other.id,
+                    "crews": [self.crew1.id],
+                    "added": [self.crew1.id],
+                    "removed": [],
+                },
+            ],
+        )
+        self.assertEqual(crews_of(self.flight), {self.crew2.id, self.crew3.id})
+        self.assertEqual(crews_of(self.other), {self.crew1.id})
+
+    def test_queries_do_not_grow_with_the_assignments(self):
+        # In the same roster month
+        flights = [
+            sample_flight(
+                departure_time=hours(30 + 12 * i),
+                arrival_time=hours(32 + 12 * i),
+            )
+            for i in range(6)
+        ]
+
+        def queries(count):
+            with CaptureQueriesContext(connection) as context:
+                response = self.assign(
+                    *[
+                        (flight.id, [self.crew3.id])
+                        for flight in flights[:count]
+                    ]
+                )
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+            return len(context)
+
+        self.assertEqual(queries(2), queries(6))
+
+    def test_errors_of_every_assignment(self):
+        response = self.assign(
+            (self.flight.id, [self.crew3.id]),
+            (self.other.id, [self.crew1.id, 999]),
+            (998, []),
+            (self.other.id, []),
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        errors = response.data["assignments"]
+        self.assertEqual(errors[0], {})
+        self.assertIn("999", errors[1]["crews"][0])
+        self.assertIn("998", errors[2]["flight"][0])
+        self.assertIn("more than once", errors[3]["flight"][0])
+        # Nothing is applied
+        self.assertEqual(crews_of(self.flight), {self.crew1.id, self.crew2.id})
+
+    def test_overlapping_assignments(self):
+        overlapping = sample_flight(
+            departure_time=hours(1), arrival_time=hours(3)
+        )
+        later = sample_flight(departure_time=hours(2), arrival_time=hours(4))
+
+        response = self.assign(
+            (overlapping.id, [self.crew3.id, self.crew1.id]),
+            (later.id, [self.crew3.id]),
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        errors = response.data["assignments"]
+        self.assertEqual(len(errors[0]["crews"]), 2)
+        self.assertIn(str(self.flight.id), errors[0]["crews"][1])
+        self.assertIn(str(overlapping.id), errors[1]["crews"][0])
+
+    def test_crew_moved_to_an_overlapping_flight(self):
+        overlapping = sample_flight(
+            departure_time=hours(1), arrival_time=hours(3)
+        )
+
+        response = self.assign(
+            (self.flight.id, [self.crew2.id]),
+            (overlapping.id, [self.crew1.id]),
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(crews_of(overlapping), {self.crew1.id})
+
+    @override_settings(
+        CREW_DUTY_RULES={
+            "default": {
+                "max_duty_hours": 8,
+                "min_rest_hours": 10,
+                "max_monthly_hours": 100,
+            }
+        }
+    )
+    def test_duty_rules(self):
+        later = sample_flight(departure_time=hours(4), arrival_time=hours(9))
+
+        response = self.assign((later.id, [self.crew1.id, self.crew3.id]))
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(
+            response.data["assignments"][0]["crews"],
+            [
+                f"Crew {self.crew1.id} would exceed 8 hours of duty period "
+                "(9 hours)."
+            ],
+        )
+
+    def test_bulk_assignment_is_admin_only(self):
+        client = APIClient()
+        client.force_authenticate(
+            get_user_model().objects.create_user(
+                "user@test.com", "password", username="user"
+            )
+        )
+
+        response = client.post(BULK_URL, {}, format="json")
+
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
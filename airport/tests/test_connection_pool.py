@@ -0,0 +1,253 @@
+import threading
+import time
+from unittest import skipUnless
+
+from django.contrib.auth import get_user_model
+from django.db import connection as default_connection
+from django.test import SimpleTestCase, TestCase
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from airport_service.postgresql_pool.pool import (
+    ConnectionPool,
+    PoolTimeout,
+    close_pool,
+    get_pool,
+)
+
+POOL_STATS_URL = reverse("airport:db-pool-stats")
+
+
+class FakeConnection:
+    def __init__(self):
+        self.closed = False
+        self.broken = False
+
+    def close(self):
+        self.closed = True
+
+
+def works(connection):
+    return not connection.broken
+
+
+class ConnectionPoolTests(SimpleTestCase):
+    def test_connections_are_reused(self):
+        pool = ConnectionPool(min_size=0, max_size=2)
+
+        connection = pool.getconn(FakeConnection)
+        pool.putconn(connection)
+
+        self.assertIs(pool.getconn(FakeConnection), connection)
+        self.assertEqual(pool.stats.connections_opened, 1)
+
+    def test_fill_opens_min_size_connections(self):
+        pool = ConnectionPool(min_size=2, max_size=4)
+
+        pool.fill(FakeConnection)
+
+        self.assertEqual(pool.snapshot()["idle"], 2)
+        self.assertEqual(pool.snapshot()["size"], 2)
+
+    def test_getconn_times_out_when_exhausted(self):
+        pool = ConnectionPool(min_size=0, max_size=1, timeout=0.05)
+        pool.getconn(FakeConnection)
+
+        with self.assertRaises(PoolTimeout):
+            pool.getconn(FakeConnection)
+
+        self.assertEqual(pool.stats.timeouts, 1)
+
+    def test_waiting_caller_gets_returned_connection(self):
+        pool = ConnectionPool(min_size=0, max_size=1, timeout=5)
+        connection = pool.getconn(FakeConnection)
+
+        def release():
+            time.sleep(0.05)
+            pool.putconn(connection)
+
+        releaser = threading.Thread(target=release)
+        releaser.start()
+        reused = pool.getconn(FakeConnection)
+        releaser.join()
+
+        snapshot = pool.snapshot()
+
+        self.assertIs(reused, connection)
+        self.assertEqual(snapshot["waits"], 1)
+        self.assertGreater(snapshot["wait_time_max_ms"], 0)
+
+    def test_discarded_connection_frees_a_slot(self):
+        pool = ConnectionPool(min_size=0, max_size=1, timeout=0.05)
+        connection = pool.getconn(FakeConnection)
+
+        pool.putconn(connection, discard=True)
+
+        self.assertTrue(connection.closed)
+        self.assertIsNot(pool.getconn(FakeConnection), connection)
+
+    def test_broken_idle_connection_is_replaced(self):
+        pool = ConnectionPool(min_size=0, max_size=1, timeout=0.05)
+        connection = pool.getconn(FakeConnection)
+        pool.putconn(connection)
+        connection.broken = True
+
+        replaced = pool.getconn(FakeConnection, check=works)
+
+        self.assertIsNot(replaced, connection)
+        self.assertTrue(connection.closed)
+        self.assertEqual(pool.stats.connections_discarded, 1)
+        self.assertEqual(pool.snapshot()["size"], 1)
+
+    def test_failing_check_counts_as_broken(self):
+        pool = ConnectionPool(min_size=0, max_size=1, timeout=0.05)
+        connection = pool.getconn(FakeConnection)
+        pool.putconn(connection)
+
+        def lost(connection):
+            raise ConnectionError
+
+        self.assertIsNot(pool.getconn(FakeConnection, check=lost), connection)
+
+    def test_broken_connection_is_not_returned(self):
+        pool = ConnectionPool(min_size=0, max_size=1, timeout=0.05)
+        connection = pool.getconn(FakeConnection)
+        connection.broken = True
+
+        pool.putconn(connection, check=works)
+
+        self.assertTrue(connection.closed)
+        self.assertEqual(pool.snapshot()["idle"], 0)
+        self.assertIsNot(pool.getconn(FakeConnection), connection)
+
+    def test_failed_connect_frees_a_slot(self):
+        pool = ConnectionPool(min_size=0, max_size=1, timeout=0.05)
+
+        def broken_connect():
+            raise ConnectionError
+
+        with self.assertRaises(ConnectionError):
+            pool.getconn(broken_connect)
+
+        self.assertIsInstance(pool.getconn(FakeConnection), FakeConnection)
+
+    def test_connections_of_parent_process_are_dropped(self):
+        pool = ConnectionPool(min_size=0, max_size=1)
+        connection = pool.getconn(FakeConnection)
+        pool.putconn(connection)
+        pool._pid = -1
+
+        reused = pool.getconn(FakeConnection)
+
+        self.assertIsNot(reused, connection)
+        self.assertFalse(connection.closed)
+
+    def test_invalid_sizes(self):
+        with self.assertRaises(ValueError):
+            ConnectionPool(min_size=3, max_size=2)
+
+
+class PooledDatabaseWrapperTests(SimpleTestCase):
+    def test_pool_options_are_not_passed_to_driver(self):
+        from airport_service.postgresql_pool.base import DatabaseWrapper
+
+        wrapper = DatabaseWrapper(
+            {
+                "ENGINE": "airport_service.postgresql_pool",
+                "NAME": "airport",
+                "USER": "",
+                "PASSWORD": "",
+                "HOST": "",
+                "PORT": "",
+                "OPTIONS": {"pool": {"min_size": 1, "max_size": 3}},
+                "CONN_MAX_AGE": 0,
+                "CONN_HEALTH_CHECKS": False,
+                "AUTOCOMMIT": True,
+                "ATOMIC_REQUESTS": False,
+                "TIME_ZONE": None,
+                "TEST": {},
+            },
+            alias="pool-test",
+        )
+
+        self.assertNotIn("pool", wrapper.get_connection_params())
+        self.assertEqual(wrapper.pool.max_size, 3)
+        self.assertIs(wrapper.pool, get_pool("pool-test/airport"))
+
+
+@skipUnless(
+    default_connection.vendor == "postgresql",
+    "Needs a PostgreSQL server",
+)
+class PooledConnectionCheckTests(TestCase):
+    def wrapper(self):
+        from airport_service.postgresql_pool.base import DatabaseWrapper
+
+        return DatabaseWrapper(
+            {
+                **default_connection.settings_dict,
+                "ENGINE": "airport_service.postgresql_pool",
+                "OPTIONS": {"pool": {"min_size": 0, "max_size": 1}},
+            },
+            alias="check-test",
+        )
+
+    def tearDown(self):
+        close_pool(
+            f"check-test/{default_connection.settings_dict['NAME']}"
+        )
+
+    def backend_pid(self, wrapper):
+        with wrapper.cursor() as cursor:
+            cursor.execute("SELECT pg_backend_pid()")
+            return cursor.fetchone()[0]
+
+    def test_terminated_connection_is_replaced(self):
+        wrapper = self.wrapper()
+        pid = self.backend_pid(wrapper)
+        wrapper.close()
+
+        with default_connection.cursor() as cursor:
+            cursor.execute("SELECT pg_terminate_backend(%s)", [pid])
+
+        self.assertNotEqual(self.backend_pid(wrapper), pid)
+        self.assertEqual(wrapper.pool.stats.connections_discarded, 1)
+        wrapper.close()
+
+    def test_connection_in_transaction_is_rolled_back(self):
+        wrapper = self.wrapper()
+        wrapper.set_autocommit(False)
+        pid = self.backend_pid(wrapper)
+        wrapper.close()
+
+        self.assertEqual(self.backend_pid(wrapper), pid)
+        self.assertEqual(wrapper.pool.snapshot()["idle"], 0)
+        wrapper.close()
+
+
+class DatabasePoolStatsApiTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+
+    def test_admin_required(self):
+        user = get_user_model().objects.create_user(
+            "test@test.com", "testpass"
+        )
+        self.client.force_authenticate(user)
+
+        response = self.client.get(POOL_STATS_URL)
+
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+    def test_stats_of_known_pools(self):
+        admin = get_user_model().objects.create_superuser(
+            "admin@test.com", "testpass"
+        )
+        self.client.force_authenticate(admin)
+        get_pool("stats-test", min_size=0, max_size=1)
+
+        response = self.client.get(POOL_STATS_URL)
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["stats-test"]["max_size"], 1)
@@ -5,7 +5,8 @@ from rest_framework import status
 from rest_framework.test import APIClient
 
 from airport.models import Crew
-from airport.serializers import CrewListSerializer, CrewSerializer
+from airport.roster import upcoming_flights_prefetch
+from airport.serializers import CrewListSerializer, CrewDetailSerializer
 from airport.views import ApiPagination
 
 CREW_URL = reverse("airport:crew-list")
@@ -48,10 +49,18 @@ class UnauthenticatedCrewApiTests(TestCase):
         url = detail_url(crew.id)
         response = self.client.get(url)
 
-        serializer = CrewSerializer(crew)
+        serializer = CrewDetailSerializer(
+            Crew.objects.prefetch_related(upcoming_flights_prefetch()).get(
+                id=crew.id
+            )
+        )
+
+        expected = dict(serializer.data)
+        # The schedule is for the staff only
+        expected.pop("upcoming_flights")
 
         self.assertEqual(response.status_code, status.HTTP_200_OK)
-        self.assertEqual(response.data, serializer.data)
+        self.assertEqual(response.data, expected)
 
     def test_filter_crews_by_position(self):
         crew1 = sample_crew(position="Captain")
@@ -0,0 +1,160 @@
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from airport.models import Airport, Route, AirplaneType, Airplane, Flight, Crew
+
+AVAILABLE_URL = reverse("airport:crew-available")
+
+START = datetime(2030, 7, 10, 8, tzinfo=dt_timezone.utc)
+
+
+def hours(count):
+    return START + timedelta(hours=count)
+
+
+def sample_route(**params):
+    airport1 = Airport.objects.create(name="Airport 1")
+    airport2 = Airport.objects.create(name="Airport 2")
+
+    defaults = {
+        "source": airport1,
+        "destination": airport2,
+        "distance": 1000
+    }
+    defaults.update(params)
+
+    return Route.objects.create(**defaults)
+
+
+def sample_airplane(**params):
+    airplane_type = AirplaneType.objects.create(name="Compact")
+
+    defaults = {
+        "name": "Boeing",
+        "rows": 30,
+        "seats_in_row": 6,
+        "airplane_type": airplane_type
+    }
+    defaults.update(params)
+
+    return Airplane.objects.create(**defaults)
+
+
+def sample_flight(crews=(), **params):
+    defaults = {
+        "route": sample_route(),
+        "airplane": sample_airplane(),
+        "departure_time": hours(0),
+        "arrival_time": hours(2),
+    }
+    defaults.update(params)
+
+    flight = Flight.objects.create(**defaults)
+    flight.crews.add(*crews)
+
+    return flight
+
+
+def sample_crew(**params):
+    defaults = {
+        "first_name": "John",
+        "last_name": "Smith",
+        "position": Crew.CAPTAIN,
+    }
+    defaults.update(params)
+
+    return Crew.objects.create(**defaults)
+
+
+class CrewAvailabilityApiTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            "admin@test.com",
+            "adminpass",
+            is_staff=True
+        )
+        self.client.force_authenticate(self.user)
+
+    def available(self, **params):
+        params.setdefault("from", "2030-07-10T08:00:00Z")
+        params.setdefault("to", "2030-07-10T10:00:00Z")
+
+        return self.client.get(AVAILABLE_URL, params)
+
+    def test_free_crews_ranked_by_duty_hours(self):
+        busy = sample_crew(last_name="Busy")
+        rested = sample_crew(last_name="Rested")
+        tired = sample_crew(last_name="Tired")
+        sample_crew(last_name="Attendant", position=Crew.FLIGHT_ATTENDANT)
+
+        sample_flight(crews=[busy])
+        # Back to back with the period, earlier in the month
+        sample_flight(
+            crews=[tired, rested], departure_time=hours(-3), arrival_time=hours(0)
+        )
+        sample_flight(
+            crews=[tired], departure_time=hours(-30), arrival_time=hours(-25)
+        )
+        # Next month, not counted
+        sample_flight(
+            crews=[rested],
+            departure_time=hours(24 * 30),
+            arrival_time=hours(24 * 30 + 8),
+        )
+
+        response = self.available(position="captain")
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            [
+                (crew["id"], crew["duty_hours"])
+                for crew in response.data["results"]
+            ],
+            [(rested.id, 3), (tired.id, 8)],
+        )
+
+    def test_crews_without_flights(self):
+        crew = sample_crew()
+
+        response = self.available()
+
+        self.assertEqual(
+            response.data["results"],
+            [
+                {
+                    "id": crew.id,
+                    "position": Crew.CAPTAIN,
+                    "full_name": "John Smith",
+                    "duty_hours": 0,
+                }
+            ],
+        )
+
+    def test_invalid_period(self):
+        response = self.available(to="2030-07-10T07:00:00Z")
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn("to", response.data)
+
+        response = self.client.get(AVAILABLE_URL)
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(set(response.data), {"from", "to"})
+
+    def test_available_is_admin_only(self):
+        client = APIClient()
+        client.force_authenticate(
+            get_user_model().objects.create_user(
+                "user@test.com", "password", username="user"
+            )
+        )
+
+        response = client.get(AVAILABLE_URL)
+
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
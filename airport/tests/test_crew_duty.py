@@ -0,0 +1,294 @@
+import io
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from airport.duty import duty_rules, duty_violations, month_bounds
+from airport.models import Airport, Route, AirplaneType, Airplane, Flight, Crew
+
+FLIGHT_URL = reverse("airport:flight-list")
+DUTY_VIOLATIONS_URL = reverse("airport:crew-duty-violations")
+DUTY_CHECK_URL = reverse("airport:crew-duty-check")
+
+START = datetime(2030, 7, 10, 6, tzinfo=dt_timezone.utc)
+
+DUTY_RULES = {
+    "default": {
+        "max_duty_hours": 8,
+        "min_rest_hours": 10,
+        "max_monthly_hours": 20,
+    },
+    Crew.FLIGHT_ATTENDANT: {
+        "max_duty_hours": 12,
+        "min_rest_hours": 10,
+        "max_monthly_hours": 20,
+    },
+}
+
+
+def hours(count):
+    return START + timedelta(hours=count)
+
+
+def sample_route(**params):
+    airport1 = Airport.objects.create(name="Airport 1")
+    airport2 = Airport.objects.create(name="Airport 2")
+
+    defaults = {
+        "source": airport1,
+        "destination": airport2,
+        "distance": 1000
+    }
+    defaults.update(params)
+
+    return Route.objects.create(**defaults)
+
+
+def sample_airplane(**params):
+    airplane_type = AirplaneType.objects.create(name="Compact")
+
+    defaults = {
+        "name": "Boeing",
+        "rows": 30,
+        "seats_in_row": 6,
+        "airplane_type": airplane_type
+    }
+    defaults.update(params)
+
+    return Airplane.objects.create(**defaults)
+
+
+def sample_flight(crews=(), **params):
+    defaults = {
+        "route": sample_route(),
+        "airplane": sample_airplane(),
+        "departure_time": hours(0),
+        "arrival_time": hours(3),
+    }
+    defaults.update(params)
+
+    flight = Flight.objects.create(**defaults)
+    flight.crews.add(*crews)
+
+    return flight
+
+
+def sample_crew(**params):
+    defaults = {
+        "first_name": "John",
+        "last_name": "Smith",
+        "position": Crew.CAPTAIN,
+    }
+    defaults.update(params)
+
+    return Crew.objects.create(**defaults)
+
+
+@override_settings(CREW_DUTY_RULES=DUTY_RULES)
+class DutyViolationsTests(TestCase):
+    def violations(self, *flights, position=Crew.CAPTAIN):
+        start, end = month_bounds(START)
+        rows = [
+            (1, position, flight_id, hours(departure), hours(arrival))
+            for flight_id, (departure, arrival) in enumerate(flights, 1)
+        ]
+
+        return [
+            (violation["rule"], violation["hours"], violation["flights"])
+            for violation in duty_violations(rows, start, end, duty_rules())
+        ]
+
+    def test_short_rest_extends_the_duty_period(self):
+        self.assertEqual(
+            self.violations((0, 3), (4, 6), (15, 17)),
+            [("duty_period", 17, [1, 2, 3])],
+        )
+
+    def test_rest_ends_the_duty_period(self):
+        self.assertEqual(self.violations((0, 3), (4, 6), (16, 18)), [])
+
+    def test_rules_of_the_position(self):
+        self.assertEqual(
+            self.violations(
+                (0, 3), (4, 10), position=Crew.FLIGHT_ATTENDANT
+            ),
+            [],
+        )
+        self.assertEqual(
+            self.violations((0, 3), (4, 10)),
+            [("duty_period", 10, [1, 2])],
+        )
+
+    def test_monthly_hours(self):
+        # Six days of 4 hours, the last one only half in the month
+        flights = [(day * 24, day * 24 + 4) for day in range(5)]
+        flights.append((520, 524))
+
+        self.assertEqual(
+            self.violations(*flights),
+            [("monthly_hours", 22, [1, 2, 3, 4, 5, 6])],
+        )
+
+    def test_benchmark_command(self):
+        stdout = io.StringIO()
+
+        call_command(
+            "benchmark_crew_duty", crews=10, flights=5, stdout=stdout
+        )
+
+        self.assertIn("50 assignments", stdout.getvalue())
+
+
+@override_settings(CREW_DUTY_RULES=DUTY_RULES)
+class CrewDutyApiTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            "admin@test.com",
+            "adminpass",
+            is_staff=True
+        )
+        self.client.force_authenticate(self.user)
+        self.crew = sample_crew()
+        self.flight = sample_flight(crews=[self.crew])
+
+    def payload(self, departure, arrival):
+        return {
+            "route": sample_route().id,
+            "airplane": sample_airplane().id,
+            "departure_time": departure,
+            "arrival_time": arrival,
+            "crews": [self.crew.id],
+        }
+
+    def test_create_flight_breaking_duty_rules(self):
+        response = self.client.post(
+            FLIGHT_URL, self.payload(hours(4), hours(9))
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn(f"Crew {self.crew.id}", response.data["crews"][0])
+
+    def test_create_flight_after_rest(self):
+        response = self.client.post(
+            FLIGHT_URL, self.payload(hours(13), hours(18))
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+
+    def test_reschedule_breaking_duty_rules(self):
+        later = sample_flight(
+            crews=[self.crew], departure_time=hours(13), arrival_time=hours(18)
+        )
+
+        response = self.client.patch(
+            reverse("airport:flight-detail", args=[later.id]),
+            {"departure_time": hours(5)},
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_month_violations(self):
+        other = sample_crew(first_name="Jane")
+        # Made before the rules, in July and in August
+        sample_flight(
+            crews=[self.crew, other],
+            departure_time=hours(4),
+            arrival_time=hours(9),
+        )
+        sample_flight(
+            crews=[self.crew],
+            departure_time=hours(24 * 30),
+            arrival_time=hours(24 * 30 + 9),
+        )
+
+        response = self.client.get(DUTY_VIOLATIONS_URL, {"month": "2030-07"})
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            [
+                (violation["crew"], violation["rule"], violation["hours"])
+                for violation in response.data
+            ],
+            [(self.crew.id, "duty_period", 9)],
+        )
+
+        response = self.client.get(DUTY_VIOLATIONS_URL, {"month": "2030-08"})
+
+        self.assertEqual(
+            [violation["start"] for violation in response.data],
+            ["2030-08-09T06:00:00Z"],
+        )
+
+    def test_duty_check_is_a_dry_run(self):
+        response = self.client.post(
+            DUTY_CHECK_URL,
+            {
+                "changes": [
+                    {
+                        "departure_time": hours(4),
+                        "arrival_time": hours(9),
+                        "crews": [self.crew.id],
+                    },
+                    {"flight": self.flight.id, "arrival_time": hours(4)},
+                ]
+            },
+            format="json",
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.data), 1)
+        self.assertEqual(response.data[0]["flights"], [self.flight.id, None])
+        self.assertEqual(Flight.objects.count(), 1)
+        self.flight.refresh_from_db()
+        self.assertEqual(self.flight.arrival_time, hours(3))
+
+    def test_duty_check_moving_a_crew_away(self):
+        response = self.client.post(
+            DUTY_CHECK_URL,
+            {
+                "changes": [
+                    {
+                        "departure_time": hours(4),
+                        "arrival_time": hours(9),
+                        "crews": [self.crew.id],
+                    },
+                    {"flight": self.flight.id, "crews": []},
+                ]
+            },
+            format="json",
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data, [])
+
+    def test_duty_check_requires_times_of_new_flights(self):
+        response = self.client.post(
+            DUTY_CHECK_URL,
+            {"changes": [{"crews": [self.crew.id]}]},
+            format="json",
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_duty_endpoints_are_admin_only(self):
+        client = APIClient()
+        client.force_authenticate(
+            get_user_model().objects.create_user(
+                "user@test.com", "password", username="user"
+            )
+        )
+
+        self.assertEqual(
+            client.get(DUTY_VIOLATIONS_URL).status_code,
+            status.HTTP_403_FORBIDDEN,
+        )
+        self.assertEqual(
+            client.post(DUTY_CHECK_URL, {}, format="json").status_code,
+            status.HTTP_403_FORBIDDEN,
+        )
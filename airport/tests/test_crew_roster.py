@@ -0,0 +1,277 @@
+import csv
+import io
+from datetime import timedelta
+
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from airport.models import Airport, Route, AirplaneType, Airplane, Flight, Crew
+from airport.roster import ics_line
+
+NOW = timezone.now().replace(microsecond=0)
+
+
+def hours(count):
+    return NOW + timedelta(hours=count)
+
+
+def sample_route(**params):
+    airport1 = Airport.objects.create(name="Kyiv")
+    airport2 = Airport.objects.create(name="Lviv, West")
+
+    defaults = {
+        "source": airport1,
+        "destination": airport2,
+        "distance": 1000
+    }
+    defaults.update(params)
+
+    return Route.objects.create(**defaults)
+
+
+def sample_airplane(**params):
+    airplane_type = AirplaneType.objects.create(name="Compact")
+
+    defaults = {
+        "name": "Boeing",
+        "rows": 30,
+        "seats_in_row": 6,
+        "airplane_type": airplane_type
+    }
+    defaults.update(params)
+
+    return Airplane.objects.create(**defaults)
+
+
+def sample_flight(crews=(), **params):
+    defaults = {
+        "route": sample_route(),
+        "airplane": sample_airplane(),
+        "departure_time": hours(1),
+        "arrival_time": hours(3),
+    }
+    defaults.update(params)
+
+    flight = Flight.objects.create(**defaults)
+    flight.crews.add(*crews)
+
+    return flight
+
+
+def sample_crew(**params):
+    defaults = {
+        "first_name": "John",
+        "last_name": "Smith",
+        "position": Crew.CAPTAIN,
+    }
+    defaults.update(params)
+
+    return Crew.objects.create(**defaults)
+
+
+def detail_url(crew_id):
+    return reverse("airport:crew-detail", args=[crew_id])
+
+
+def roster_url(crew_id):
+    return reverse("airport:crew-roster", args=[crew_id])
+
+
+def streamed(response):
+    return b"".join(response.streaming_content).decode()
+
+
+class CrewRosterApiTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            "admin@test.com",
+            "adminpass",
+            is_staff=True
+        )
+        self.client.force_authenticate(self.user)
+        self.crew = sample_crew()
+        self.other = sample_crew(first_name="Jane")
+
+        self.landed = sample_flight(
+            crews=[self.crew], departure_time=hours(-5), arrival_time=hours(-3)
+        )
+        self.next = sample_flight(crews=[self.crew, self.other])
+        self.later = sample_flight(
+            crews=[self.crew],
+            departure_time=hours(24 * 40),
+            arrival_time=hours(24 * 40 + 2),
+        )
+        sample_flight(crews=[self.other], departure_time=hours(5))
+
+    def test_detail_with_upcoming_flights(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(detail_url(self.crew.id))
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            [flight["id"] for flight in response.data["upcoming_flights"]],
+            [self.next.id, self.later.id],
+        )
+        self.assertEqual(
+            response.data["upcoming_flights"][0]["destination"], "Lviv, West"
+        )
+        # The crew member, then its flights with their names
+        self.assertEqual(len(queries), 2)
+
+    def test_detail_with_trimmed_fields(self):
+        response = self.client.get(
+            detail_url(self.crew.id),
+            {"fields": "id,upcoming_flights.id"},
+        )
+
+        self.assertEqual(
+            response.data,
+            {
+                "id": self.crew.id,
+                "upcoming_flights": [
+                    {"id": self.next.id}, {"id": self.later.id}
+                ],
+            },
+        )
+
+    def test_roster_of_the_period(self):
+        response = self.client.get(
+            roster_url(self.crew.id),
+            {
+                "start": hours(-6).isoformat(),
+                "end": hours(24).isoformat(),
+            },
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["full_name"], "John Smith")
+        self.assertEqual(
+            [flight["id"] for flight in response.data["flights"]],
+            [self.landed.id, self.next.id],
+        )
+
+    def test_roster_datetime_format(self):
+        response = self.client.get(roster_url(self.crew.id))
+
+        self.assertEqual(
+            response.data["flights"][0]["departure_time"],
+            timezone.localtime(self.next.departure_time).strftime(
+                "%Y-%m-%d %H:%M"
+            ),
+        )
+
+    def test_roster_requires_admin(self):
+        self.client.force_authenticate(
+            get_user_model().objects.create_user(
+                "user@test.com", "password", username="user"
+            )
+        )
+
+        response = self.client.get(roster_url(self.crew.id))
+
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+    def test_detail_hides_upcoming_flights_from_non_admins(self):
+        self.client.force_authenticate(
+            get_user_model().objects.create_user(
+                "user@test.com", "password", username="user"
+            )
+        )
+
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(detail_url(self.crew.id))
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNotIn("upcoming_flights", response.data)
+        self.assertEqual(response.data["first_name"], "John")
+        # No prefetch of the flights
+        self.assertEqual(len(queries), 1)
+
+    def test_roster_defaults_to_next_30_days(self):
+        response = self.client.get(roster_url(self.crew.id))
+
+        self.assertEqual(
+            [flight["id"] for flight in response.data["flights"]],
+            [self.next.id],
+        )
+
+    def test_roster_period_limit(self):
+        params = {"start": hours(0).isoformat(), "end": hours(24 * 400)}
+
+        response = self.client.get(roster_url(self.crew.id), params)
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+        response = self.client.get(
+            roster_url(self.crew.id), {**params, "export": "csv"}
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_csv_export(self):
+        response = self.client.get(
+            roster_url(self.crew.id),
+            {"start": hours(-6).isoformat(), "export": "csv"},
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response["Content-Type"], "text/csv")
+        self.assertIn("crew-", response["Content-Disposition"])
+        rows = list(csv.reader(io.StringIO(streamed(response))))
+        self.assertEqual(rows[0][0], "flight")
+        self.assertEqual(
+            rows[1:],
+            [
+                [
+                    str(flight.id),
+                    "Kyiv",
+                    "Lviv, West",
+                    "Boeing",
+                    flight.departure_time.isoformat(),
+                    flight.arrival_time.isoformat(),
+                ]
+                for flight in (self.landed, self.next)
+            ],
+        )
+
+    def test_ics_export(self):
+        response = self.client.get(
+            roster_url(self.crew.id), {"export": "ics"}
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(response["Content-Type"].startswith("text/calendar"))
+        content = streamed(response)
+        self.assertTrue(content.startswith("BEGIN:VCALENDAR\r\n"))
+        self.assertTrue(content.endswith("END:VCALENDAR\r\n"))
+        self.assertEqual(content.count("BEGIN:VEVENT"), 1)
+        self.assertIn(
+            f"SUMMARY:Flight {self.next.id}: Kyiv - Lviv\\, West\r\n", content
+        )
+        self.assertIn(
+            "DTSTART:" + hours(1).strftime("%Y%m%dT%H%M%SZ"), content
+        )
+
+    def test_invalid_export(self):
+        response = self.client.get(
+            roster_url(self.crew.id), {"export": "pdf"}
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_ics_line_folding(self):
+        line = "DESCRIPTION:" + "é" * 80
+
+        folded = ics_line(line)
+
+        self.assertTrue(
+            all(len(part.encode()) <= 75 for part in folded.split("\r\n"))
+        )
+        self.assertEqual(folded.replace("\r\n ", "").rstrip("\r\n"), line)
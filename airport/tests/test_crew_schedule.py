@@ -0,0 +1,299 @@
+import threading
+from datetime import datetime, timedelta, timezone as dt_timezone
+from unittest import skipUnless
+
+from django.contrib.auth import get_user_model
+from django.db import connection, transaction
+from django.test import TestCase, TransactionTestCase
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.exceptions import ValidationError
+from rest_framework.test import APIClient
+
+from airport.models import Airport, Route, AirplaneType, Airplane, Flight, Crew
+from airport.scheduling import IntervalIndex, schedule_integrity_errors
+
+FLIGHT_URL = reverse("airport:flight-list")
+CONFLICTS_URL = reverse("airport:crew-conflicts")
+
+START = datetime(2030, 7, 25, 8, tzinfo=dt_timezone.utc)
+
+
+def hours(count):
+    return START + timedelta(hours=count)
+
+
+def sample_route(**params):
+    airport1 = Airport.objects.create(name="Airport 1")
+    airport2 = Airport.objects.create(name="Airport 2")
+
+    defaults = {
+        "source": airport1,
+        "destination": airport2,
+        "distance": 1000
+    }
+    defaults.update(params)
+
+    return Route.objects.create(**defaults)
+
+
+def sample_airplane(**params):
+    airplane_type = AirplaneType.objects.create(name="Compact")
+
+    defaults = {
+        "name": "Boeing",
+        "rows": 30,
+        "seats_in_row": 6,
+        "airplane_type": airplane_type
+    }
+    defaults.update(params)
+
+    return Airplane.objects.create(**defaults)
+
+
+def sample_flight(crews=(), **params):
+    defaults = {
+        "route": sample_route(),
+        "airplane": sample_airplane(),
+        "departure_time": hours(0),
+        "arrival_time": hours(2),
+    }
+    defaults.update(params)
+
+    flight = Flight.objects.create(**defaults)
+    flight.crews.add(*crews)
+
+    return flight
+
+
+def sample_crew(**params):
+    defaults = {
+        "first_name": "John",
+        "last_name": "Smith",
+        "position": Crew.CAPTAIN,
+    }
+    defaults.update(params)
+
+    return Crew.objects.create(**defaults)
+
+
+def detail_url(flight_id):
+    return reverse("airport:flight-detail", args=[flight_id])
+
+
+class IntervalIndexTests(TestCase):
+    def test_overlapping(self):
+        index = IntervalIndex(
+            [
+                ("a", 0, 10, 1),
+                ("a", 2, 3, 2),
+                ("a", 12, 14, 3),
+                ("a", 14, 16, 4),
+                ("b", 0, 100, 5),
+                ("a", 5, None, 6),
+            ]
+        )
+
+        self.assertEqual(
+            [value for _, _, value in index.overlapping("a", 9, 13)], [1, 3]
+        )
+        # Back to back intervals don't overlap
+        self.assertEqual(index.overlapping("a", 10, 12), [])
+        self.assertEqual(index.overlapping("a", 16, 20), [])
+        # A long interval is found past shorter ones starting after it
+        self.assertEqual(
+            [value for _, _, value in index.overlapping("a", 4, 5)], [1]
+        )
+        self.assertEqual(index.overlapping("c", 0, 100), [])
+        self.assertEqual(index.overlapping("a", 5, None), [])
+
+    def test_overlaps(self):
+        index = IntervalIndex(
+            [
+                ("a", 0, 10, 1),
+                ("a", 2, 3, 2),
+                ("a", 5, 12, 3),
+                ("a", 12, 14, 4),
+                ("b", 0, 10, 5),
+            ]
+        )
+
+        self.assertEqual(
+            [(key, first[2], second[2]) for key, first, second in (
+                index.overlaps()
+            )],
+            [("a", 1, 2), ("a", 1, 3)],
+        )
+
+
+class CrewScheduleApiTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            "admin@test.com",
+            "adminpass",
+            is_staff=True
+        )
+        self.client.force_authenticate(self.user)
+        self.crew = sample_crew()
+        self.flight = sample_flight(crews=[self.crew])
+
+    def payload(self, departure, arrival, crews):
+        return {
+            "route": sample_route().id,
+            "airplane": sample_airplane().id,
+            "departure_time": departure,
+            "arrival_time": arrival,
+            "crews": [crew.id for crew in crews],
+        }
+
+    def test_create_flight_with_busy_crew(self):
+        response = self.client.post(
+            FLIGHT_URL, self.payload(hours(1), hours(3), [self.crew])
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn(str(self.flight.id), response.data["crews"][0])
+
+    def test_create_back_to_back_flight(self):
+        other = sample_crew(first_name="Jane")
+
+        response = self.client.post(
+            FLIGHT_URL, self.payload(hours(2), hours(4), [self.crew, other])
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(
+            set(Flight.objects.get(id=response.data["id"]).crews.all()),
+            {self.crew, other},
+        )
+
+    def test_reschedule_into_overlap(self):
+        later = sample_flight(
+            crews=[self.crew], departure_time=hours(5), arrival_time=hours(7)
+        )
+
+        response = self.client.patch(
+            detail_url(later.id), {"departure_time": hours(1)}
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_update_keeps_own_schedule(self):
+        response = self.client.patch(
+            detail_url(self.flight.id), {"arrival_time": hours(3)}
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_conflicts_report(self):
+        # Conflicts made before the checks existed are reported
+        if connection.vendor == "postgresql":
+            with connection.cursor() as cursor:
+                cursor.execute("SET CONSTRAINTS ALL IMMEDIATE")
+                cursor.execute(
+                    "ALTER TABLE airport_flight_crews "
+                    "DISABLE TRIGGER airport_flight_crews_schedule"
+                )
+
+        second = sample_flight(
+            crews=[self.crew], departure_time=hours(1), arrival_time=hours(4)
+        )
+        sample_flight(
+            crews=[self.crew], departure_time=hours(4), arrival_time=hours(5)
+        )
+
+        response = self.client.get(CONFLICTS_URL)
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.data), 1)
+        self.assertEqual(response.data[0]["crew"], self.crew.id)
+        self.assertEqual(
+            (response.data[0]["flight"], response.data[0]["other_flight"]),
+            (self.flight.id, second.id),
+        )
+        self.assertEqual(
+            response.data[0]["overlap_start"], "2030-07-25T09:00:00Z"
+        )
+        self.assertEqual(
+            response.data[0]["overlap_end"], "2030-07-25T10:00:00Z"
+        )
+
+    def test_conflicts_report_is_admin_only(self):
+        client = APIClient()
+        client.force_authenticate(
+            get_user_model().objects.create_user(
+                "user@test.com", "password", username="user"
+            )
+        )
+
+        response = client.get(CONFLICTS_URL)
+
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+
+@skipUnless(
+    connection.vendor == "postgresql", "The trigger only exists on PostgreSQL"
+)
+class CrewScheduleTriggerTests(TestCase):
+    def test_overlapping_assignment_is_rejected_at_commit(self):
+        crew = sample_crew()
+        sample_flight(crews=[crew])
+        flight = sample_flight(departure_time=hours(1), arrival_time=hours(3))
+
+        with self.assertRaises(ValidationError):
+            with schedule_integrity_errors(), transaction.atomic():
+                flight.crews.add(crew)
+                # What the commit does with the deferred trigger
+                with connection.cursor() as cursor:
+                    cursor.execute("SET CONSTRAINTS ALL IMMEDIATE")
+
+    def test_reassignment_within_a_transaction(self):
+        crew = sample_crew()
+        first = sample_flight(crews=[crew])
+        second = sample_flight(departure_time=hours(1), arrival_time=hours(3))
+
+        with transaction.atomic():
+            second.crews.add(crew)
+            first.crews.remove(crew)
+            with connection.cursor() as cursor:
+                cursor.execute("SET CONSTRAINTS ALL IMMEDIATE")
+
+        self.assertEqual(list(crew.flight_set.all()), [second])
+
+
+@skipUnless(
+    connection.vendor == "postgresql", "The trigger only exists on PostgreSQL"
+)
+class ConcurrentCrewAssignmentTests(TransactionTestCase):
+    def test_concurrent_overlapping_assignments(self):
+        crew = sample_crew()
+        first = sample_flight()
+        second = sample_flight(departure_time=hours(1), arrival_time=hours(3))
+
+        checked = threading.Event()
+
+        def assign_first():
+            try:
+                with transaction.atomic():
+                    first.crews.add(crew)
+                    with connection.cursor() as cursor:
+                        cursor.execute("SET CONSTRAINTS ALL IMMEDIATE")
+                    checked.set()
+                    # Committed while the other transaction waits
+                    threading.Event().wait(0.3)
+            finally:
+                connection.close()
+
+        other = threading.Thread(target=assign_first)
+        other.start()
+        checked.wait(5)
+
+        with self.assertRaises(ValidationError):
+            with schedule_integrity_errors(), transaction.atomic():
+                second.crews.add(crew)
+                with connection.cursor() as cursor:
+                    cursor.execute("SET CONSTRAINTS ALL IMMEDIATE")
+        other.join()
+
+        self.assertEqual(list(crew.flight_set.all()), [first])
@@ -0,0 +1,274 @@
+from datetime import datetime, timezone as dt_timezone
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from airport.dynamic_fields import parse_field_tree
+from airport.models import (
+    Airport,
+    Route,
+    AirplaneType,
+    Airplane,
+    Crew,
+    Flight,
+    Order,
+    Ticket,
+    Payment,
+)
+
+AIRPLANE_URL = reverse("airport:airplane-list")
+CREW_URL = reverse("airport:crew-list")
+FLIGHT_URL = reverse("airport:flight-list")
+ROUTE_URL = reverse("airport:route-list")
+ORDER_URL = reverse("airport:order-list")
+PAYMENT_URL = reverse("airport:payment-list")
+
+
+def sample_route(**params):
+    source = Airport.objects.create(name="Boryspil", closest_big_city="Kyiv")
+    destination = Airport.objects.create(
+        name="Heathrow", closest_big_city="London"
+    )
+
+    defaults = {
+        "source": source,
+        "destination": destination,
+        "distance": 2170,
+    }
+    defaults.update(params)
+
+    return Route.objects.create(**defaults)
+
+
+def sample_airplane(**params):
+    airplane_type = AirplaneType.objects.create(name="Compact")
+
+    defaults = {
+        "name": "Boeing",
+        "rows": 30,
+        "seats_in_row": 6,
+        "airplane_type": airplane_type,
+    }
+    defaults.update(params)
+
+    return Airplane.objects.create(**defaults)
+
+
+def sample_flight(**params):
+    defaults = {
+        "route": sample_route(),
+        "airplane": sample_airplane(),
+        "departure_time": datetime(2023, 7, 25, 14, tzinfo=dt_timezone.utc),
+        "arrival_time": datetime(2023, 7, 25, 16, tzinfo=dt_timezone.utc),
+    }
+    defaults.update(params)
+
+    return Flight.objects.create(**defaults)
+
+
+def detail_url(name, pk):
+    return reverse(f"airport:{name}-detail", args=[pk])
+
+
+class ParseFieldTreeTests(TestCase):
+    def test_parse_field_tree(self):
+        self.assertEqual(
+            parse_field_tree("id, tickets.row,tickets.flight.route,"),
+            {"id": {}, "tickets": {"row": {}, "flight": {"route": {}}}},
+        )
+
+    def test_missing_parameter(self):
+        self.assertIsNone(parse_field_tree(None))
+        self.assertEqual(parse_field_tree(""), {})
+
+
+class PublicDynamicFieldsTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.flight = sample_flight()
+        self.flight.crews.add(
+            Crew.objects.create(
+                first_name="John", last_name="Doe", position="Pilot"
+            )
+        )
+
+    def test_flight_list_fields(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(
+                FLIGHT_URL, {"fields": "id,departure_time"}
+            )
+
+        self.assertEqual(
+            response.data["results"],
+            [{"id": self.flight.id, "departure_time": "2023-07-25 14:00"}],
+        )
+        page_query = queries.captured_queries[-1]["sql"]
+        self.assertNotIn("airport_ticket", page_query)
+        self.assertNotIn("airport_airplane", page_query)
+
+    def test_flight_detail_collapsed_relations(self):
+        response = self.client.get(
+            detail_url("flight", self.flight.id),
+            {"fields": "id,airplane,route,crews", "expand": "route"},
+        )
+
+        self.assertEqual(response.data["airplane"], self.flight.airplane_id)
+        self.assertEqual(response.data["crews"], [self.flight.crews.get().id])
+        self.assertEqual(response.data["route"]["distance"], 2170)
+        self.assertEqual(
+            response.data["route"]["source"], self.flight.route.source_id
+        )
+        self.assertEqual(
+            set(response.data), {"id", "airplane", "route", "crews"}
+        )
+
+    def test_flight_detail_expand_nested_relation(self):
+        response = self.client.get(
+            detail_url("flight", self.flight.id),
+            {"fields": "route", "expand": "route.source"},
+        )
+
+        self.assertEqual(response.data["route"]["source"]["name"], "Boryspil")
+        self.assertEqual(
+            response.data["route"]["destination"],
+            self.flight.route.destination_id,
+        )
+
+    def test_flight_detail_nested_fields(self):
+        with self.assertNumQueries(2):
+            response = self.client.get(
+                detail_url("flight", self.flight.id),
+                {"fields": "route.distance,crews.full_name"},
+            )
+
+        self.assertEqual(
+            response.data,
+            {
+                "crews": [{"full_name": "John Doe"}],
+                "route": {"distance": 2170},
+            },
+        )
+
+    def test_route_list_collapsed(self):
+        response = self.client.get(ROUTE_URL, {"expand": ""})
+
+        self.assertEqual(
+            response.data["results"][0],
+            {
+                "id": self.flight.route_id,
+                "source": self.flight.route.source_id,
+                "destination": self.flight.route.destination_id,
+                "distance": 2170,
+            },
+        )
+
+    def test_airplane_list_property_field(self):
+        response = self.client.get(AIRPLANE_URL, {"fields": "id,capacity"})
+
+        self.assertEqual(
+            response.data["results"],
+            [{"id": self.flight.airplane_id, "capacity": 180}],
+        )
+
+    def test_crew_list_fields(self):
+        response = self.client.get(CREW_URL, {"fields": "full_name"})
+
+        self.assertEqual(
+            response.data["results"], [{"full_name": "John Doe"}]
+        )
+
+    def test_unknown_fields_ignored(self):
+        response = self.client.get(FLIGHT_URL, {"fields": "id,unknown"})
+
+        self.assertEqual(response.data["results"], [{"id": self.flight.id}])
+
+
+class PrivateDynamicFieldsTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            email="test@test.com",
+            password="testpass",
+            first_name="John",
+            last_name="Doe",
+        )
+        self.client.force_authenticate(self.user)
+        self.flight = sample_flight()
+        self.order = Order.objects.create(user=self.user)
+        for seat in (1, 2):
+            Ticket.objects.create(
+                row=3,
+                seat=seat,
+                price=Decimal("100.00"),
+                flight=self.flight,
+                order=self.order,
+            )
+
+    def test_order_list_nests_flights_by_default(self):
+        response = self.client.get(ORDER_URL)
+
+        flight = response.data["results"][0]["tickets"][0]["flight"]
+        self.assertEqual(flight["id"], self.flight.id)
+
+    def test_order_list_expand_tickets_only(self):
+        response = self.client.get(ORDER_URL, {"expand": "tickets"})
+
+        order = response.data["results"][0]
+        self.assertEqual(order["tickets"][0]["flight"], self.flight.id)
+        self.assertEqual(order["total_cost"], "200.00")
+
+    def test_order_list_without_tickets(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(
+                ORDER_URL, {"fields": "id,created_at"}
+            )
+
+        self.assertEqual(
+            set(response.data["results"][0]), {"id", "created_at"}
+        )
+        self.assertFalse(
+            any("airport_ticket" in query["sql"] for query in queries)
+        )
+
+    def test_order_list_nested_fields(self):
+        with self.assertNumQueries(3):
+            response = self.client.get(
+                ORDER_URL,
+                {"fields": "id,tickets.seat,tickets.flight.airplane_name"},
+            )
+
+        self.assertEqual(
+            response.data["results"][0]["tickets"],
+            [
+                {"seat": 1, "flight": {"airplane_name": "Boeing"}},
+                {"seat": 2, "flight": {"airplane_name": "Boeing"}},
+            ],
+        )
+
+    def test_payment_list_fields(self):
+        payment = Payment.objects.create(order=self.order)
+
+        response = self.client.get(
+            PAYMENT_URL, {"fields": "id,user_full_name"}
+        )
+
+        self.assertEqual(
+            response.data["results"],
+            [{"id": payment.id, "user_full_name": "John Doe"}],
+        )
+
+    def test_create_response_not_trimmed(self):
+        response = self.client.post(
+            f"{ORDER_URL}?fields=id",
+            {"tickets": [{"row": 5, "seat": 5, "flight": self.flight.id}]},
+            format="json",
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertIn("tickets", response.data)
@@ -0,0 +1,492 @@
+from datetime import datetime, timedelta, timezone as dt_timezone
+from decimal import Decimal
+from io import StringIO
+from unittest import mock
+
+import stripe
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from airport.models import (
+    Airport,
+    Route,
+    AirplaneType,
+    Airplane,
+    Crew,
+    Flight,
+    Order,
+    Ticket,
+    Payment,
+    Refund,
+)
+from airport.scheduling import validate_airplane_schedule
+
+ORDER_URL = reverse("airport:order-list")
+SUCCESS_URL = reverse("airport:success")
+CANCEL_URL = reverse("airport:cancelled")
+
+START = datetime(2030, 7, 25, 8, tzinfo=dt_timezone.utc)
+
+
+def hours(count):
+    return START + timedelta(hours=count)
+
+
+def sample_route(**params):
+    airport1 = Airport.objects.create(name="Airport 1")
+    airport2 = Airport.objects.create(name="Airport 2")
+
+    defaults = {
+        "source": airport1,
+        "destination": airport2,
+        "distance": 1000
+    }
+    defaults.update(params)
+
+    return Route.objects.create(**defaults)
+
+
+def sample_airplane(**params):
+    airplane_type = AirplaneType.objects.create(name="Compact")
+
+    defaults = {
+        "name": "Boeing",
+        "rows": 30,
+        "seats_in_row": 6,
+        "airplane_type": airplane_type
+    }
+    defaults.update(params)
+
+    return Airplane.objects.create(**defaults)
+
+
+def sample_flight(**params):
+    defaults = {
+        "route": sample_route(),
+        "airplane": sample_airplane(),
+        "departure_time": hours(0),
+        "arrival_time": hours(2),
+    }
+    defaults.update(params)
+
+    return Flight.objects.create(**defaults)
+
+
+def sample_order(user, *tickets, status_payment=None):
+    order = Order.objects.create(user=user)
+
+    for flight, row, seat in tickets:
+        Ticket.objects.create(
+            flight=flight, order=order, row=row, seat=seat, price=10
+        )
+
+    if status_payment is not None:
+        Payment.objects.create(
+            order=order,
+            status_payment=status_payment,
+            amount=order.total_cost(),
+            session_id=f"cs_{order.id}",
+        )
+
+    return order
+
+
+def cancel_url(flight_id):
+    return reverse("airport:flight-cancel", args=[flight_id])
+
+
+def detail_url(flight_id):
+    return reverse("airport:flight-detail", args=[flight_id])
+
+
+class FlightCancellationApiTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            "admin@test.com",
+            "adminpass",
+            is_staff=True
+        )
+        self.client.force_authenticate(self.user)
+
+        self.flight = sample_flight()
+        self.flight.crews.add(
+            Crew.objects.create(
+                first_name="John", last_name="Smith", position=Crew.CAPTAIN
+            )
+        )
+        self.other = sample_flight(
+            departure_time=hours(24), arrival_time=hours(26)
+        )
+
+        # Paid, only on the cancelled flight
+        self.paid = sample_order(
+            self.user,
+            (self.flight, 1, 1),
+            (self.flight, 1, 2),
+            status_payment=Payment.PAID,
+        )
+        # Paid, with a ticket left on the other flight
+        self.mixed = sample_order(
+            self.user,
+            (self.flight, 2, 1),
+            (self.other, 2, 1),
+            status_payment=Payment.PAID,
+        )
+        # Not paid yet
+        self.unpaid = sample_order(
+            self.user, (self.flight, 3, 1), status_payment=Payment.PENDING
+        )
+
+    def cancel(self, flight):
+        return self.client.post(cancel_url(flight.id))
+
+    def test_cancel_flight(self):
+        response = self.cancel(self.flight)
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["crews_released"], 1)
+        self.assertEqual(response.data["tickets_released"], 4)
+        self.assertEqual(response.data["orders_cancelled"], 2)
+        self.assertEqual(response.data["refunds_queued"], 2)
+
+        self.flight.refresh_from_db()
+        self.assertIsNotNone(self.flight.cancelled_at)
+        self.assertFalse(self.flight.crews.exists())
+        # Nothing is deleted
+        self.assertEqual(
+            Ticket.objects.filter(
+                flight=self.flight, cancelled_at=self.flight.cancelled_at
+            ).count(),
+            4,
+        )
+        self.assertFalse(
+            Ticket.objects.filter(
+                flight=self.other, cancelled_at__isnull=False
+            ).exists()
+        )
+
+    def test_orders_and_payments(self):
+        self.cancel(self.flight)
+
+        for order in (self.paid, self.mixed, self.unpaid):
+            order.refresh_from_db()
+        self.assertIsNotNone(self.paid.cancelled_at)
+        self.assertIsNone(self.mixed.cancelled_at)
+        self.assertIsNotNone(self.unpaid.cancelled_at)
+        self.assertEqual(self.mixed.total_cost(), Decimal("10"))
+
+        self.assertEqual(
+            {
+                (refund.payment.order_id, refund.amount, refund.status)
+                for refund in Refund.objects.select_related("payment")
+            },
+            {
+                (self.paid.id, Decimal("20"), Refund.PENDING),
+                (self.mixed.id, Decimal("10"), Refund.PENDING),
+            },
+        )
+        self.assertEqual(
+            self.paid.payments.get().status_payment, Payment.REFUND_PENDING
+        )
+        self.assertEqual(
+            self.mixed.payments.get().status_payment, Payment.REFUND_PENDING
+        )
+        unpaid = self.unpaid.payments.get()
+        self.assertEqual(unpaid.status_payment, Payment.CANCELLED)
+        self.assertEqual(unpaid.amount, Decimal("0"))
+
+    def test_order_with_several_payments(self):
+        # Paid in two parts of 10
+        payment = self.paid.payments.get()
+        payment.amount = Decimal("10")
+        payment.save()
+        Payment.objects.create(
+            order=self.paid,
+            status_payment=Payment.PAID,
+            amount=Decimal("10"),
+            session_id="cs_second",
+        )
+
+        self.cancel(self.flight)
+
+        self.assertEqual(
+            sorted(
+                Refund.objects.filter(payment__order=self.paid).values_list(
+                    "payment__session_id", "amount"
+                )
+            ),
+            [
+                (f"cs_{self.paid.id}", Decimal("10")),
+                ("cs_second", Decimal("10")),
+            ],
+        )
+
+    @mock.patch("airport.cancellation.stripe.checkout.Session.expire")
+    def test_open_checkout_sessions_are_expired(self, expire):
+        Payment.objects.filter(order=self.unpaid).update(
+            session_url="https://checkout.stripe.com/c/pay/cs",
+            session_expires_at=hours(0),
+        )
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.cancel(self.flight)
+
+        expire.assert_called_once_with(
+            f"cs_{self.unpaid.id}", api_key=mock.ANY
+        )
+        payment = self.unpaid.payments.get()
+        self.assertFalse(payment.has_open_session())
+
+    def test_seats_are_released(self):
+        self.cancel(self.flight)
+
+        response = self.client.get(detail_url(self.flight.id))
+
+        self.assertIsNotNone(response.data["cancelled_at"])
+        self.assertEqual(response.data["taken_places"], [])
+
+    def test_cancelled_flight_can_not_be_booked(self):
+        self.cancel(self.flight)
+
+        response = self.client.post(
+            ORDER_URL,
+            {"tickets": [{"flight": self.flight.id, "row": 1, "seat": 1}]},
+            format="json",
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_cancelled_flight_releases_its_airplane(self):
+        self.cancel(self.flight)
+
+        validate_airplane_schedule(
+            self.flight.airplane, hours(1), hours(3), None
+        )
+        sample_flight(
+            airplane=self.flight.airplane,
+            departure_time=hours(1),
+            arrival_time=hours(3),
+        )
+
+    def test_cancel_twice(self):
+        self.cancel(self.flight)
+
+        response = self.cancel(self.flight)
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(Refund.objects.count(), 2)
+
+    def test_queries_do_not_grow_with_the_tickets(self):
+        def queries(ticket_count):
+            flight = sample_flight(
+                departure_time=hours(48), arrival_time=hours(50)
+            )
+            for seat in range(1, ticket_count + 1):
+                sample_order(
+                    self.user,
+                    (flight, 1 + seat // 6, 1 + seat % 6),
+                    status_payment=Payment.PAID,
+                )
+
+            with CaptureQueriesContext(connection) as context:
+                response = self.cancel(flight)
+            self.assertEqual(response.data["refunds_queued"], ticket_count)
+
+            return len(context)
+
+        self.assertEqual(queries(2), queries(20))
+
+    def test_cancel_is_admin_only(self):
+        client = APIClient()
+        client.force_authenticate(
+            get_user_model().objects.create_user(
+                "user@test.com", "password", username="user"
+            )
+        )
+
+        response = client.post(cancel_url(self.flight.id))
+
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+
+class ProcessRefundsTests(TestCase):
+    def setUp(self):
+        user = get_user_model().objects.create_user(
+            "user@test.com", "password"
+        )
+        flight = sample_flight()
+        order = sample_order(
+            user, (flight, 1, 1), status_payment=Payment.PAID
+        )
+        self.payment = order.payments.get()
+
+        staff = APIClient()
+        staff.force_authenticate(
+            get_user_model().objects.create_user(
+                "admin@test.com", "adminpass", username="admin", is_staff=True
+            )
+        )
+        staff.post(cancel_url(flight.id))
+        self.refund = Refund.objects.get()
+
+    def process(self):
+        call_command("process_refunds", stdout=StringIO(), stderr=StringIO())
+        self.refund.refresh_from_db()
+        self.payment.refresh_from_db()
+
+    @mock.patch("airport.cancellation.stripe.Refund.create")
+    @mock.patch("airport.cancellation.stripe.checkout.Session.retrieve")
+    def test_refund_is_sent(self, retrieve, create):
+        retrieve.return_value = mock.Mock(payment_intent="pi_1")
+        create.return_value = mock.Mock(id="re_1")
+
+        self.process()
+
+        create.assert_called_once_with(
+            payment_intent="pi_1",
+            amount=1000,
+            idempotency_key=f"refund-{self.refund.id}",
+            api_key=mock.ANY,
+        )
+        self.assertEqual(self.refund.status, Refund.SUCCEEDED)
+        self.assertEqual(self.refund.stripe_refund_id, "re_1")
+        self.assertEqual(self.payment.status_payment, Payment.REFUNDED)
+
+    @override_settings(REFUND_MAX_ATTEMPTS=2)
+    @mock.patch("airport.cancellation.stripe.checkout.Session.retrieve")
+    def test_failed_refund_is_retried(self, retrieve):
+        retrieve.side_effect = stripe.error.APIConnectionError("Timeout")
+
+        self.process()
+
+        self.assertEqual(self.refund.status, Refund.PENDING)
+        self.assertEqual(self.refund.attempts, 1)
+        self.assertEqual(self.refund.error, "Timeout")
+
+        self.process()
+
+        self.assertEqual(self.refund.status, Refund.FAILED)
+        self.assertEqual(self.payment.status_payment, Payment.REFUND_PENDING)
+
+
+@mock.patch("airport.views.stripe.checkout.Session.retrieve")
+class PaymentSuccessTests(TestCase):
+    def setUp(self):
+        user = get_user_model().objects.create_user(
+            "user@test.com", "password"
+        )
+        self.flight = sample_flight()
+        self.order = sample_order(
+            user,
+            (self.flight, 1, 1),
+            (sample_flight(departure_time=hours(24)), 1, 1),
+            status_payment=Payment.PENDING,
+        )
+        self.payment = self.order.payments.get()
+
+    def pay(self, retrieve, amount_total, **session):
+        retrieve.return_value = mock.Mock(
+            **{
+                "amount_total": amount_total,
+                "payment_status": "paid",
+                **session,
+            }
+        )
+        response = self.client.get(
+            SUCCESS_URL, {"session_id": self.payment.session_id}
+        )
+        self.payment.refresh_from_db()
+
+        return response
+
+    def cancel_flight(self):
+        staff = APIClient()
+        staff.force_authenticate(
+            get_user_model().objects.create_user(
+                "admin@test.com", "adminpass", username="admin", is_staff=True
+            )
+        )
+        staff.post(cancel_url(self.flight.id))
+
+    def test_payment(self, retrieve):
+        self.pay(retrieve, 2000)
+
+        self.assertEqual(self.payment.status_payment, Payment.PAID)
+        self.assertFalse(Refund.objects.exists())
+
+    def test_old_amount_paid_after_a_cancellation(self, retrieve):
+        self.cancel_flight()
+
+        self.pay(retrieve, 2000)
+
+        self.assertEqual(self.payment.status_payment, Payment.REFUND_PENDING)
+        self.assertEqual(self.payment.amount, Decimal("20"))
+        self.assertEqual(self.payment.refunds.get().amount, Decimal("10"))
+
+    def test_paid_after_the_order_is_cancelled(self, retrieve):
+        self.order.cancelled_at = hours(0)
+        self.order.save()
+
+        self.pay(retrieve, 2000)
+
+        self.assertEqual(self.payment.refunds.get().amount, Decimal("20"))
+
+    def test_success_page_visited_twice(self, retrieve):
+        self.cancel_flight()
+        self.pay(retrieve, 2000)
+
+        self.pay(retrieve, 2000)
+
+        self.assertEqual(self.payment.status_payment, Payment.REFUND_PENDING)
+        self.assertEqual(self.payment.refunds.count(), 1)
+
+    def test_unpaid_session(self, retrieve):
+        response = self.pay(
+            retrieve, 2000, status="open", payment_status="unpaid"
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(self.payment.status_payment, Payment.PENDING)
+
+    def test_expired_session_of_a_cancelled_order(self, retrieve):
+        self.order.cancelled_at = hours(0)
+        self.order.save()
+
+        response = self.pay(
+            retrieve, 2000, status="expired", payment_status="unpaid"
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(self.payment.status_payment, Payment.PENDING)
+        self.assertFalse(Refund.objects.exists())
+
+    def test_missing_session(self, retrieve):
+        for params in ({}, {"session_id": "cs_unknown"}):
+            response = self.client.get(SUCCESS_URL, params)
+
+            self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+        retrieve.assert_not_called()
+
+    def test_session_unknown_to_stripe(self, retrieve):
+        retrieve.side_effect = stripe.error.InvalidRequestError(
+            "No such checkout.session", "id"
+        )
+
+        response = self.client.get(
+            SUCCESS_URL, {"session_id": self.payment.session_id}
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_cancel_page_of_missing_session(self, retrieve):
+        response = self.client.get(CANCEL_URL, {"session_id": "cs_unknown"})
+
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
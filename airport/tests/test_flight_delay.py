@@ -0,0 +1,233 @@
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from airport.models import Airport, Route, AirplaneType, Airplane, Flight, Crew
+
+START = datetime(2030, 7, 25, 8, tzinfo=dt_timezone.utc)
+
+
+def hours(count):
+    return START + timedelta(hours=count)
+
+
+def sample_route(**params):
+    airport1 = Airport.objects.create(name="Airport 1")
+    airport2 = Airport.objects.create(name="Airport 2")
+
+    defaults = {
+        "source": airport1,
+        "destination": airport2,
+        "distance": 1000
+    }
+    defaults.update(params)
+
+    return Route.objects.create(**defaults)
+
+
+def sample_airplane(**params):
+    airplane_type = AirplaneType.objects.create(name="Compact")
+
+    defaults = {
+        "name": "Boeing",
+        "rows": 30,
+        "seats_in_row": 6,
+        "airplane_type": airplane_type
+    }
+    defaults.update(params)
+
+    return Airplane.objects.create(**defaults)
+
+
+def sample_flight(crews=(), **params):
+    defaults = {
+        "route": sample_route(),
+        "airplane": sample_airplane(),
+        "departure_time": hours(0),
+        "arrival_time": hours(2),
+    }
+    defaults.update(params)
+
+    flight = Flight.objects.create(**defaults)
+    flight.crews.add(*crews)
+
+    return flight
+
+
+def sample_crew(**params):
+    defaults = {
+        "first_name": "John",
+        "last_name": "Smith",
+        "position": Crew.CAPTAIN,
+    }
+    defaults.update(params)
+
+    return Crew.objects.create(**defaults)
+
+
+def delay_url(flight_id):
+    return reverse("airport:flight-delay", args=[flight_id])
+
+
+@override_settings(FLIGHT_MIN_TURNAROUND_MINUTES=60)
+class FlightDelayApiTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            "admin@test.com",
+            "adminpass",
+            is_staff=True
+        )
+        self.client.force_authenticate(self.user)
+
+        airplane = sample_airplane()
+        captain = sample_crew()
+        attendant = sample_crew(position=Crew.FLIGHT_ATTENDANT)
+
+        self.flight = sample_flight(crews=[captain], airplane=airplane)
+        # Next flight of the airplane
+        self.next = sample_flight(
+            airplane=airplane, departure_time=hours(3), arrival_time=hours(5)
+        )
+        # Far enough to absorb the delay
+        self.evening = sample_flight(
+            airplane=airplane, departure_time=hours(10), arrival_time=hours(12)
+        )
+        # Next flight of the captain, with an attendant flying after it
+        self.connection = sample_flight(
+            crews=[captain, attendant],
+            departure_time=hours(4.5),
+            arrival_time=hours(6),
+        )
+        self.attendant_next = sample_flight(
+            crews=[attendant], departure_time=hours(7), arrival_time=hours(8)
+        )
+        self.unrelated = sample_flight(
+            departure_time=hours(3), arrival_time=hours(5)
+        )
+        self.captain = captain
+        self.attendant = attendant
+        self.airplane = airplane
+
+    def delay(self, flight, **payload):
+        return self.client.post(delay_url(flight.id), payload, format="json")
+
+    def times(self, flight):
+        flight.refresh_from_db()
+
+        return flight.departure_time, flight.arrival_time
+
+    def test_dry_run(self):
+        response = self.delay(self.flight, delay="02:00:00", dry_run=True)
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertFalse(response.data["applied"])
+        self.assertEqual(
+            response.data["departure_time"], "2030-07-25T10:00:00Z"
+        )
+        self.assertEqual(
+            [
+                (item["flight"], item["delay"], item["reasons"])
+                for item in response.data["affected"]
+            ],
+            [
+                (self.next.id, "02:00:00", [f"airplane {self.airplane.id}"]),
+                (self.connection.id, "00:30:00", [f"crew {self.captain.id}"]),
+                (
+                    self.attendant_next.id,
+                    "00:30:00",
+                    [f"crew {self.attendant.id}"],
+                ),
+            ],
+        )
+        self.assertEqual(self.times(self.flight), (hours(0), hours(2)))
+
+    def test_cascade(self):
+        response = self.delay(self.flight, delay="02:00:00", cascade=True)
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(response.data["cascaded"])
+        self.assertEqual(self.times(self.flight), (hours(2), hours(4)))
+        self.assertEqual(self.times(self.next), (hours(5), hours(7)))
+        self.assertEqual(self.times(self.connection), (hours(5), hours(6.5)))
+        self.assertEqual(
+            self.times(self.attendant_next), (hours(7.5), hours(8.5))
+        )
+        self.assertEqual(self.times(self.evening), (hours(10), hours(12)))
+        self.assertEqual(self.times(self.unrelated), (hours(3), hours(5)))
+
+    def test_delay_without_cascade(self):
+        response = self.delay(self.flight, delay="00:30:00")
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            [item["flight"] for item in response.data["affected"]],
+            [self.next.id],
+        )
+        self.assertEqual(self.times(self.flight), (hours(0.5), hours(2.5)))
+        self.assertEqual(self.times(self.next), (hours(3), hours(5)))
+
+    def test_overlapping_delay_without_cascade(self):
+        response = self.delay(self.flight, delay="02:00:00")
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn("airplane", response.data)
+        self.assertEqual(self.times(self.flight), (hours(0), hours(2)))
+
+    @override_settings(
+        CREW_DUTY_RULES={
+            "default": {
+                "max_duty_hours": 12,
+                "min_rest_hours": 10,
+                "max_monthly_hours": 100,
+            }
+        }
+    )
+    def test_delay_breaking_duty_rules(self):
+        crew = sample_crew(first_name="Jane")
+        sample_flight(
+            crews=[crew], departure_time=hours(24), arrival_time=hours(26)
+        )
+        late = sample_flight(
+            crews=[crew], departure_time=hours(33), arrival_time=hours(35)
+        )
+
+        response = self.delay(late, delay="02:00:00", dry_run=True)
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            [
+                (item["crew"], item["rule"], item["hours"])
+                for item in response.data["violations"]
+            ],
+            [(crew.id, "duty_period", 13.0)],
+        )
+
+        response = self.delay(late, delay="02:00:00", cascade=True)
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn("crews", response.data)
+        self.assertEqual(self.times(late), (hours(33), hours(35)))
+
+    def test_invalid_delay(self):
+        response = self.delay(self.flight, delay="-01:00:00")
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_delay_is_admin_only(self):
+        client = APIClient()
+        client.force_authenticate(
+            get_user_model().objects.create_user(
+                "user@test.com", "password", username="user"
+            )
+        )
+
+        response = client.post(
+            delay_url(self.flight.id), {"delay": "01:00:00"}, format="json"
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
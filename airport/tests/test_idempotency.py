@@ -0,0 +1,167 @@
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import TestCase
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from airport.models import (
+    Airport,
+    Route,
+    AirplaneType,
+    Airplane,
+    Flight,
+    Order,
+    Ticket,
+    Payment,
+    IdempotencyKey,
+)
+
+ORDER_URL = reverse("airport:order-list")
+PAYMENT_URL = reverse("airport:payment-list")
+
+
+def sample_flight(**params):
+    source = Airport.objects.create(name="Airport 1")
+    destination = Airport.objects.create(name="Airport 2")
+    route = Route.objects.create(
+        source=source, destination=destination, distance=1000
+    )
+    airplane_type = AirplaneType.objects.create(name="Compact")
+    airplane = Airplane.objects.create(
+        name="Boeing", rows=30, seats_in_row=6, airplane_type=airplane_type
+    )
+
+    defaults = {
+        "route": route,
+        "airplane": airplane,
+    }
+    defaults.update(params)
+
+    return Flight.objects.create(**defaults)
+
+
+class IdempotentOrderApiTests(TestCase):
+    def setUp(self) -> None:
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            "test@test.com",
+            "testpass"
+        )
+        self.client.force_authenticate(self.user)
+        self.flight = sample_flight()
+        self.payload = {
+            "tickets": [
+                {"flight": self.flight.id, "row": 5, "seat": 1, "price": 10}
+            ]
+        }
+
+    def post_order(self, key, payload=None):
+        return self.client.post(
+            ORDER_URL,
+            data=payload or self.payload,
+            format="json",
+            HTTP_IDEMPOTENCY_KEY=key,
+        )
+
+    def test_retry_replays_response_without_new_order(self):
+        first = self.post_order("order-key-1")
+        second = self.post_order("order-key-1")
+
+        self.assertEqual(first.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(second.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(second["Idempotent-Replayed"], "true")
+        self.assertEqual(second.data["id"], first.data["id"])
+        self.assertEqual(Order.objects.count(), 1)
+        self.assertEqual(Ticket.objects.count(), 1)
+
+    def test_key_reused_with_other_payload_is_rejected(self):
+        self.post_order("order-key-1")
+
+        other_payload = {
+            "tickets": [
+                {"flight": self.flight.id, "row": 6, "seat": 1, "price": 10}
+            ]
+        }
+        response = self.post_order("order-key-1", other_payload)
+
+        self.assertEqual(
+            response.status_code, status.HTTP_422_UNPROCESSABLE_ENTITY
+        )
+        self.assertEqual(Order.objects.count(), 1)
+
+    def test_failed_request_does_not_store_key(self):
+        invalid_payload = {"tickets": []}
+
+        response = self.post_order("order-key-1", invalid_payload)
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertFalse(IdempotencyKey.objects.exists())
+
+    def test_expired_key_runs_request_again(self):
+        self.post_order("order-key-1")
+        IdempotencyKey.objects.update(expires_at=timezone.now())
+
+        Ticket.objects.all().delete()
+        response = self.post_order("order-key-1")
+
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertFalse(response.has_header("Idempotent-Replayed"))
+        self.assertEqual(Order.objects.count(), 2)
+
+    def test_keys_are_scoped_per_user(self):
+        self.post_order("order-key-1")
+
+        other_user = get_user_model().objects.create_user(
+            "other@test.com",
+            "testpass",
+            username="other"
+        )
+        self.client.force_authenticate(other_user)
+        payload = {
+            "tickets": [
+                {"flight": self.flight.id, "row": 7, "seat": 1, "price": 10}
+            ]
+        }
+        response = self.post_order("order-key-1", payload)
+
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(Order.objects.count(), 2)
+
+
+class IdempotentPaymentApiTests(TestCase):
+    def setUp(self) -> None:
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            "test@test.com",
+            "testpass"
+        )
+        self.client.force_authenticate(self.user)
+
+    def test_retry_replays_payment(self):
+        order = Order.objects.create(user=self.user)
+
+        first = self.client.post(
+            PAYMENT_URL, {"order": order.id}, HTTP_IDEMPOTENCY_KEY="pay-1"
+        )
+        second = self.client.post(
+            PAYMENT_URL, {"order": order.id}, HTTP_IDEMPOTENCY_KEY="pay-1"
+        )
+
+        self.assertEqual(second.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(second.data["id"], first.data["id"])
+        self.assertEqual(Payment.objects.count(), 1)
+
+    def test_clear_command_deletes_expired_keys(self):
+        order = Order.objects.create(user=self.user)
+        self.client.post(
+            PAYMENT_URL, {"order": order.id}, HTTP_IDEMPOTENCY_KEY="pay-1"
+        )
+        IdempotencyKey.objects.update(expires_at=timezone.now())
+
+        call_command("clear_idempotency_keys", stdout=StringIO())
+
+        self.assertFalse(IdempotencyKey.objects.exists())
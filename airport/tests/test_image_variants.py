@@ -0,0 +1,281 @@
+import io
+import shutil
+import tempfile
+import threading
+from unittest import mock, skipUnless
+
+from PIL import Image
+from django.contrib.auth import get_user_model
+from django.core.files.base import ContentFile
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from airport.images import (
+    delete_unused_files,
+    image_files_lock,
+    process_airplane_image,
+    render_variants,
+    schedule_image_processing,
+    strip_metadata,
+)
+from airport.models import Airplane, AirplaneType, Airport, Route, Flight
+from airport.storage import ContentHashStorage
+
+AIRPLANE_URL = reverse("airport:airplane-list")
+FLIGHT_URL = reverse("airport:flight-list")
+
+MEDIA_ROOT = tempfile.mkdtemp()
+
+
+def sample_airplane(**params):
+    airplane_type = AirplaneType.objects.create(name="Compact")
+
+    defaults = {
+        "name": "Boeing",
+        "rows": 30,
+        "seats_in_row": 6,
+        "airplane_type": airplane_type
+    }
+    defaults.update(params)
+
+    return Airplane.objects.create(**defaults)
+
+
+def sample_flight(**params):
+    airport1 = Airport.objects.create(name="Airport 1")
+    airport2 = Airport.objects.create(name="Airport 2")
+    route = Route.objects.create(
+        source=airport1, destination=airport2, distance=1000
+    )
+
+    defaults = {
+        "route": route,
+        "airplane": sample_airplane(),
+    }
+    defaults.update(params)
+
+    return Flight.objects.create(**defaults)
+
+
+def image_upload_url(airplane_id):
+    return reverse("airport:airplane-upload-image", args=[airplane_id])
+
+
+def jpeg_with_exif(size=(800, 400), color="red"):
+    """JPEG with a camera model and an orientation rotating it by 90°"""
+    image = Image.new("RGB", size, color)
+    exif = Image.Exif()
+    exif[0x0110] = "Camera"
+    exif[0x0112] = 6
+
+    output = io.BytesIO()
+    image.save(output, format="JPEG", exif=exif)
+
+    return output.getvalue()
+
+
+class ImageFunctionsTests(TestCase):
+    def test_strip_metadata_removes_exif(self):
+        stripped = strip_metadata(jpeg_with_exif())
+
+        with Image.open(io.BytesIO(stripped)) as image:
+            self.assertEqual(image.format, "JPEG")
+            self.assertEqual(len(image.getexif()), 0)
+            # The orientation is applied before it is removed
+            self.assertEqual(image.size, (400, 800))
+
+    def test_render_variants_sizes_and_formats(self):
+        variants = render_variants(
+            strip_metadata(jpeg_with_exif()), [100, 300], ["webp", "jpeg"], 80
+        )
+
+        self.assertEqual(
+            set(variants),
+            {("webp", 100), ("jpeg", 100), ("webp", 300), ("jpeg", 300)},
+        )
+
+        with Image.open(io.BytesIO(variants[("webp", 100)])) as image:
+            self.assertEqual(image.format, "WEBP")
+            self.assertEqual(image.size, (100, 200))
+
+        with Image.open(io.BytesIO(variants[("jpeg", 300)])) as image:
+            self.assertEqual(image.format, "JPEG")
+            self.assertEqual(image.size, (300, 600))
+
+    def test_render_variants_never_upscales(self):
+        output = io.BytesIO()
+        Image.new("RGBA", (50, 20)).save(output, format="PNG")
+
+        variants = render_variants(
+            output.getvalue(), [40, 100, 200], ["jpeg"], 80
+        )
+
+        self.assertEqual(set(variants), {("jpeg", 40), ("jpeg", 50)})
+
+
+@override_settings(
+    MEDIA_ROOT=MEDIA_ROOT,
+    IMAGE_VARIANT_WIDTHS=[100, 300],
+    IMAGE_VARIANT_FORMATS=["webp", "jpeg"],
+    IMAGE_VARIANTS_INLINE=True,
+)
+class ImageVariantsApiTests(TestCase):
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(MEDIA_ROOT, ignore_errors=True)
+        super().tearDownClass()
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_superuser(
+            "admin@user.com", "password"
+        )
+        self.client.force_authenticate(self.user)
+        self.flight = sample_flight()
+        self.airplane = self.flight.airplane
+
+    def upload(self, content):
+        upload = ContentFile(content, name="airplane.jpg")
+
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(
+                image_upload_url(self.airplane.id),
+                {"image": upload},
+                format="multipart",
+            )
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.airplane.refresh_from_db()
+
+    def test_upload_makes_variants_and_strips_original(self):
+        self.upload(jpeg_with_exif())
+
+        self.assertEqual(
+            set(self.airplane.image_variants),
+            {"webp-100", "jpeg-100", "webp-300", "jpeg-300"},
+        )
+        storage = self.airplane.image.storage
+        for name in self.airplane.image_variants.values():
+            self.assertTrue(storage.exists(name))
+
+        with Image.open(self.airplane.image.path) as image:
+            self.assertEqual(len(image.getexif()), 0)
+
+    def test_replaced_files_are_deleted(self):
+        self.upload(jpeg_with_exif())
+        first_variants = self.airplane.image_variants
+        storage = self.airplane.image.storage
+
+        self.upload(jpeg_with_exif(color="blue"))
+
+        for name in first_variants.values():
+            self.assertFalse(storage.exists(name))
+        for name in self.airplane.image_variants.values():
+            self.assertTrue(storage.exists(name))
+
+    def test_variant_urls_on_airplane_and_flight_lists(self):
+        self.upload(jpeg_with_exif())
+
+        airplane = self.client.get(AIRPLANE_URL).data["results"][0]
+        detail = self.client.get(
+            reverse("airport:airplane-detail", args=[self.airplane.id])
+        ).data
+        flight = self.client.get(FLIGHT_URL).data["results"][0]
+
+        expected = {
+            name: f"http://testserver/media/{file_name}"
+            for name, file_name in self.airplane.image_variants.items()
+        }
+        self.assertEqual(airplane["image_variants"], expected)
+        self.assertEqual(detail["image_variants"], expected)
+        self.assertEqual(flight["airplane_image_variants"], expected)
+
+    def test_image_replaced_while_processing_is_kept(self):
+        self.upload(jpeg_with_exif())
+        storage = self.airplane.image.storage
+        newer = storage.save("uploads/airplanes/newer.jpg", ContentFile(b""))
+
+        def replace_image(*args):
+            Airplane.objects.filter(pk=self.airplane.pk).update(
+                image=newer, image_variants={}
+            )
+            return render_variants(*args)
+
+        with mock.patch(
+            "airport.images.render_variants", side_effect=replace_image
+        ), mock.patch.object(
+            storage, "delete", wraps=storage.delete
+        ) as delete:
+            self.assertIsNone(process_airplane_image(self.airplane.pk))
+
+        self.airplane.refresh_from_db()
+        self.assertEqual(self.airplane.image.name, newer)
+        self.assertEqual(self.airplane.image_variants, {})
+        # Only the files made for the replaced image are deleted
+        self.assertEqual(delete.call_count, 5)
+        self.assertNotIn(mock.call(newer), delete.call_args_list)
+
+    def test_background_processing_is_submitted_to_the_pool(self):
+        with override_settings(IMAGE_VARIANTS_INLINE=False), mock.patch(
+            "airport.images.image_workers.submit"
+        ) as submit:
+            with self.captureOnCommitCallbacks(execute=True):
+                schedule_image_processing(self.airplane)
+
+        submit.assert_called_once_with(
+            process_airplane_image, self.airplane.pk
+        )
+
+    def test_command_makes_missing_variants(self):
+        self.upload(jpeg_with_exif())
+        Airplane.objects.filter(pk=self.airplane.pk).update(image_variants={})
+
+        call_command("generate_image_variants", stdout=io.StringIO())
+
+        self.airplane.refresh_from_db()
+        self.assertEqual(len(self.airplane.image_variants), 4)
+
+
+@skipUnless(
+    connection.vendor == "postgresql",
+    "Concurrent transactions need PostgreSQL",
+)
+@override_settings(MEDIA_ROOT=MEDIA_ROOT)
+class ConcurrentImageCleanupTests(TransactionTestCase):
+    def test_cleanup_waits_for_a_save_sharing_the_file(self):
+        storage = ContentHashStorage()
+        name = storage.save("uploads/airplanes/a.jpg", ContentFile(b"photo"))
+        airplane = sample_airplane()
+
+        saved = threading.Event()
+        release = threading.Event()
+
+        def save_in_transaction():
+            try:
+                with image_files_lock():
+                    # Deduplicated, nothing is written
+                    shared = storage.save(
+                        "uploads/airplanes/b.jpg", ContentFile(b"photo")
+                    )
+                    Airplane.objects.filter(pk=airplane.pk).update(
+                        image=shared
+                    )
+                    saved.set()
+                    release.wait(5)
+            finally:
+                connection.close()
+
+        other = threading.Thread(target=save_in_transaction)
+        other.start()
+        saved.wait(5)
+        threading.Timer(0.3, release.set).start()
+
+        # Waits for the save, then sees the airplane referring to it
+        delete_unused_files(storage, [name])
+        other.join()
+
+        self.assertTrue(storage.exists(name))
@@ -0,0 +1,178 @@
+import io
+import shutil
+import tempfile
+from unittest import mock
+
+from PIL import Image
+from django.contrib.auth import get_user_model
+from django.core.files.base import ContentFile
+from django.http import Http404
+from django.test import RequestFactory, TestCase, override_settings
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from airport.media import serve_media
+from airport.models import Airplane, AirplaneType
+from airport.storage import ContentHashStorage
+
+MEDIA_ROOT = tempfile.mkdtemp()
+
+
+def sample_airplane(**params):
+    airplane_type = AirplaneType.objects.create(name="Compact")
+
+    defaults = {
+        "name": "Boeing",
+        "rows": 30,
+        "seats_in_row": 6,
+        "airplane_type": airplane_type
+    }
+    defaults.update(params)
+
+    return Airplane.objects.create(**defaults)
+
+
+def image_upload_url(airplane_id):
+    return reverse("airport:airplane-upload-image", args=[airplane_id])
+
+
+def jpeg(color="red"):
+    output = io.BytesIO()
+    Image.new("RGB", (10, 10), color).save(output, format="JPEG")
+
+    return output.getvalue()
+
+
+@override_settings(MEDIA_ROOT=MEDIA_ROOT)
+class ContentHashStorageTests(TestCase):
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(MEDIA_ROOT, ignore_errors=True)
+        super().tearDownClass()
+
+    def setUp(self):
+        self.storage = ContentHashStorage()
+
+    def test_same_content_is_stored_once(self):
+        first = self.storage.save("uploads/a.JPG", ContentFile(b"photo"))
+        second = self.storage.save("uploads/b.jpg", ContentFile(b"photo"))
+        other = self.storage.save("uploads/c.jpg", ContentFile(b"other"))
+
+        self.assertEqual(first, second)
+        self.assertNotEqual(first, other)
+        self.assertTrue(first.startswith("uploads/"))
+        self.assertTrue(first.endswith(".jpg"))
+        self.assertTrue(self.storage.is_content_hashed(first))
+        self.assertEqual(len(self.storage.listdir("uploads")[1]), 2)
+
+    def test_file_created_by_a_concurrent_save(self):
+        name = self.storage.save("race/a.jpg", ContentFile(b"race"))
+        exists = self.storage.exists
+
+        # Both saves found the name free, the other one created it first
+        with mock.patch.object(
+            self.storage, "exists", side_effect=[False, True, True]
+        ):
+            saved = self.storage.save("race/b.jpg", ContentFile(b"race"))
+
+        self.assertEqual(saved, name)
+        self.assertTrue(exists(name))
+        self.assertEqual(len(self.storage.listdir("race")[1]), 1)
+
+    def test_uploads_for_several_airplanes_share_the_file(self):
+        client = APIClient()
+        client.force_authenticate(
+            get_user_model().objects.create_superuser(
+                "admin@user.com", "password"
+            )
+        )
+        airplanes = [sample_airplane(), sample_airplane(name="Airbus")]
+
+        for airplane in airplanes:
+            response = client.post(
+                image_upload_url(airplane.id),
+                {"image": ContentFile(jpeg(), name="photo.jpg")},
+                format="multipart",
+            )
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        names = {
+            airplane.image.name
+            for airplane in Airplane.objects.filter(
+                id__in=[airplane.id for airplane in airplanes]
+            )
+        }
+        self.assertEqual(len(names), 1)
+
+
+@override_settings(
+    MEDIA_ROOT=MEDIA_ROOT,
+    MEDIA_CACHE_MAX_AGE=31536000,
+    MEDIA_OFFLOAD="",
+    MEDIA_ACCEL_REDIRECT_LOCATION="/protected-media/",
+)
+class ServeMediaTests(TestCase):
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(MEDIA_ROOT, ignore_errors=True)
+        super().tearDownClass()
+
+    def setUp(self):
+        self.factory = RequestFactory()
+        self.name = ContentHashStorage().save(
+            "uploads/airplanes/photo.jpg", ContentFile(jpeg())
+        )
+
+    def get(self, path, **headers):
+        return serve_media(self.factory.get(f"/media/{path}", **headers), path)
+
+    def test_hashed_file_is_immutable(self):
+        response = self.get(self.name)
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response["Content-Type"], "image/jpeg")
+        self.assertEqual(
+            response["Cache-Control"], "public, max-age=31536000, immutable"
+        )
+        self.assertEqual(b"".join(response.streaming_content), jpeg())
+        response.close()
+
+    def test_matching_etag_is_not_modified(self):
+        etag = self.get(self.name)["ETag"]
+
+        response = self.get(self.name, HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+    def test_other_files_are_cached_briefly(self):
+        path = "uploads/airplanes/boeing-1234.jpg"
+        with open(f"{MEDIA_ROOT}/{path}", "wb") as file:
+            file.write(jpeg())
+
+        response = self.get(path)
+
+        self.assertEqual(response["Cache-Control"], "public, max-age=3600")
+        self.assertNotIn("ETag", response)
+        response.close()
+
+    def test_missing_and_outside_files_are_not_found(self):
+        for path in ("uploads/missing.jpg", "../etc/passwd"):
+            with self.assertRaises(Http404):
+                self.get(path)
+
+    @override_settings(MEDIA_OFFLOAD="x-accel-redirect")
+    def test_accel_redirect(self):
+        response = self.get(self.name)
+
+        self.assertEqual(
+            response["X-Accel-Redirect"], f"/protected-media/{self.name}"
+        )
+        self.assertEqual(response.content, b"")
+
+    @override_settings(MEDIA_OFFLOAD="x-sendfile")
+    def test_sendfile(self):
+        response = self.get(self.name)
+
+        self.assertEqual(response["X-Sendfile"], f"{MEDIA_ROOT}/{self.name}")
+        self.assertEqual(response.content, b"")
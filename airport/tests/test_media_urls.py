@@ -0,0 +1,131 @@
+import io
+from unittest import mock
+
+from django.core.management import call_command
+from django.http import HttpRequest
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from rest_framework.test import APIClient
+
+from airport.models import Airplane, AirplaneType, Airport, Route, Flight
+
+AIRPLANE_URL = reverse("airport:airplane-list")
+FLIGHT_URL = reverse("airport:flight-list")
+
+IMAGE = "uploads/airplanes/boeing.jpg"
+VARIANTS = {"webp-160": "uploads/airplanes/variants/boeing 160.webp"}
+
+
+def sample_airplane(**params):
+    airplane_type = AirplaneType.objects.create(name="Compact")
+
+    defaults = {
+        "name": "Boeing",
+        "rows": 30,
+        "seats_in_row": 6,
+        "airplane_type": airplane_type,
+        "image": IMAGE,
+        "image_variants": VARIANTS,
+    }
+    defaults.update(params)
+
+    return Airplane.objects.create(**defaults)
+
+
+def sample_flight(**params):
+    airport1 = Airport.objects.create(name="Airport 1")
+    airport2 = Airport.objects.create(name="Airport 2")
+    route = Route.objects.create(
+        source=airport1, destination=airport2, distance=1000
+    )
+
+    defaults = {
+        "route": route,
+        "airplane": sample_airplane(),
+    }
+    defaults.update(params)
+
+    return Flight.objects.create(**defaults)
+
+
+class MediaUrlTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.flight = sample_flight()
+
+    def media_urls(self):
+        airplane = self.client.get(AIRPLANE_URL).data["results"][0]
+        detail = self.client.get(
+            reverse("airport:airplane-detail", args=[self.flight.airplane_id])
+        ).data
+        flight = self.client.get(FLIGHT_URL).data["results"][0]
+        async_detail = self.client.get(
+            reverse("airport:async-flight-detail", args=[self.flight.id])
+        ).json()
+
+        return [
+            (airplane["image"], airplane["image_variants"]),
+            (detail["image"], detail["image_variants"]),
+            (flight["airplane_image"], flight["airplane_image_variants"]),
+            (
+                async_detail["airplane"]["image"],
+                async_detail["airplane"]["image_variants"],
+            ),
+        ]
+
+    def test_absolute_urls_of_the_request(self):
+        expected = (
+            "http://testserver/media/uploads/airplanes/boeing.jpg",
+            {
+                "webp-160": (
+                    "http://testserver/media/uploads/airplanes/variants/"
+                    "boeing%20160.webp"
+                )
+            },
+        )
+
+        for urls in self.media_urls():
+            self.assertEqual(urls, expected)
+
+    @override_settings(MEDIA_BASE_URL="https://cdn.example.com/media")
+    def test_media_base_url(self):
+        expected = (
+            "https://cdn.example.com/media/uploads/airplanes/boeing.jpg",
+            {
+                "webp-160": (
+                    "https://cdn.example.com/media/uploads/airplanes/"
+                    "variants/boeing%20160.webp"
+                )
+            },
+        )
+
+        for urls in self.media_urls():
+            self.assertEqual(urls, expected)
+
+    def test_media_prefix_is_built_once_per_response(self):
+        for i in range(5):
+            sample_airplane(name=f"Airbus {i}")
+
+        with mock.patch.object(
+            HttpRequest,
+            "build_absolute_uri",
+            autospec=True,
+            side_effect=HttpRequest.build_absolute_uri,
+        ) as build_absolute_uri:
+            self.client.get(AIRPLANE_URL)
+
+        media_calls = [
+            call
+            for call in build_absolute_uri.call_args_list
+            if "media" in str(call.args[1:])
+        ]
+        self.assertEqual(len(media_calls), 1)
+
+    def test_benchmark_command(self):
+        stdout = io.StringIO()
+
+        call_command(
+            "benchmark_media_urls", rows=10, rounds=1, stdout=stdout
+        )
+
+        self.assertIn("speedup", stdout.getvalue())
@@ -0,0 +1,303 @@
+import threading
+from datetime import datetime, timedelta, timezone as dt_timezone
+from decimal import Decimal
+from unittest import skipUnless
+
+from django.contrib.auth import get_user_model
+from django.db import connection, transaction
+from django.test import TestCase, TransactionTestCase
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.exceptions import ValidationError
+from rest_framework.test import APIClient
+
+from airport.cancellation import SEAT_TAKEN, taken_seat_errors
+from airport.models import (
+    Airport,
+    Route,
+    AirplaneType,
+    Airplane,
+    Flight,
+    Order,
+    Ticket,
+    Payment,
+    Refund,
+)
+
+ORDER_URL = reverse("airport:order-list")
+FLIGHT_URL = reverse("airport:flight-list")
+
+START = datetime(2030, 7, 25, 8, tzinfo=dt_timezone.utc)
+
+
+def sample_route(**params):
+    airport1 = Airport.objects.create(name="Airport 1")
+    airport2 = Airport.objects.create(name="Airport 2")
+
+    defaults = {
+        "source": airport1,
+        "destination": airport2,
+        "distance": 1000
+    }
+    defaults.update(params)
+
+    return Route.objects.create(**defaults)
+
+
+def sample_airplane(**params):
+    airplane_type = AirplaneType.objects.create(name="Compact")
+
+    defaults = {
+        "name": "Boeing",
+        "rows": 30,
+        "seats_in_row": 6,
+        "airplane_type": airplane_type
+    }
+    defaults.update(params)
+
+    return Airplane.objects.create(**defaults)
+
+
+def sample_flight(**params):
+    defaults = {
+        "route": sample_route(),
+        "airplane": sample_airplane(),
+        "departure_time": START,
+        "arrival_time": START + timedelta(hours=2),
+    }
+    defaults.update(params)
+
+    return Flight.objects.create(**defaults)
+
+
+def sample_order(user, *seats, flight, paid=True):
+    order = Order.objects.create(user=user)
+
+    for row, seat in seats:
+        Ticket.objects.create(
+            flight=flight, order=order, row=row, seat=seat, price=10
+        )
+
+    Payment.objects.create(
+        order=order,
+        status_payment=Payment.PAID if paid else Payment.PENDING,
+        amount=order.total_cost(),
+    )
+
+    return order
+
+
+def cancel_url(order_id):
+    return reverse("airport:order-cancel", args=[order_id])
+
+
+def cancel_ticket_url(order_id, ticket_id):
+    return reverse("airport:order-cancel-ticket", args=[order_id, ticket_id])
+
+
+def book(client, flight, row, seat):
+    return client.post(
+        ORDER_URL,
+        {"tickets": [{"flight": flight.id, "row": row, "seat": seat}]},
+        format="json",
+    )
+
+
+class OrderCancellationApiTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            "test@test.com", "testpass"
+        )
+        self.client.force_authenticate(self.user)
+        self.flight = sample_flight()
+        self.order = sample_order(self.user, (1, 1), (1, 2), flight=self.flight)
+        self.first, self.second = self.order.tickets.order_by("seat")
+
+    def tickets_available(self):
+        response = self.client.get(FLIGHT_URL)
+
+        return response.data["results"][0]["tickets_available"]
+
+    def test_cancel_order(self):
+        response = self.client.post(cancel_url(self.order.id))
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["tickets_released"], 2)
+        self.assertEqual(response.data["refund"], "20.00")
+        self.assertIsNotNone(response.data["cancelled_at"])
+
+        self.order.refresh_from_db()
+        self.assertIsNotNone(self.order.cancelled_at)
+        self.assertFalse(self.order.tickets.filter(cancelled_at=None))
+        self.assertEqual(
+            self.order.payments.get().status_payment, Payment.REFUND_PENDING
+        )
+        self.assertEqual(self.tickets_available(), 180)
+
+    def test_cancel_ticket(self):
+        response = self.client.post(
+            cancel_ticket_url(self.order.id, self.first.id)
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["tickets_released"], 1)
+        self.assertEqual(response.data["refund"], "10.00")
+        self.assertIsNone(response.data["cancelled_at"])
+        self.assertEqual(self.tickets_available(), 179)
+
+        # Then the last one cancels the order
+        response = self.client.post(
+            cancel_ticket_url(self.order.id, self.second.id)
+        )
+
+        self.assertIsNotNone(response.data["cancelled_at"])
+        self.assertEqual(
+            sorted(Refund.objects.values_list("amount", flat=True)),
+            [Decimal("10"), Decimal("10")],
+        )
+
+    def test_cancel_unpaid_order(self):
+        order = sample_order(self.user, (2, 1), flight=self.flight, paid=False)
+
+        response = self.client.post(cancel_url(order.id))
+
+        self.assertIsNone(response.data["refund"])
+        payment = order.payments.get()
+        self.assertEqual(payment.status_payment, Payment.CANCELLED)
+        self.assertEqual(payment.amount, Decimal("0"))
+
+    def test_cancel_twice(self):
+        self.client.post(cancel_ticket_url(self.order.id, self.first.id))
+
+        response = self.client.post(
+            cancel_ticket_url(self.order.id, self.first.id)
+        )
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+        self.client.post(cancel_url(self.order.id))
+
+        response = self.client.post(cancel_url(self.order.id))
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_ticket_of_another_order(self):
+        other = sample_order(self.user, (2, 1), flight=self.flight)
+
+        response = self.client.post(
+            cancel_ticket_url(self.order.id, other.tickets.get().id)
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_order_of_another_user(self):
+        client = APIClient()
+        client.force_authenticate(
+            get_user_model().objects.create_user(
+                "user@test.com", "password", username="user"
+            )
+        )
+
+        response = client.post(cancel_url(self.order.id))
+
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_departed_flight(self):
+        flight = sample_flight(
+            departure_time=datetime(2020, 1, 1, tzinfo=dt_timezone.utc),
+            arrival_time=datetime(2020, 1, 1, 2, tzinfo=dt_timezone.utc),
+        )
+        order = sample_order(self.user, (1, 1), flight=flight)
+
+        response = self.client.post(cancel_url(order.id))
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIsNone(order.tickets.get().cancelled_at)
+
+    def test_released_seat_is_booked_again(self):
+        self.client.post(cancel_ticket_url(self.order.id, self.first.id))
+
+        response = book(self.client, self.flight, 1, 1)
+
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(
+            Ticket.objects.filter(flight=self.flight, row=1, seat=1).count(),
+            2,
+        )
+
+    def test_taken_seat(self):
+        response = book(self.client, self.flight, 1, 1)
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_seat_ordered_twice(self):
+        response = self.client.post(
+            ORDER_URL,
+            {
+                "tickets": [
+                    {"flight": self.flight.id, "row": 3, "seat": 1},
+                    {"flight": self.flight.id, "row": 3, "seat": 1},
+                ]
+            },
+            format="json",
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_seat_sold_meanwhile(self):
+        # Validated before the other order took the seat
+        with self.assertRaisesMessage(ValidationError, SEAT_TAKEN):
+            with taken_seat_errors():
+                Ticket.objects.create(
+                    flight=self.flight, order=self.order, row=1, seat=1
+                )
+
+
+@skipUnless(
+    connection.vendor == "postgresql",
+    "Concurrent transactions need PostgreSQL",
+)
+class ConcurrentBookingTests(TransactionTestCase):
+    def test_concurrent_booking_of_a_released_seat(self):
+        user = get_user_model().objects.create_user(
+            "test@test.com", "testpass"
+        )
+        flight = sample_flight()
+        order = sample_order(user, (1, 1), flight=flight)
+        client = APIClient()
+        client.force_authenticate(user)
+        client.post(cancel_url(order.id))
+
+        inserted = threading.Event()
+        release = threading.Event()
+
+        def book_in_transaction():
+            try:
+                with transaction.atomic():
+                    Ticket.objects.create(
+                        flight=flight,
+                        order=Order.objects.create(user=user),
+                        row=1,
+                        seat=1,
+                    )
+                    inserted.set()
+                    release.wait(5)
+            finally:
+                connection.close()
+
+        other = threading.Thread(target=book_in_transaction)
+        other.start()
+        inserted.wait(5)
+        # Waits on the seat of the uncommitted order, then loses it
+        threading.Timer(0.3, release.set).start()
+
+        response = book(client, flight, 1, 1)
+        other.join()
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(response.data["tickets"], [SEAT_TAKEN])
+        self.assertEqual(
+            Ticket.objects.filter(
+                flight=flight, row=1, seat=1, cancelled_at=None
+            ).count(),
+            1,
+        )
@@ -1,3 +1,7 @@
+import time
+from decimal import Decimal
+from unittest import mock
+
 from django.contrib.auth import get_user_model
 from django.test import TestCase
 from django.urls import reverse
@@ -102,3 +106,81 @@ class AuthenticatedPaymentApiTests(TestCase):
 
         for key in payload:
             self.assertEqual(payload[key], getattr(payment, key).id)
+
+    def test_create_payment_pins_order_total(self):
+        order = Order.objects.create(user=self.user)
+
+        response = self.client.post(PAYMENT_URL, {"order": order.id})
+
+        payment = Payment.objects.get(id=response.data["id"])
+
+        self.assertEqual(payment.amount, order.total_cost())
+
+
+def checkout_session_url(payment_id):
+    return reverse("airport:create-session", args=[payment_id])
+
+
+def stripe_session(session_id="cs_test_1", expires_in=3600):
+    return mock.Mock(
+        id=session_id,
+        url=f"https://checkout.stripe.com/c/pay/{session_id}",
+        expires_at=int(time.time()) + expires_in,
+    )
+
+
+@mock.patch("airport.views.stripe.checkout.Session.create")
+class CheckoutSessionTests(TestCase):
+    def setUp(self) -> None:
+        self.client = APIClient()
+        self.payment = sample_payment(amount=Decimal("150.00"))
+
+    def test_creates_session_with_stored_amount(self, session_create):
+        session_create.return_value = stripe_session()
+
+        response = self.client.get(checkout_session_url(self.payment.id))
+
+        self.payment.refresh_from_db()
+
+        self.assertEqual(response.status_code, status.HTTP_302_FOUND)
+        self.assertEqual(self.payment.session_id, "cs_test_1")
+        self.assertIsNotNone(self.payment.session_expires_at)
+        line_item = session_create.call_args.kwargs["line_items"][0]
+        self.assertEqual(line_item["price_data"]["unit_amount"], 15000)
+
+    def test_open_session_is_reused(self, session_create):
+        session_create.return_value = stripe_session()
+
+        self.client.get(checkout_session_url(self.payment.id))
+        response = self.client.get(checkout_session_url(self.payment.id))
+
+        self.assertEqual(session_create.call_count, 1)
+        self.assertEqual(
+            response["Location"],
+            "https://checkout.stripe.com/c/pay/cs_test_1"
+        )
+
+    def test_expired_session_is_recreated(self, session_create):
+        self.payment.session_id = "cs_test_old"
+        self.payment.session_url = "https://checkout.stripe.com/c/pay/old"
+        self.payment.session_expires_at = (
+            timezone.now() - timezone.timedelta(minutes=1)
+        )
+        self.payment.save()
+        session_create.return_value = stripe_session("cs_test_new")
+
+        self.client.get(checkout_session_url(self.payment.id))
+
+        self.payment.refresh_from_db()
+
+        self.assertEqual(session_create.call_count, 1)
+        self.assertEqual(self.payment.session_id, "cs_test_new")
+
+    def test_paid_payment_does_not_create_session(self, session_create):
+        self.payment.status_payment = Payment.PAID
+        self.payment.save()
+
+        response = self.client.get(checkout_session_url(self.payment.id))
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        session_create.assert_not_called()
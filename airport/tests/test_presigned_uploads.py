@@ -0,0 +1,241 @@
+import io
+import os
+import shutil
+import tempfile
+from unittest import mock
+from urllib.parse import urlsplit
+
+from PIL import Image
+from django.contrib.auth import get_user_model
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from airport.models import Airplane, AirplaneType
+from airport.uploads import SNIFF_SIZE, LocalUploadStore
+
+MEDIA_ROOT = tempfile.mkdtemp()
+UPLOAD_ROOT = tempfile.mkdtemp()
+
+
+def sample_airplane(**params):
+    airplane_type = AirplaneType.objects.create(name="Compact")
+
+    defaults = {
+        "name": "Boeing",
+        "rows": 30,
+        "seats_in_row": 6,
+        "airplane_type": airplane_type
+    }
+    defaults.update(params)
+
+    return Airplane.objects.create(**defaults)
+
+
+def upload_url_url(airplane_id):
+    return reverse("airport:airplane-image-upload-url", args=[airplane_id])
+
+
+def finalize_url(airplane_id):
+    return reverse("airport:airplane-finalize-image", args=[airplane_id])
+
+
+def jpeg(image_format="JPEG"):
+    output = io.BytesIO()
+    Image.new("RGB", (400, 200), "red").save(output, format=image_format)
+
+    return output.getvalue()
+
+
+@override_settings(
+    MEDIA_ROOT=MEDIA_ROOT,
+    IMAGE_UPLOAD_BACKEND="local",
+    IMAGE_UPLOAD_LOCAL_ROOT=UPLOAD_ROOT,
+    IMAGE_UPLOAD_URL_EXPIRES=900,
+    IMAGE_UPLOAD_MAX_SIZE=1024 * 1024,
+    IMAGE_VARIANT_WIDTHS=[100],
+    IMAGE_VARIANT_FORMATS=["webp"],
+    IMAGE_VARIANTS_INLINE=True,
+)
+class PresignedUploadTests(TestCase):
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(MEDIA_ROOT, ignore_errors=True)
+        shutil.rmtree(UPLOAD_ROOT, ignore_errors=True)
+        super().tearDownClass()
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_superuser(
+            "admin@user.com", "password"
+        )
+        self.client.force_authenticate(self.user)
+        self.airplane = sample_airplane()
+
+    def get_upload_url(self, airplane=None, content_type="image/jpeg"):
+        response = self.client.post(
+            upload_url_url((airplane or self.airplane).id),
+            {"content_type": content_type},
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        return response.data
+
+    def put(self, upload_url, content):
+        url = urlsplit(upload_url)
+
+        return APIClient().put(
+            f"{url.path}?{url.query}", content, content_type="image/jpeg"
+        )
+
+    def finalize(self, upload_key, airplane=None):
+        with self.captureOnCommitCallbacks(execute=True):
+            return self.client.post(
+                finalize_url((airplane or self.airplane).id),
+                {"upload_key": upload_key},
+            )
+
+    def test_upload_and_finalize(self):
+        upload = self.get_upload_url()
+
+        self.assertEqual(upload["method"], "PUT")
+        self.assertEqual(upload["headers"], {"Content-Type": "image/jpeg"})
+        self.assertEqual(upload["expires_in"], 900)
+
+        response = self.put(upload["upload_url"], jpeg())
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        response = self.finalize(upload["upload_key"])
+
+        self.assertEqual(response.status_code, status.HTTP_202_ACCEPTED)
+        self.airplane.refresh_from_db()
+        self.assertTrue(self.airplane.image)
+        self.assertEqual(set(self.airplane.image_variants), {"webp-100"})
+        # The uploaded object is removed once attached
+        self.assertFalse(
+            os.path.exists(
+                os.path.join(UPLOAD_ROOT, *upload["upload_key"].split("/"))
+            )
+        )
+
+    def test_upload_url_is_admin_only(self):
+        client = APIClient()
+        client.force_authenticate(
+            get_user_model().objects.create_user(
+                "user@user.com", "password", username="user"
+            )
+        )
+
+        response = client.post(
+            upload_url_url(self.airplane.id), {"content_type": "image/jpeg"}
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+    def test_unsupported_content_type(self):
+        response = self.client.post(
+            upload_url_url(self.airplane.id), {"content_type": "text/html"}
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_put_with_bad_signature(self):
+        upload = self.get_upload_url()
+
+        response = self.put(upload["upload_url"] + "x", jpeg())
+
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+    def test_put_with_expired_signature(self):
+        upload = self.get_upload_url()
+
+        with mock.patch("time.time", return_value=10**10):
+            response = self.put(upload["upload_url"], jpeg())
+
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+    @override_settings(IMAGE_UPLOAD_MAX_SIZE=100)
+    def test_put_too_large(self):
+        upload = self.get_upload_url()
+
+        response = self.put(upload["upload_url"], jpeg())
+
+        self.assertEqual(
+            response.status_code, status.HTTP_413_REQUEST_ENTITY_TOO_LARGE
+        )
+
+    def test_finalize_before_upload(self):
+        upload = self.get_upload_url()
+
+        response = self.finalize(upload["upload_key"])
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_finalize_key_of_another_airplane(self):
+        other = sample_airplane(name="Airbus")
+        upload = self.get_upload_url(other)
+        self.put(upload["upload_url"], jpeg())
+
+        response = self.finalize(upload["upload_key"])
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.airplane.refresh_from_db()
+        self.assertFalse(self.airplane.image)
+
+    def test_finalize_rejects_files_that_are_not_images(self):
+        upload = self.get_upload_url()
+        self.put(upload["upload_url"], b"<script>alert(1)</script>")
+
+        response = self.finalize(upload["upload_key"])
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.airplane.refresh_from_db()
+        self.assertFalse(self.airplane.image)
+
+    def test_finalize_reads_only_the_start_of_the_upload(self):
+        upload = self.get_upload_url()
+        self.put(upload["upload_url"], jpeg())
+
+        with mock.patch.object(
+            LocalUploadStore, "read_start", autospec=True,
+            side_effect=LocalUploadStore.read_start,
+        ) as read_start, mock.patch.object(
+            LocalUploadStore, "open", autospec=True
+        ) as store_open, self.captureOnCommitCallbacks() as callbacks:
+            response = self.client.post(
+                finalize_url(self.airplane.id),
+                {"upload_key": upload["upload_key"]},
+            )
+
+        self.assertEqual(response.status_code, status.HTTP_202_ACCEPTED)
+        self.assertEqual(read_start.call_args.args[2], SNIFF_SIZE)
+        store_open.assert_not_called()
+        # The whole object is read by the image worker
+        self.assertEqual(len(callbacks), 1)
+
+    def test_finalize_rejects_another_format_than_declared(self):
+        upload = self.get_upload_url()
+        self.put(upload["upload_url"], jpeg("PNG"))
+
+        response = self.finalize(upload["upload_key"])
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_worker_rejects_a_corrupt_image(self):
+        upload = self.get_upload_url(content_type="image/png")
+        # Valid headers, a broken checksum at the end of the image
+        data = bytearray(jpeg("PNG"))
+        data[-20] ^= 0xFF
+        self.put(upload["upload_url"], bytes(data))
+
+        response = self.finalize(upload["upload_key"])
+
+        self.assertEqual(response.status_code, status.HTTP_202_ACCEPTED)
+        self.airplane.refresh_from_db()
+        self.assertFalse(self.airplane.image)
+        self.assertFalse(
+            os.path.exists(
+                os.path.join(UPLOAD_ROOT, *upload["upload_key"].split("/"))
+            )
+        )
@@ -0,0 +1,94 @@
+import importlib
+
+from django.core.exceptions import ImproperlyConfigured
+from django.test import SimpleTestCase, override_settings
+
+from airport.checks import (
+    check_production_profile,
+    enforce_production_profile,
+)
+
+PRODUCTION_APPS = [
+    "django.contrib.admin",
+    "django.contrib.auth",
+    "django.contrib.contenttypes",
+    "rest_framework",
+    "airport",
+    "user",
+]
+PRODUCTION_MIDDLEWARE = [
+    "django.middleware.security.SecurityMiddleware",
+    "django.middleware.common.CommonMiddleware",
+]
+
+
+class ProductionSettingsTests(SimpleTestCase):
+    def setUp(self):
+        self.settings = importlib.import_module(
+            "airport_service.production_settings"
+        )
+
+    def test_debug_tooling_is_excluded(self):
+        self.assertFalse(self.settings.DEBUG)
+        self.assertNotIn("debug_toolbar", self.settings.INSTALLED_APPS)
+        self.assertFalse(
+            any(
+                "debug_toolbar" in middleware
+                for middleware in self.settings.MIDDLEWARE
+            )
+        )
+
+    def test_persistent_health_checked_connections(self):
+        database = self.settings.DATABASES["default"]
+
+        if "pool" in database.get("OPTIONS", {}):
+            self.assertEqual(database["CONN_MAX_AGE"], 0)
+        else:
+            self.assertGreater(database["CONN_MAX_AGE"], 0)
+        self.assertTrue(database["CONN_HEALTH_CHECKS"])
+
+    def test_cached_template_loader(self):
+        loaders = self.settings.TEMPLATES[0]["OPTIONS"]["loaders"]
+
+        self.assertEqual(loaders[0][0], "django.template.loaders.cached.Loader")
+
+
+class ProductionProfileCheckTests(SimpleTestCase):
+    @override_settings(PRODUCTION=False, DEBUG=True)
+    def test_development_profile_is_not_checked(self):
+        self.assertEqual(check_production_profile(None), [])
+
+    @override_settings(
+        PRODUCTION=True,
+        DEBUG=True,
+        INSTALLED_APPS=PRODUCTION_APPS + ["debug_toolbar"],
+        MIDDLEWARE=PRODUCTION_MIDDLEWARE + [
+            "debug_toolbar.middleware.DebugToolbarMiddleware"
+        ],
+    )
+    def test_debug_components_are_reported(self):
+        error_ids = {error.id for error in check_production_profile(None)}
+
+        self.assertTrue(
+            {"airport.E001", "airport.E002", "airport.E003"} <= error_ids
+        )
+
+    @override_settings(
+        PRODUCTION=True,
+        DEBUG=True,
+        INSTALLED_APPS=PRODUCTION_APPS,
+        MIDDLEWARE=PRODUCTION_MIDDLEWARE,
+    )
+    def test_boot_is_refused(self):
+        with self.assertRaises(ImproperlyConfigured):
+            enforce_production_profile()
+
+    @override_settings(
+        PRODUCTION=True,
+        DEBUG=False,
+        DEBUG_APPS=(),
+        INSTALLED_APPS=PRODUCTION_APPS,
+        MIDDLEWARE=PRODUCTION_MIDDLEWARE,
+    )
+    def test_clean_production_profile_boots(self):
+        enforce_production_profile()
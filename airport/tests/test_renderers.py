@@ -0,0 +1,107 @@
+import io
+from datetime import datetime, date, timedelta, timezone as dt_timezone
+from decimal import Decimal
+from unittest import mock
+
+from django.test import TestCase
+from django.utils.translation import gettext_lazy
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import JSONParser
+from rest_framework.renderers import JSONRenderer
+
+from airport.models import AirplaneType, Airplane
+from airport.parsers import ORJSONParser
+from airport.renderers import ORJSONRenderer
+
+SAMPLE_DATA = {
+    "price": Decimal("120.50"),
+    "total": Decimal("1E+2"),
+    "departure_time": "2023-07-25 14:00",
+    "created_at": datetime(
+        2023, 7, 25, 14, 0, 0, 123456, tzinfo=dt_timezone.utc
+    ),
+    "local_time": datetime(2023, 7, 25, 14, 0),
+    "day": date(2023, 7, 25),
+    "duration": timedelta(hours=2),
+    "status": gettext_lazy("Pending"),
+    "nested": [{"row": 1, "seat": 2}, {"row": 1, "seat": None}],
+    "text": "Kyiv\u2028Lviv\u2029",
+    1: "integer key",
+}
+
+
+class ORJSONRendererTests(TestCase):
+    def test_same_output_as_json_renderer(self):
+        self.assertEqual(
+            ORJSONRenderer().render(SAMPLE_DATA),
+            JSONRenderer().render(SAMPLE_DATA),
+        )
+
+    def test_none_rendered_empty(self):
+        self.assertEqual(ORJSONRenderer().render(None), b"")
+
+    def test_indent_is_honoured(self):
+        media_type = "application/json; indent=4"
+
+        self.assertEqual(
+            ORJSONRenderer().render(SAMPLE_DATA, media_type),
+            JSONRenderer().render(SAMPLE_DATA, media_type),
+        )
+
+    def test_image_rendered_as_url(self):
+        airplane_type = AirplaneType.objects.create(name="Boeing")
+        airplane = Airplane.objects.create(
+            name="Test airplane",
+            rows=10,
+            seats_in_row=6,
+            airplane_type=airplane_type,
+            image="upload/airplanes/test.jpg",
+        )
+
+        rendered = ORJSONRenderer().render(
+            {"image": airplane.image, "empty": Airplane().image}
+        )
+
+        self.assertEqual(
+            rendered,
+            b'{"image":"/media/upload/airplanes/test.jpg","empty":null}',
+        )
+
+    def test_falls_back_without_orjson(self):
+        with mock.patch("airport.renderers.orjson", None):
+            rendered = ORJSONRenderer().render(SAMPLE_DATA)
+
+        self.assertEqual(rendered, JSONRenderer().render(SAMPLE_DATA))
+
+
+class ORJSONParserTests(TestCase):
+    def parse(self, parser, content):
+        return parser.parse(io.BytesIO(content))
+
+    def test_same_result_as_json_parser(self):
+        content = '{"tickets": [{"row": 1, "seat": 2}], "name": "Київ"}'
+
+        self.assertEqual(
+            self.parse(ORJSONParser(), content.encode()),
+            self.parse(JSONParser(), content.encode()),
+        )
+
+    def test_invalid_json(self):
+        for content in (b'{"row": ', b'{"row": NaN}'):
+            with self.subTest(content=content):
+                with self.assertRaises(ParseError):
+                    self.parse(ORJSONParser(), content)
+
+    def test_other_encoding(self):
+        data = ORJSONParser().parse(
+            io.BytesIO('{"name": "Kyiv"}'.encode("utf-16")),
+            parser_context={"encoding": "utf-16"},
+        )
+
+        self.assertEqual(data, {"name": "Kyiv"})
+
+    def test_falls_back_without_orjson(self):
+        with mock.patch("airport.parsers.orjson", None):
+            data = self.parse(ORJSONParser(), b'{"row": 1}')
+
+        self.assertEqual(data, {"row": 1})
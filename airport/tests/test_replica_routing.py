@@ -0,0 +1,121 @@
+from unittest import skipUnless
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.auth.models import AnonymousUser
+from django.core.cache import cache
+from django.db import connections
+from django.http import HttpResponse
+from django.test import TestCase, RequestFactory, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from airport.models import Airport
+from airport_service.db_router import (
+    PrimaryReplicaRouter,
+    ReplicaRoutingMiddleware,
+    pin_to_primary,
+)
+
+AIRPORT_URL = reverse("airport:airport-list")
+
+
+@override_settings(DATABASE_REPLICAS=["replica_1", "replica_2"])
+class PrimaryReplicaRouterTests(TestCase):
+    def setUp(self):
+        self.router = PrimaryReplicaRouter()
+        self.factory = RequestFactory()
+        self.user = get_user_model().objects.create_user(
+            "test@test.com", "testpass"
+        )
+        cache.clear()
+
+    def route(self, request):
+        databases = []
+
+        def view(request):
+            databases.append(self.router.db_for_read(Airport))
+            return HttpResponse(status=201)
+
+        ReplicaRoutingMiddleware(view)(request)
+
+        return databases[0]
+
+    def test_reads_outside_requests_use_primary(self):
+        self.assertEqual(self.router.db_for_read(Airport), "default")
+
+    def test_safe_requests_read_from_replicas(self):
+        request = self.factory.get("/airports/")
+        request.user = AnonymousUser()
+
+        self.assertIn(self.route(request), settings.DATABASE_REPLICAS)
+
+    def test_unsafe_requests_read_from_primary(self):
+        request = self.factory.post("/orders/")
+        request.user = self.user
+
+        self.assertEqual(self.route(request), "default")
+
+    def test_user_is_pinned_to_primary_after_write(self):
+        request = self.factory.post("/orders/")
+        request.user = self.user
+        self.route(request)
+
+        request = self.factory.get("/orders/")
+        request.user = self.user
+
+        self.assertEqual(self.route(request), "default")
+
+    def test_pin_is_per_user(self):
+        pin_to_primary(self.user)
+        other_user = get_user_model().objects.create_user(
+            "other@test.com", "testpass", username="other"
+        )
+
+        request = self.factory.get("/orders/")
+        request.user = other_user
+
+        self.assertIn(self.route(request), settings.DATABASE_REPLICAS)
+
+    def test_writes_go_to_primary(self):
+        self.assertEqual(self.router.db_for_write(Airport), "default")
+
+    def test_replicas_are_not_migrated(self):
+        self.assertFalse(self.router.allow_migrate("replica_1", "airport"))
+        self.assertTrue(self.router.allow_migrate("default", "airport"))
+
+
+@skipUnless(
+    settings.DATABASE_REPLICAS,
+    "Set POSTGRES_REPLICA_HOSTS to test with a replica database",
+)
+class ReplicaRoutingApiTests(TestCase):
+    databases = {"default", *settings.DATABASE_REPLICAS}
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_superuser(
+            "admin@test.com", "testpass"
+        )
+        self.client.force_authenticate(self.user)
+        self.replica = connections[settings.DATABASE_REPLICAS[0]]
+        cache.clear()
+
+    def test_list_is_read_from_replica_until_a_write(self):
+        with CaptureQueriesContext(self.replica) as replica_queries:
+            response = self.client.get(AIRPORT_URL)
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(replica_queries.captured_queries)
+
+        self.client.post(
+            AIRPORT_URL, {"name": "Heathrow", "closest_big_city": "London"}
+        )
+
+        with CaptureQueriesContext(self.replica) as replica_queries:
+            response = self.client.get(AIRPORT_URL)
+
+        self.assertEqual(response.data["count"], 1)
+        self.assertFalse(replica_queries.captured_queries)
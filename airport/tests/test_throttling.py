@@ -0,0 +1,121 @@
+from types import SimpleNamespace
+
+from django.contrib.auth import get_user_model
+from django.core.cache import caches
+from django.test import TestCase, RequestFactory, override_settings
+
+from airport.throttling import (
+    AnonSlidingWindowThrottle,
+    UserSlidingWindowThrottle,
+)
+
+LOCAL_CACHE = {
+    "default": {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+        "LOCATION": "throttling-tests",
+    }
+}
+
+
+class FakeTimer:
+    def __init__(self, now=1_000_000.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+def make_throttle(throttle_class, rate, timer):
+    class TestThrottle(throttle_class):
+        pass
+
+    TestThrottle.rate = rate
+    TestThrottle.timer = timer
+    TestThrottle.cache = caches["default"]
+
+    return TestThrottle()
+
+
+@override_settings(CACHES=LOCAL_CACHE, THROTTLE_BURSTS={})
+class SlidingWindowThrottleTests(TestCase):
+    def setUp(self):
+        caches["default"].clear()
+        self.factory = RequestFactory()
+        self.timer = FakeTimer(now=600.0)
+        self.user = get_user_model().objects.create_user(
+            "test@test.com", "testpass"
+        )
+        self.view = SimpleNamespace(action="list")
+
+    def request(self):
+        request = self.factory.get("/flights/")
+        request.user = self.user
+
+        return request
+
+    def allow(self, view=None):
+        throttle = make_throttle(
+            UserSlidingWindowThrottle, "3/min", self.timer
+        )
+        allowed = throttle.allow_request(self.request(), view or self.view)
+
+        return allowed, throttle
+
+    def test_requests_over_rate_are_throttled(self):
+        results = [self.allow()[0] for _ in range(4)]
+
+        self.assertEqual(results, [True, True, True, False])
+
+    def test_throttled_requests_do_not_count(self):
+        for _ in range(5):
+            self.allow()
+
+        self.timer.now += 60
+
+        # The previous window still fully counts 3 requests
+        self.assertFalse(self.allow()[0])
+
+    def test_previous_window_slides_out(self):
+        for _ in range(3):
+            self.allow()
+
+        self.timer.now += 60 + 40
+
+        # 3 * (1 - 40/60) = 1 request left from the previous window
+        self.assertEqual(
+            [self.allow()[0] for _ in range(3)], [True, True, False]
+        )
+
+    def test_cost_weights(self):
+        view = SimpleNamespace(action="create", throttle_costs={"create": 2})
+
+        self.assertTrue(self.allow(view)[0])
+        self.assertFalse(self.allow(view)[0])
+        self.assertTrue(self.allow()[0])
+
+    @override_settings(THROTTLE_BURSTS={"user": 2})
+    def test_burst_allowance(self):
+        results = [self.allow()[0] for _ in range(6)]
+
+        self.assertEqual(results, [True] * 5 + [False])
+
+    def test_wait_time(self):
+        for _ in range(3):
+            self.allow()
+
+        allowed, throttle = self.allow()
+
+        self.assertFalse(allowed)
+        self.assertEqual(throttle.wait(), 60)
+
+    def test_counters_are_per_client(self):
+        for _ in range(3):
+            self.allow()
+
+        throttle = make_throttle(
+            AnonSlidingWindowThrottle, "3/min", self.timer
+        )
+        request = self.factory.get("/flights/", REMOTE_ADDR="10.0.0.1")
+        request.user = SimpleNamespace(is_authenticated=False)
+
+        self.assertTrue(throttle.allow_request(request, self.view))
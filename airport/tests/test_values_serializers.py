@@ -0,0 +1,242 @@
+from datetime import datetime, timezone as dt_timezone
+from unittest import mock
+
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from rest_framework.test import APIClient, APIRequestFactory
+
+from airport.dynamic_fields import parse_field_tree
+from airport.models import (
+    Airport,
+    Route,
+    AirplaneType,
+    Airplane,
+    Flight,
+    Order,
+    Ticket,
+)
+from airport.serializers import (
+    FlightListSerializer,
+    FlightListValuesSerializer,
+    RouteListSerializer,
+    RouteListValuesSerializer,
+)
+from airport.views import (
+    FlightViewSet,
+    RouteViewSet,
+    annotate_tickets_available,
+)
+from user.models import User
+
+FLIGHT_URL = reverse("airport:flight-list")
+ROUTE_URL = reverse("airport:route-list")
+
+FLIGHT_SNAPSHOT = {
+    "id": None,
+    "airplane_name": "Boeing",
+    "airplane_type": "Compact",
+    "airplane_image": "http://testserver/media/upload/airplanes/boeing.jpg",
+    "airplane_image_variants": {
+        "webp-160": (
+            "http://testserver/media/upload/airplanes/variants/"
+            "boeing-160w.webp"
+        ),
+    },
+    "route": None,
+    "departure_time": "2023-07-25 17:00",
+    "arrival_time": "2023-07-25 19:30",
+    "airplane_capacity": 180,
+    "tickets_available": 178,
+}
+
+
+def sample_route(**params):
+    source = Airport.objects.create(
+        name="Boryspil", closest_big_city="Kyiv"
+    )
+    destination = Airport.objects.create(
+        name="Heathrow", closest_big_city="London"
+    )
+
+    defaults = {
+        "source": source,
+        "destination": destination,
+        "distance": 2170,
+    }
+    defaults.update(params)
+
+    return Route.objects.create(**defaults)
+
+
+def sample_airplane(**params):
+    airplane_type = AirplaneType.objects.create(name="Compact")
+
+    defaults = {
+        "name": "Boeing",
+        "rows": 30,
+        "seats_in_row": 6,
+        "airplane_type": airplane_type,
+    }
+    defaults.update(params)
+
+    return Airplane.objects.create(**defaults)
+
+
+def sample_flight(**params):
+    defaults = {
+        "route": sample_route(),
+        "airplane": sample_airplane(),
+        "departure_time": datetime(2023, 7, 25, 14, tzinfo=dt_timezone.utc),
+        "arrival_time": datetime(
+            2023, 7, 25, 16, 30, tzinfo=dt_timezone.utc
+        ),
+    }
+    defaults.update(params)
+
+    return Flight.objects.create(**defaults)
+
+
+@override_settings(TIME_ZONE="Europe/Kyiv")
+class ValuesSerializerSnapshotTests(TestCase):
+    def setUp(self):
+        self.request = APIRequestFactory().get("/")
+        self.context = {"request": self.request}
+        self.flight = sample_flight(
+            airplane=sample_airplane(
+                image="upload/airplanes/boeing.jpg",
+                image_variants={
+                    "webp-160": "upload/airplanes/variants/boeing-160w.webp"
+                },
+            )
+        )
+        sample_flight()
+        user = User.objects.create_user(email="test@test.com")
+        order = Order.objects.create(user=user)
+        for seat in (1, 2):
+            Ticket.objects.create(
+                row=1, seat=seat, flight=self.flight, order=order
+            )
+
+    @staticmethod
+    def flights():
+        return annotate_tickets_available(FlightViewSet.queryset)
+
+    def serialize(self, serializer_class, queryset):
+        return [
+            dict(item)
+            for item in serializer_class(
+                queryset, many=True, context=self.context
+            ).data
+        ]
+
+    def test_flight_list_snapshot(self):
+        rows = FlightListValuesSerializer().values_queryset(
+            self.flights().filter(id=self.flight.id)
+        )
+
+        self.assertEqual(
+            self.serialize(FlightListValuesSerializer, rows),
+            [
+                {
+                    **FLIGHT_SNAPSHOT,
+                    "id": self.flight.id,
+                    "route": (
+                        f"{self.flight.route_id}: Boryspil - Heathrow"
+                    ),
+                }
+            ],
+        )
+
+    def test_flight_list_matches_model_serializer(self):
+        queryset = self.flights().order_by("id")
+
+        self.assertEqual(
+            self.serialize(
+                FlightListValuesSerializer,
+                FlightListValuesSerializer().values_queryset(queryset),
+            ),
+            self.serialize(FlightListSerializer, queryset),
+        )
+
+    def test_route_list_matches_model_serializer(self):
+        queryset = RouteViewSet.queryset.order_by("id")
+
+        self.assertEqual(
+            self.serialize(
+                RouteListValuesSerializer,
+                RouteListValuesSerializer().values_queryset(queryset),
+            ),
+            self.serialize(RouteListSerializer, queryset),
+        )
+
+    def test_route_list_nested_fields_match_model_serializer(self):
+        queryset = RouteViewSet.queryset.order_by("id")
+        self.context["fields"] = parse_field_tree("id,source.name")
+
+        routes = self.serialize(
+            RouteListValuesSerializer,
+            RouteListValuesSerializer().values_queryset(queryset),
+        )
+
+        self.assertEqual(routes, self.serialize(RouteListSerializer, queryset))
+        self.assertEqual(routes[0]["source"], {"name": "Boryspil"})
+
+    def test_values_serializer_builds_no_models(self):
+        rows = FlightListValuesSerializer().values_queryset(self.flights())
+
+        with self.assertNumQueries(1):
+            self.serialize(FlightListValuesSerializer, rows)
+
+
+class ValuesListViewTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        sample_flight(
+            airplane=sample_airplane(
+                image="upload/airplanes/boeing.jpg",
+                image_variants={
+                    "webp-160": "upload/airplanes/variants/boeing-160w.webp"
+                },
+            )
+        )
+        sample_flight()
+
+    def test_flight_list_reads_values(self):
+        with self.assertNumQueries(2):
+            response = self.client.get(FLIGHT_URL)
+
+        queryset = annotate_tickets_available(FlightViewSet.queryset)
+        serializer = FlightListSerializer(
+            queryset,
+            many=True,
+            context={"request": response.wsgi_request},
+        )
+
+        self.assertEqual(
+            sorted(response.data["results"], key=lambda item: item["id"]),
+            sorted(serializer.data, key=lambda item: item["id"]),
+        )
+
+    def test_filtered_route_list(self):
+        response = self.client.get(ROUTE_URL, {"source": "bory"})
+
+        self.assertEqual(response.data["count"], 2)
+        self.assertEqual(
+            response.data["results"][0]["source"]["name"], "Boryspil"
+        )
+
+    def test_route_list_nested_fields(self):
+        response = self.client.get(ROUTE_URL, {"fields": "source.name"})
+
+        self.assertEqual(
+            response.data["results"][0], {"source": {"name": "Boryspil"}}
+        )
+
+    def test_values_can_be_disabled_per_viewset(self):
+        with mock.patch.object(
+            FlightViewSet, "values_serializer_class", None
+        ):
+            response = self.client.get(FLIGHT_URL)
+
+        self.assertEqual(response.data["count"], 2)
+        self.assertIn("tickets_available", response.data["results"][0])
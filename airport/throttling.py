@@ -0,0 +1,92 @@
+import math
+
+from django.conf import settings
+from rest_framework.throttling import AnonRateThrottle, UserRateThrottle
+
+
+class SlidingWindowThrottleMixin:
+    """
+    Sliding window rate limit kept in the shared cache.
+
+    Requests are counted per fixed window of the rate period, the count
+    of the previous window is weighted by how much of it still overlaps
+    the sliding window. That needs two counters per client whatever the
+    number of requests, incremented atomically by the cache backend.
+
+    A request costs `throttle_costs[view.action]` of the view (1 by
+    default) and `THROTTLE_BURSTS[scope]` extra units are tolerated on
+    top of the rate.
+    """
+
+    def get_cost(self, request, view):
+        costs = getattr(view, "throttle_costs", {})
+
+        return costs.get(getattr(view, "action", None), 1)
+
+    def get_burst(self):
+        return getattr(settings, "THROTTLE_BURSTS", {}).get(self.scope, 0)
+
+    def _increment(self, key, cost):
+        # The counter outlives its window so it can be the previous one
+        self.cache.add(key, 0, timeout=self.duration * 2)
+
+        try:
+            return self.cache.incr(key, cost)
+        except ValueError:
+            # Expired between add() and incr()
+            self.cache.set(key, cost, timeout=self.duration * 2)
+            return cost
+
+    def allow_request(self, request, view):
+        if self.rate is None:
+            return True
+
+        self.key = self.get_cache_key(request, view)
+        if self.key is None:
+            return True
+
+        self.now = self.timer()
+        cost = self.get_cost(request, view)
+        limit = self.num_requests + self.get_burst()
+
+        window = int(self.now // self.duration)
+        self.elapsed = self.now - window * self.duration
+        current_key = f"{self.key}:{window}"
+        previous_key = f"{self.key}:{window - 1}"
+
+        self.current = self._increment(current_key, cost)
+        self.previous = self.cache.get(previous_key, 0)
+        self.limit = limit
+        self.cost = cost
+
+        if self.weighted_count() > limit:
+            self.cache.decr(current_key, cost)
+            self.current -= cost
+            return self.throttle_failure()
+
+        return True
+
+    def weighted_count(self, elapsed=None):
+        elapsed = self.elapsed if elapsed is None else elapsed
+        overlap = 1 - elapsed / self.duration
+
+        return self.previous * overlap + self.current
+
+    def wait(self):
+        """Seconds until the request would fit in the sliding window"""
+        available = self.limit - self.current - self.cost
+
+        if available >= 0 and self.previous:
+            # Wait for enough of the previous window to slide out
+            needed = self.duration * (1 - available / self.previous)
+            return max(0.0, math.ceil(needed - self.elapsed))
+
+        return max(0.0, math.ceil(self.duration - self.elapsed))
+
+
+class AnonSlidingWindowThrottle(SlidingWindowThrottleMixin, AnonRateThrottle):
+    pass
+
+
+class UserSlidingWindowThrottle(SlidingWindowThrottleMixin, UserRateThrottle):
+    pass
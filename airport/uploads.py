@@ -0,0 +1,318 @@
+"""
+Airplane images uploaded straight to the object store.
+
+`POST /airplanes/{id}/image-upload-url/` returns a presigned URL the
+client PUTs the image to, so the body never goes through an API worker.
+`POST /airplanes/{id}/finalize-image/` then checks the size and content
+type of the uploaded object and sniffs the format of its first bytes,
+without reading the rest of it. The image worker fully verifies it,
+attaches it to the airplane and makes its variants once the request is
+committed, the response is a 202 meanwhile.
+
+IMAGE_UPLOAD_BACKEND picks the store:
+- "s3": an S3-compatible bucket (IMAGE_UPLOAD_S3_BUCKET, optionally
+  IMAGE_UPLOAD_S3_ENDPOINT_URL for MinIO and the like), needs boto3;
+- "local": a stand-in for development and tests, the presigned URL is a
+  signed URL of `local_upload` writing to IMAGE_UPLOAD_LOCAL_ROOT.
+"""
+import io
+import logging
+import os
+import uuid
+from functools import partial
+
+from PIL import Image
+from django.conf import settings
+from django.core import signing
+from django.core.files.base import ContentFile
+from django.http import HttpResponse, HttpResponseNotAllowed, JsonResponse
+from django.urls import reverse
+from django.views.decorators.csrf import csrf_exempt
+from rest_framework.exceptions import ValidationError
+
+from airport.images import (
+    image_files_lock,
+    process_airplane_image,
+    schedule_image_processing,
+)
+from airport.models import Airplane
+
+try:
+    import boto3
+    from botocore.exceptions import ClientError
+except ImportError:
+    boto3 = ClientError = None
+
+logger = logging.getLogger(__name__)
+
+IMAGE_FORMATS = ("JPEG", "PNG", "WEBP", "GIF")
+
+# Enough for the headers of the formats, before a large EXIF block too
+SNIFF_SIZE = 64 * 1024
+
+CONTENT_TYPES = {
+    "image/jpeg": ".jpg",
+    "image/png": ".png",
+    "image/webp": ".webp",
+    "image/gif": ".gif",
+}
+
+FORMAT_CONTENT_TYPES = {
+    "JPEG": "image/jpeg",
+    "PNG": "image/png",
+    "WEBP": "image/webp",
+    "GIF": "image/gif",
+}
+
+SIGNING_SALT = "airport.uploads"
+
+
+def new_upload_key(airplane_id, content_type):
+    return f"airplanes/{airplane_id}/{uuid.uuid4().hex}" + (
+        CONTENT_TYPES[content_type]
+    )
+
+
+def check_upload_key(airplane_id, key):
+    """Reject keys issued for another airplane or outside the uploads"""
+    prefix = f"airplanes/{airplane_id}/"
+    name = key[len(prefix):]
+
+    if not key.startswith(prefix) or not name or "/" in name or (
+        name.startswith(".")
+    ):
+        raise ValidationError({"upload_key": "Invalid upload key."})
+
+
+class LocalUploadStore:
+    """Stand-in of an S3 bucket in a local directory"""
+
+    def path(self, key):
+        return os.path.join(settings.IMAGE_UPLOAD_LOCAL_ROOT, *key.split("/"))
+
+    def presigned_put_url(self, request, key, content_type):
+        signed = signing.TimestampSigner(salt=SIGNING_SALT).sign(key)
+        _, timestamp, signature = signed.rsplit(":", 2)
+        url = reverse("airport:local-upload", args=[key])
+
+        return request.build_absolute_uri(
+            f"{url}?timestamp={timestamp}&signature={signature}"
+        )
+
+    def head(self, key):
+        """Size and content type of the object, None when missing"""
+        try:
+            size = os.path.getsize(self.path(key))
+        except FileNotFoundError:
+            return None
+
+        # The key was issued with the extension of the content type
+        _, extension = os.path.splitext(key)
+        content_types = {value: name for name, value in CONTENT_TYPES.items()}
+
+        return size, content_types.get(extension)
+
+    def read_start(self, key, size):
+        with open(self.path(key), "rb") as file:
+            return file.read(size)
+
+    def open(self, key):
+        return open(self.path(key), "rb")
+
+    def delete(self, key):
+        try:
+            os.remove(self.path(key))
+        except FileNotFoundError:
+            pass
+
+
+class S3UploadStore:
+    def __init__(self):
+        if boto3 is None:
+            raise ImportError("The s3 image upload backend needs boto3")
+
+        self.bucket = settings.IMAGE_UPLOAD_S3_BUCKET
+        self.client = boto3.client(
+            "s3", endpoint_url=settings.IMAGE_UPLOAD_S3_ENDPOINT_URL or None
+        )
+
+    def presigned_put_url(self, request, key, content_type):
+        return self.client.generate_presigned_url(
+            "put_object",
+            Params={
+                "Bucket": self.bucket,
+                "Key": key,
+                "ContentType": content_type,
+            },
+            ExpiresIn=settings.IMAGE_UPLOAD_URL_EXPIRES,
+        )
+
+    def head(self, key):
+        try:
+            head = self.client.head_object(Bucket=self.bucket, Key=key)
+        except ClientError:
+            return None
+
+        return head["ContentLength"], head.get("ContentType")
+
+    def read_start(self, key, size):
+        response = self.client.get_object(
+            Bucket=self.bucket, Key=key, Range=f"bytes=0-{size - 1}"
+        )
+
+        return response["Body"].read()
+
+    def open(self, key):
+        response = self.client.get_object(Bucket=self.bucket, Key=key)
+
+        return response["Body"]
+
+    def delete(self, key):
+        self.client.delete_object(Bucket=self.bucket, Key=key)
+
+
+UPLOAD_STORES = {
+    "local": LocalUploadStore,
+    "s3": S3UploadStore,
+}
+
+
+def get_upload_store():
+    return UPLOAD_STORES[settings.IMAGE_UPLOAD_BACKEND]()
+
+
+def read_image(data):
+    try:
+        with Image.open(io.BytesIO(data)) as image:
+            image.verify()
+            image_format = image.format
+    except Exception:
+        image_format = None
+
+    if image_format not in IMAGE_FORMATS:
+        raise ValidationError(
+            {"upload_key": "The uploaded file is not a valid image."}
+        )
+
+
+def sniff_format(data):
+    """Format named by the headers of an image, from its first bytes"""
+    try:
+        with Image.open(io.BytesIO(data)) as image:
+            return image.format
+    except Exception:
+        return None
+
+
+def attach_uploaded_image(airplane, key):
+    """
+    Check the uploaded object from its metadata and first bytes, and hand
+    it to the image worker to verify and attach
+    """
+    check_upload_key(airplane.pk, key)
+    store = get_upload_store()
+    head = store.head(key)
+
+    if head is None:
+        raise ValidationError(
+            {"upload_key": "Nothing was uploaded with this key."}
+        )
+
+    size, content_type = head
+
+    if size > settings.IMAGE_UPLOAD_MAX_SIZE:
+        store.delete(key)
+        raise ValidationError({"upload_key": "The image is too large."})
+
+    image_format = sniff_format(store.read_start(key, SNIFF_SIZE))
+
+    if (
+        image_format not in IMAGE_FORMATS
+        or FORMAT_CONTENT_TYPES[image_format] != content_type
+    ):
+        store.delete(key)
+        raise ValidationError(
+            {"upload_key": "The uploaded file is not a valid image."}
+        )
+
+    schedule_image_processing(
+        airplane, job=partial(import_uploaded_image, key=key)
+    )
+
+    return airplane
+
+
+def import_uploaded_image(airplane_id, key):
+    """
+    Image worker job: verify the whole uploaded object, move it to the
+    airplane image and make its variants
+    """
+    store = get_upload_store()
+    body = store.open(key)
+    try:
+        # Replaced with a larger one after the check of the request
+        data = body.read(settings.IMAGE_UPLOAD_MAX_SIZE + 1)
+    finally:
+        body.close()
+
+    try:
+        if len(data) > settings.IMAGE_UPLOAD_MAX_SIZE:
+            raise ValidationError({"upload_key": "The image is too large."})
+        read_image(data)
+    except ValidationError:
+        logger.warning("Upload %s of airplane %s rejected", key, airplane_id)
+        store.delete(key)
+        return None
+
+    with image_files_lock():
+        airplane = Airplane.objects.filter(pk=airplane_id).first()
+        if airplane is not None:
+            airplane.image.save(
+                os.path.basename(key), ContentFile(data), save=False
+            )
+            airplane.save(update_fields=["image"])
+    store.delete(key)
+
+    return process_airplane_image(airplane_id)
+
+
+@csrf_exempt
+def local_upload(request, key):
+    """PUT target of the presigned URLs of the local store"""
+    if request.method != "PUT":
+        return HttpResponseNotAllowed(["PUT"])
+
+    signer = signing.TimestampSigner(salt=SIGNING_SALT)
+    signature = (
+        f"{key}:{request.GET.get('timestamp', '')}"
+        f":{request.GET.get('signature', '')}"
+    )
+
+    try:
+        signer.unsign(signature, max_age=settings.IMAGE_UPLOAD_URL_EXPIRES)
+    except signing.BadSignature:
+        return JsonResponse({"detail": "Invalid signature."}, status=403)
+
+    too_large = JsonResponse({"detail": "Upload too large."}, status=413)
+    max_size = settings.IMAGE_UPLOAD_MAX_SIZE
+
+    if int(request.META.get("CONTENT_LENGTH") or 0) > max_size:
+        return too_large
+
+    store = LocalUploadStore()
+    path = store.path(key)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    size = 0
+
+    with open(path, "wb") as file:
+        while chunk := request.read(64 * 1024):
+            size += len(chunk)
+            if size > max_size:
+                break
+            file.write(chunk)
+
+    if size > max_size:
+        store.delete(key)
+        return too_large
+
+    return HttpResponse(status=200)
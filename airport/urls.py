@@ -1,6 +1,8 @@
 from django.urls import path, include
 from rest_framework import routers
 
+from airport.async_views import flight_list, flight_detail, flight_seats
+from airport.uploads import local_upload
 from airport.views import (
     AirplaneTypeViewSet,
     AirplaneViewSet,
@@ -13,6 +15,7 @@ from airport.views import (
     create_checkout_session,
     payment_success,
     payment_cancel,
+    database_pool_stats,
 )
 
 router = routers.DefaultRouter()
@@ -32,6 +35,19 @@ urlpatterns = [
         create_checkout_session,
         name="create-session"
     ),
+    path("async/flights/", flight_list, name="async-flight-list"),
+    path(
+        "async/flights/<int:pk>/",
+        flight_detail,
+        name="async-flight-detail"
+    ),
+    path(
+        "async/flights/<int:pk>/seats/",
+        flight_seats,
+        name="async-flight-seats"
+    ),
+    path("db-pool-stats/", database_pool_stats, name="db-pool-stats"),
+    path("uploads/<path:key>", local_upload, name="local-upload"),
     path("success/", payment_success, name="success"),
     path("cancelled/", payment_cancel, name="cancelled"),
 ]
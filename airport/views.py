@@ -1,12 +1,17 @@
+from datetime import datetime, timedelta, timezone as dt_timezone
+from decimal import Decimal
+
 import stripe
 from django.conf import settings
-from django.db.models import F, Count
+from django.db import transaction
+from django.db.models import F, Q, Count, prefetch_related_objects
 from django.http import JsonResponse
-from django.shortcuts import redirect
+from django.shortcuts import redirect, get_object_or_404
+from django.utils import timezone
 from drf_spectacular.types import OpenApiTypes
 from drf_spectacular.utils import extend_schema, OpenApiParameter
 from rest_framework import viewsets, mixins, status
-from rest_framework.decorators import action
+from rest_framework.decorators import action, api_view, permission_classes
 from rest_framework.pagination import PageNumberPagination
 from rest_framework.permissions import IsAdminUser, IsAuthenticated
 from rest_framework.response import Response
@@ -21,6 +26,37 @@ from airport.models import (
     Order,
     Payment,
 )
+from airport.dynamic_fields import DynamicFieldsViewMixin
+from airport.idempotency import IdempotentCreateMixin
+from airport.images import image_files_lock, schedule_image_processing
+from airport.assignments import assign_crews
+from airport.cancellation import (
+    CAPTURED,
+    cancel_flight,
+    cancel_order,
+    record_payment,
+)
+from airport.delays import delay_flight
+from airport.duty import (
+    available_crews,
+    change_violations,
+    month_violations,
+)
+from airport.roster import (
+    roster_export,
+    roster_prefetch,
+    upcoming_flights_prefetch,
+)
+from airport.scheduling import (
+    airplane_timeline,
+    all_crew_conflicts,
+    schedule_integrity_errors,
+)
+from airport.uploads import (
+    attach_uploaded_image,
+    get_upload_store,
+    new_upload_key,
+)
 from airport.permissions import IsAdminOrReadOnly
 from airport.serializers import (
     AirplaneTypeSerializer,
@@ -28,21 +64,44 @@ from airport.serializers import (
     AirplaneListSerializer,
     AirplaneDetailSerializer,
     AirplaneImageSerializer,
+    AirplaneImageUploadUrlSerializer,
+    AirplaneImageFinalizeSerializer,
+    AirplaneTimelineSerializer,
+    RosterPeriodSerializer,
+    TimelinePeriodSerializer,
     AirportSerializer,
     RouteSerializer,
     RouteListSerializer,
+    RouteListValuesSerializer,
     CrewSerializer,
     CrewListSerializer,
+    CrewAvailabilitySerializer,
+    CrewAvailableSerializer,
+    BulkCrewAssignmentSerializer,
+    CrewAssignmentResultSerializer,
+    CrewConflictSerializer,
+    CrewDetailSerializer,
+    FlightDelayResultSerializer,
+    FlightCancellationSerializer,
+    OrderCancellationSerializer,
+    FlightDelaySerializer,
+    CrewRosterSerializer,
+    CrewDutyCheckSerializer,
+    CrewDutyMonthSerializer,
+    CrewDutyViolationSerializer,
     FlightSerializer,
     FlightListSerializer,
+    FlightListValuesSerializer,
     FlightDetailSerializer,
     OrderSerializer,
     OrderListSerializer,
     PaymentSerializer,
 )
+from airport_service.postgresql_pool.pool import pool_stats
 
 stripe.api_key = settings.STRIPE_SECRET_KEY
 DOMAIN_URL = "http://127.0.0.1:8000"
+SESSION_EXPIRY_MARGIN = timedelta(minutes=5)
 
 
 class ApiPagination(PageNumberPagination):
@@ -50,6 +109,38 @@ class ApiPagination(PageNumberPagination):
     max_page_size = 100
 
 
+class ValuesListMixin:
+    """
+    Serve the list action with `values_serializer_class` from `.values()`
+    rows instead of model instances. The schema keeps documenting the
+    list serializer, which gives the same output.
+    """
+
+    values_serializer_class = None
+
+    def uses_values(self):
+        return (
+            self.action == "list"
+            and self.values_serializer_class is not None
+            and not getattr(self, "swagger_fake_view", False)
+        )
+
+    def filter_queryset(self, queryset):
+        queryset = super().filter_queryset(queryset)
+
+        if self.uses_values():
+            return self.get_serializer().values_queryset(queryset)
+
+        return queryset
+
+    def get_serializer(self, *args, **kwargs):
+        if self.uses_values():
+            kwargs.setdefault("context", self.get_serializer_context())
+            return self.values_serializer_class(*args, **kwargs)
+
+        return super().get_serializer(*args, **kwargs)
+
+
 class AirplaneTypeViewSet(
     mixins.CreateModelMixin,
     viewsets.GenericViewSet
@@ -59,7 +150,7 @@ class AirplaneTypeViewSet(
     permission_classes = (IsAdminUser,)
 
 
-class AirplaneViewSet(viewsets.ModelViewSet):
+class AirplaneViewSet(DynamicFieldsViewMixin, viewsets.ModelViewSet):
     queryset = Airplane.objects.select_related("airplane_type")
     serializer_class = AirplaneSerializer
     pagination_class = ApiPagination
@@ -92,6 +183,15 @@ class AirplaneViewSet(viewsets.ModelViewSet):
         if self.action == "upload_image":
             return AirplaneImageSerializer
 
+        if self.action == "image_upload_url":
+            return AirplaneImageUploadUrlSerializer
+
+        if self.action == "finalize_image":
+            return AirplaneImageFinalizeSerializer
+
+        if self.action == "timeline":
+            return AirplaneTimelineSerializer
+
         return super().get_serializer_class()
 
     @action(
@@ -106,9 +206,100 @@ class AirplaneViewSet(viewsets.ModelViewSet):
         serializer = self.get_serializer(airplane, data=request.data)
 
         if serializer.is_valid(raise_exception=True):
-            serializer.save()
+            with image_files_lock():
+                serializer.save()
+            schedule_image_processing(airplane)
             return Response(serializer.data, status=status.HTTP_200_OK)
 
+    @action(
+        methods=["POST"],
+        detail=True,
+        url_path="image-upload-url",
+        permission_classes=[IsAdminUser],
+    )
+    def image_upload_url(self, request, pk=None):
+        """Presigned URL to PUT an image of the airplane to the storage"""
+        airplane = self.get_object()
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+
+        content_type = serializer.validated_data["content_type"]
+        key = new_upload_key(airplane.id, content_type)
+        upload_url = get_upload_store().presigned_put_url(
+            request, key, content_type
+        )
+
+        return Response(
+            self.get_serializer(
+                {
+                    "upload_url": upload_url,
+                    "upload_key": key,
+                    "method": "PUT",
+                    "headers": {"Content-Type": content_type},
+                    "expires_in": settings.IMAGE_UPLOAD_URL_EXPIRES,
+                }
+            ).data,
+            status=status.HTTP_200_OK,
+        )
+
+    @extend_schema(responses=AirplaneImageSerializer)
+    @action(
+        methods=["POST"],
+        detail=True,
+        url_path="finalize-image",
+        permission_classes=[IsAdminUser],
+    )
+    def finalize_image(self, request, pk=None):
+        """
+        Check the image uploaded to the presigned URL, it is attached to
+        the airplane in the background
+        """
+        airplane = self.get_object()
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+
+        attach_uploaded_image(
+            airplane, serializer.validated_data["upload_key"]
+        )
+
+        return Response(
+            AirplaneImageSerializer(
+                airplane, context=self.get_serializer_context()
+            ).data,
+            status=status.HTTP_202_ACCEPTED,
+        )
+
+    @extend_schema(
+        parameters=[
+            OpenApiParameter(
+                "start",
+                type=OpenApiTypes.DATETIME,
+                description="Start of the period (now by default)",
+            ),
+            OpenApiParameter(
+                "end",
+                type=OpenApiTypes.DATETIME,
+                description="End of the period (a week after its start)",
+            ),
+        ]
+    )
+    @action(methods=["GET"], detail=True)
+    def timeline(self, request, pk=None):
+        """Flights of the airplane and its idle gaps over a period"""
+        airplane = self.get_object()
+        period = TimelinePeriodSerializer(data=request.query_params)
+        period.is_valid(raise_exception=True)
+
+        serializer = self.get_serializer(
+            airplane_timeline(
+                airplane,
+                period.validated_data["start"],
+                period.validated_data["end"],
+            )
+        )
+
+        return Response(serializer.data, status=status.HTTP_200_OK)
+
     @extend_schema(
         parameters=[
             OpenApiParameter(
@@ -128,6 +319,7 @@ class AirplaneViewSet(viewsets.ModelViewSet):
 
 
 class AirportViewSet(
+    DynamicFieldsViewMixin,
     mixins.ListModelMixin,
     mixins.CreateModelMixin,
     viewsets.GenericViewSet
@@ -162,12 +354,15 @@ class AirportViewSet(
 
 
 class RouteViewSet(
+    DynamicFieldsViewMixin,
+    ValuesListMixin,
     mixins.ListModelMixin,
     mixins.CreateModelMixin,
     viewsets.GenericViewSet
 ):
     queryset = Route.objects.select_related("source", "destination")
     serializer_class = RouteSerializer
+    values_serializer_class = RouteListValuesSerializer
     pagination_class = ApiPagination
     permission_classes = (IsAdminOrReadOnly,)
 
@@ -217,7 +412,7 @@ class RouteViewSet(
         return super().list(request, *args, **kwargs)
 
 
-class CrewViewSet(viewsets.ModelViewSet):
+class CrewViewSet(DynamicFieldsViewMixin, viewsets.ModelViewSet):
     queryset = Crew.objects.all()
     serializer_class = CrewSerializer
     pagination_class = ApiPagination
@@ -234,12 +429,211 @@ class CrewViewSet(viewsets.ModelViewSet):
 
         return queryset
 
+    def filter_queryset(self, queryset):
+        queryset = super().filter_queryset(queryset)
+
+        # After the trimming of the fields, which resets the prefetches
+        if self.shows_upcoming_flights() and self.wants_field(
+            "upcoming_flights"
+        ):
+            queryset = queryset.prefetch_related(upcoming_flights_prefetch())
+
+        return queryset
+
+    def shows_upcoming_flights(self):
+        """The schedule of the crew members is for the staff only"""
+        return self.action == "retrieve" and self.request.user.is_staff
+
+    def get_serializer(self, *args, **kwargs):
+        serializer = super().get_serializer(*args, **kwargs)
+
+        if self.action == "retrieve" and not self.shows_upcoming_flights():
+            serializer.fields.pop("upcoming_flights", None)
+
+        return serializer
+
     def get_serializer_class(self):
         if self.action == "list":
             return CrewListSerializer
 
+        if self.action == "retrieve":
+            return CrewDetailSerializer
+
+        if self.action == "roster":
+            return CrewRosterSerializer
+
+        if self.action == "conflicts":
+            return CrewConflictSerializer
+
+        if self.action == "available":
+            return CrewAvailableSerializer
+
+        if self.action in ("duty_violations", "duty_check"):
+            return CrewDutyViolationSerializer
+
         return super().get_serializer_class()
 
+    @extend_schema(
+        parameters=[
+            OpenApiParameter(
+                "all",
+                type=OpenApiTypes.BOOL,
+                description="Include the flights that have landed",
+            ),
+        ]
+    )
+    @action(
+        methods=["GET"],
+        detail=False,
+        permission_classes=[IsAdminUser],
+    )
+    def conflicts(self, request):
+        """Crew members assigned to overlapping flights"""
+        since = None if request.query_params.get("all") else timezone.now()
+        serializer = self.get_serializer(
+            all_crew_conflicts(since=since), many=True
+        )
+
+        return Response(serializer.data, status=status.HTTP_200_OK)
+
+    @extend_schema(
+        parameters=[
+            OpenApiParameter(
+                "start",
+                type=OpenApiTypes.DATETIME,
+                description="Start of the period (now by default)",
+            ),
+            OpenApiParameter(
+                "end",
+                type=OpenApiTypes.DATETIME,
+                description="End of the period (30 days after its start)",
+            ),
+            OpenApiParameter(
+                "export",
+                type=OpenApiTypes.STR,
+                enum=["csv", "ics"],
+                description="Stream the flights as a CSV file or an "
+                "iCalendar feed, over any period",
+            ),
+        ]
+    )
+    @action(
+        methods=["GET"],
+        detail=True,
+        permission_classes=[IsAdminUser],
+    )
+    def roster(self, request, pk=None):
+        """Flights of the crew member in a period"""
+        period = RosterPeriodSerializer(data=request.query_params)
+        period.is_valid(raise_exception=True)
+        start = period.validated_data["start"]
+        end = period.validated_data["end"]
+
+        crew = self.get_object()
+        export = period.validated_data.get("export")
+
+        if export:
+            return roster_export(crew, start, end, export)
+
+        prefetch_related_objects([crew], roster_prefetch(start, end))
+        serializer = self.get_serializer(crew)
+
+        return Response(serializer.data, status=status.HTTP_200_OK)
+
+    @extend_schema(
+        parameters=[
+            OpenApiParameter(
+                "position",
+                type=OpenApiTypes.STR,
+                description="Filter by position (ex. ?position=captain)",
+            ),
+            OpenApiParameter(
+                "from",
+                type=OpenApiTypes.DATETIME,
+                required=True,
+                description="Start of the period the crew must be free",
+            ),
+            OpenApiParameter(
+                "to",
+                type=OpenApiTypes.DATETIME,
+                required=True,
+                description="End of the period the crew must be free",
+            ),
+        ]
+    )
+    @action(
+        methods=["GET"],
+        detail=False,
+        permission_classes=[IsAdminUser],
+    )
+    def available(self, request):
+        """
+        Crew members free in the period, those with the fewest duty
+        hours in its month first
+        """
+        period = CrewAvailabilitySerializer(data=request.query_params)
+        period.is_valid(raise_exception=True)
+
+        queryset = available_crews(
+            period.validated_data["from"], period.validated_data["to"]
+        )
+        position = period.validated_data.get("position")
+        if position:
+            queryset = queryset.filter(position__icontains=position)
+
+        page = self.paginate_queryset(queryset)
+        serializer = self.get_serializer(page, many=True)
+
+        return self.get_paginated_response(serializer.data)
+
+    @extend_schema(
+        parameters=[
+            OpenApiParameter(
+                "month",
+                type=OpenApiTypes.STR,
+                description="Roster month (ex. ?month=2030-07), the current "
+                "one by default",
+            ),
+        ]
+    )
+    @action(
+        methods=["GET"],
+        detail=False,
+        url_path="duty-violations",
+        permission_classes=[IsAdminUser],
+    )
+    def duty_violations(self, request):
+        """Duty time and rest rules broken in a roster month"""
+        month = CrewDutyMonthSerializer(data=request.query_params)
+        month.is_valid(raise_exception=True)
+
+        serializer = self.get_serializer(
+            month_violations(
+                month.validated_data.get("month", timezone.localdate())
+            ),
+            many=True,
+        )
+
+        return Response(serializer.data, status=status.HTTP_200_OK)
+
+    @extend_schema(request=CrewDutyCheckSerializer)
+    @action(
+        methods=["POST"],
+        detail=False,
+        url_path="duty-check",
+        permission_classes=[IsAdminUser],
+    )
+    def duty_check(self, request):
+        """Duty rules the flight changes would break, nothing is saved"""
+        check = CrewDutyCheckSerializer(data=request.data)
+        check.is_valid(raise_exception=True)
+
+        serializer = self.get_serializer(
+            change_violations(check.validated_data["changes"]), many=True
+        )
+
+        return Response(serializer.data, status=status.HTTP_200_OK)
+
     @extend_schema(
         parameters=[
             OpenApiParameter(
@@ -253,48 +647,62 @@ class CrewViewSet(viewsets.ModelViewSet):
         return super().list(request, *args, **kwargs)
 
 
-class FlightViewSet(viewsets.ModelViewSet):
-    queryset = (
-        Flight.objects
-        .prefetch_related(
-            "route__source",
-            "route__destination",
-            "airplane__airplane_type",
-            "crews"
+def filter_flights(queryset, query_params):
+    """Filter flights by airplane name, route source and destination"""
+    airplane = query_params.get("airplane")
+    route_source = query_params.get("route_source")
+    route_destination = query_params.get("route_destination")
+
+    if airplane:
+        queryset = queryset.filter(airplane__name__icontains=airplane)
+
+    if route_source:
+        queryset = queryset.filter(
+            route__source__name__icontains=route_source
+        )
+
+    if route_destination:
+        queryset = queryset.filter(
+            route__destination__name__icontains=route_destination
         )
-        .annotate(
-            tickets_available=(
-                F("airplane__rows") * F("airplane__seats_in_row")
-                - Count("flight_ticket")
+
+    return queryset
+
+
+def annotate_tickets_available(queryset):
+    return queryset.annotate(
+        tickets_available=(
+            F("airplane__rows") * F("airplane__seats_in_row")
+            - Count(
+                "flight_ticket",
+                filter=Q(flight_ticket__cancelled_at__isnull=True),
             )
         )
     )
+
+
+class FlightViewSet(
+    DynamicFieldsViewMixin, ValuesListMixin, viewsets.ModelViewSet
+):
+    queryset = Flight.objects.prefetch_related(
+        "route__source",
+        "route__destination",
+        "airplane__airplane_type",
+        "crews"
+    )
     serializer_class = FlightSerializer
+    values_serializer_class = FlightListValuesSerializer
     pagination_class = ApiPagination
     permission_classes = (IsAdminOrReadOnly,)
 
     def get_queryset(self):
         """Retrieve the flight with filter"""
-        airplane = self.request.query_params.get("airplane")
-        route_source = self.request.query_params.get("route_source")
-        route_destination = self.request.query_params.get("route_destination")
-
         queryset = super().get_queryset()
 
-        if airplane:
-            queryset = queryset.filter(airplane__name__icontains=airplane)
-
-        if route_source:
-            queryset = queryset.filter(
-                route__source__name__icontains=route_source
-            )
-
-        if route_destination:
-            queryset = queryset.filter(
-                route__destination__name__icontains=route_destination
-            )
+        if self.action == "list" and self.wants_field("tickets_available"):
+            queryset = annotate_tickets_available(queryset)
 
-        return queryset
+        return filter_flights(queryset, self.request.query_params)
 
     def get_serializer_class(self):
         if self.action == "list":
@@ -305,6 +713,78 @@ class FlightViewSet(viewsets.ModelViewSet):
 
         return super().get_serializer_class()
 
+    def perform_create(self, serializer):
+        with schedule_integrity_errors(), transaction.atomic():
+            serializer.save()
+
+    def perform_update(self, serializer):
+        with schedule_integrity_errors(), transaction.atomic():
+            serializer.save()
+
+    @extend_schema(
+        request=FlightDelaySerializer,
+        responses=FlightDelayResultSerializer,
+    )
+    @action(
+        methods=["POST"],
+        detail=True,
+        permission_classes=[IsAdminUser],
+    )
+    def delay(self, request, pk=None):
+        """
+        Delay the flight and return the next flights of its airplane and
+        crews pushed back, which are delayed too with `cascade`
+        """
+        flight = self.get_object()
+        serializer = FlightDelaySerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+
+        result = FlightDelayResultSerializer(
+            delay_flight(flight.pk, **serializer.validated_data)
+        )
+
+        return Response(result.data, status=status.HTTP_200_OK)
+
+    @extend_schema(request=None, responses=FlightCancellationSerializer)
+    @action(
+        methods=["POST"],
+        detail=True,
+        permission_classes=[IsAdminUser],
+    )
+    def cancel(self, request, pk=None):
+        """
+        Cancel the flight: its seats and crews are released and the paid
+        tickets queued for refund
+        """
+        flight = self.get_object()
+        result = FlightCancellationSerializer(cancel_flight(flight.pk))
+
+        return Response(result.data, status=status.HTTP_200_OK)
+
+    @extend_schema(
+        request=BulkCrewAssignmentSerializer,
+        responses=CrewAssignmentResultSerializer(many=True),
+    )
+    @action(
+        methods=["POST"],
+        detail=False,
+        url_path="crews",
+        permission_classes=[IsAdminUser],
+    )
+    def set_crews(self, request):
+        """
+        Replace the crews of many flights at once, all of them or none
+        with the errors of every assignment
+        """
+        serializer = BulkCrewAssignmentSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+
+        results = CrewAssignmentResultSerializer(
+            assign_crews(serializer.validated_data["assignments"]), many=True
+        )
+
+        return Response(results.data, status=status.HTTP_200_OK)
+
     @extend_schema(
         parameters=[
             OpenApiParameter(
@@ -334,6 +814,8 @@ class FlightViewSet(viewsets.ModelViewSet):
 
 
 class OrderViewSet(
+    DynamicFieldsViewMixin,
+    IdempotentCreateMixin,
     mixins.ListModelMixin,
     mixins.CreateModelMixin,
     viewsets.GenericViewSet
@@ -346,9 +828,16 @@ class OrderViewSet(
     serializer_class = OrderSerializer
     pagination_class = ApiPagination
     permission_classes = (IsAuthenticated,)
+    throttle_costs = {"create": 5}
 
     def get_queryset(self):
-        return Order.objects.filter(user=self.request.user)
+        queryset = super().get_queryset()
+
+        if self.action in ("cancel", "cancel_ticket"):
+            # The tickets are read by the cancellation itself
+            queryset = queryset.prefetch_related(None)
+
+        return queryset.filter(user=self.request.user)
 
     def get_serializer_class(self):
         if self.action == "list":
@@ -359,72 +848,156 @@ class OrderViewSet(
     def perform_create(self, serializer):
         serializer.save(user=self.request.user)
 
+    @extend_schema(request=None, responses=OrderCancellationSerializer)
+    @action(methods=["POST"], detail=True)
+    def cancel(self, request, pk=None):
+        """
+        Cancel every ticket left in the order: their seats are released
+        and what was paid for them queued for refund
+        """
+        order = self.get_object()
+        result = OrderCancellationSerializer(cancel_order(order.pk))
+
+        return Response(result.data, status=status.HTTP_200_OK)
+
+    @extend_schema(request=None, responses=OrderCancellationSerializer)
+    @action(
+        methods=["POST"],
+        detail=True,
+        url_path=r"tickets/(?P<ticket_id>\d+)/cancel",
+        url_name="cancel-ticket",
+    )
+    def cancel_ticket(self, request, pk=None, ticket_id=None):
+        """Cancel one ticket of the order, the others are kept"""
+        order = self.get_object()
+        result = OrderCancellationSerializer(
+            cancel_order(order.pk, ticket_ids=[int(ticket_id)])
+        )
+
+        return Response(result.data, status=status.HTTP_200_OK)
+
 
 class PaymentViewSet(
+    DynamicFieldsViewMixin,
+    IdempotentCreateMixin,
     mixins.ListModelMixin,
     mixins.RetrieveModelMixin,
     mixins.CreateModelMixin,
     viewsets.GenericViewSet
 ):
-    queryset = Payment.objects.select_related("order")
+    queryset = Payment.objects.select_related("order__user")
     serializer_class = PaymentSerializer
     permission_classes = (IsAuthenticated,)
     pagination_class = ApiPagination
+    throttle_costs = {"create": 3}
 
     def get_queryset(self) -> Payment:
-        return Payment.objects.filter(
+        return super().get_queryset().filter(
             order__user=self.request.user
         )
 
+    def perform_create(self, serializer):
+        order = serializer.validated_data["order"]
+        serializer.save(amount=order.total_cost())
+
+
+@extend_schema(responses=OpenApiTypes.OBJECT)
+@api_view(["GET"])
+@permission_classes([IsAdminUser])
+def database_pool_stats(request):
+    """Connection pool sizes and wait times of this worker process"""
+    return Response(pool_stats())
+
 
 def create_checkout_session(request, payment_id: int) -> JsonResponse:
-    payment = Payment.objects.get(pk=payment_id)
+    payment = get_object_or_404(
+        Payment.objects.select_related("order"), pk=payment_id
+    )
 
-    if payment.status_payment == payment.PAID:
+    if payment.status_payment in CAPTURED:
         return JsonResponse(
             {
                 "message": "You’ve already paid to this order of tickets"
             }
         )
 
-    else:
-        session = stripe.checkout.Session.create(
-            payment_method_types=["card"],
-            line_items=[
-                {
-                    "price_data": {
-                        "currency": "usd",
-                        "unit_amount": int(payment.order.total_cost() * 100),
-                        "product_data": {
-                            "name": f"Order #{payment.order_id}",
-                            "description": "Payment of tickets order",
-                        },
+    if payment.order.cancelled_at is not None:
+        return JsonResponse({"message": "This order of tickets is cancelled"})
+
+    if payment.has_open_session(margin=SESSION_EXPIRY_MARGIN):
+        return redirect(payment.session_url)
+
+    if payment.amount is None:
+        payment.amount = payment.order.total_cost()
+
+    session = stripe.checkout.Session.create(
+        payment_method_types=["card"],
+        line_items=[
+            {
+                "price_data": {
+                    "currency": "usd",
+                    "unit_amount": int(payment.amount * 100),
+                    "product_data": {
+                        "name": f"Order #{payment.order_id}",
+                        "description": "Payment of tickets order",
                     },
-                    "quantity": 1,
                 },
-            ],
-            mode="payment",
-            success_url=(
-                DOMAIN_URL + "/success?session_id={CHECKOUT_SESSION_ID}"
-            ),
-            cancel_url=DOMAIN_URL + (
-                "/cancelled?session_id={CHECKOUT_SESSION_ID}"
-            ),
-        )
+                "quantity": 1,
+            },
+        ],
+        mode="payment",
+        success_url=(
+            DOMAIN_URL + "/success?session_id={CHECKOUT_SESSION_ID}"
+        ),
+        cancel_url=DOMAIN_URL + (
+            "/cancelled?session_id={CHECKOUT_SESSION_ID}"
+        ),
+    )
 
-        payment.session_id = session.id
-        payment.session_url = session.url
-        payment.save()
+    payment.session_id = session.id
+    payment.session_url = session.url
+    payment.session_expires_at = datetime.fromtimestamp(
+        session.expires_at, tz=dt_timezone.utc
+    )
+    payment.save()
 
-        return redirect(payment.session_url)
+    return redirect(payment.session_url)
 
 
 def payment_success(request) -> JsonResponse:
     session_id = request.GET.get("session_id")
-    payment = Payment.objects.get(session_id=session_id)
-    payment.status_payment = Payment.PAID
+    if (
+        not session_id
+        or not Payment.objects.filter(session_id=session_id).exists()
+    ):
+        return JsonResponse(
+            {"message": "No payment has this session"}, status=404
+        )
 
-    payment.save()
+    try:
+        session = stripe.checkout.Session.retrieve(session_id)
+    except stripe.error.InvalidRequestError:
+        return JsonResponse(
+            {"message": "No payment has this session"}, status=404
+        )
+
+    # Opened, expired or cancelled sessions get here too
+    if session.payment_status != "paid":
+        return JsonResponse(
+            {"message": "This session is not paid"}, status=400
+        )
+
+    _, refund = record_payment(
+        session_id, Decimal(session.amount_total) / 100
+    )
+
+    if refund is not None:
+        return JsonResponse(
+            {
+                "message": "Payment successful! The order has changed "
+                           f"meanwhile, {refund.amount} will be refunded."
+            }
+        )
 
     return JsonResponse(
         {"message": "Payment successful!"}
@@ -433,9 +1006,15 @@ def payment_success(request) -> JsonResponse:
 
 def payment_cancel(request) -> JsonResponse:
     session_id = request.GET.get("session_id")
-    payment = Payment.objects.get(session_id=session_id)
-    payment.status_payment = Payment.CANCELLED
-    payment.save()
+    payment = Payment.objects.filter(session_id=session_id).first()
+    if not session_id or payment is None:
+        return JsonResponse(
+            {"message": "No payment has this session"}, status=404
+        )
+
+    if payment.status_payment not in CAPTURED:
+        payment.status_payment = Payment.CANCELLED
+        payment.save()
 
     return JsonResponse(
         {
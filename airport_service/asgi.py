@@ -14,3 +14,7 @@ from django.core.asgi import get_asgi_application
 os.environ.setdefault("DJANGO_SETTINGS_MODULE", "airport_service.settings")
 
 application = get_asgi_application()
+
+from airport.checks import enforce_production_profile  # noqa: E402
+
+enforce_production_profile()
@@ -0,0 +1,105 @@
+"""
+Read replica routing.
+
+Reads of safe-method requests (GET, HEAD, OPTIONS) go to one of the
+DATABASE_REPLICAS, everything else goes to the primary ("default").
+After a successful write a user is pinned to the primary for
+REPLICA_PIN_SECONDS, so data they just created is visible to them even
+if the replicas lag behind. Code running outside a request (management
+commands, shell) always uses the primary.
+"""
+import random
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.core.cache import cache
+from django.utils.functional import SimpleLazyObject, empty
+from rest_framework.permissions import SAFE_METHODS
+
+PRIMARY = "default"
+
+_current_request = ContextVar("replica_routing_request", default=None)
+
+
+def pin_key(user_id):
+    return f"replica-pin:{user_id}"
+
+
+def _request_user(request):
+    user = request.__dict__.get("user")
+
+    # Resolving a lazy session user runs a query, which would come back
+    # to the router
+    if isinstance(user, SimpleLazyObject) and user._wrapped is empty:
+        return None
+
+    return user
+
+
+def pin_to_primary(user):
+    cache.set(pin_key(user.pk), True, timeout=settings.REPLICA_PIN_SECONDS)
+
+
+def is_pinned_to_primary(request):
+    if "_pinned_to_primary" in request.__dict__:
+        return request._pinned_to_primary
+
+    user = _request_user(request)
+
+    # Not authenticated yet, decide again once the user is known
+    if user is None or not user.is_authenticated:
+        return False
+
+    request._pinned_to_primary = bool(cache.get(pin_key(user.pk)))
+
+    return request._pinned_to_primary
+
+
+class ReplicaRoutingMiddleware:
+    """Make the request visible to the router and pin writers"""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        token = _current_request.set(request)
+
+        try:
+            response = self.get_response(request)
+        finally:
+            _current_request.reset(token)
+
+        if request.method not in SAFE_METHODS and response.status_code < 400:
+            user = _request_user(request)
+
+            if user is not None and user.is_authenticated:
+                pin_to_primary(user)
+
+        return response
+
+
+class PrimaryReplicaRouter:
+    def db_for_read(self, model, **hints):
+        replicas = settings.DATABASE_REPLICAS
+        request = _current_request.get()
+
+        if not replicas or request is None:
+            return PRIMARY
+
+        if request.method not in SAFE_METHODS:
+            return PRIMARY
+
+        if is_pinned_to_primary(request):
+            return PRIMARY
+
+        return random.choice(replicas)
+
+    def db_for_write(self, model, **hints):
+        return PRIMARY
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Replicas hold the same data as the primary
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db not in settings.DATABASE_REPLICAS
@@ -0,0 +1,125 @@
+"""
+PostgreSQL backend that keeps connections in an in-process pool.
+
+Django closes the connection of a thread when a request ends, with this
+backend that hands the connection back to the pool instead of closing
+it. Configure the pool in OPTIONS:
+
+    "ENGINE": "airport_service.postgresql_pool",
+    "OPTIONS": {"pool": {"min_size": 2, "max_size": 10, "timeout": 10}},
+
+Keep CONN_MAX_AGE at 0, otherwise every thread holds on to its own
+connection and the pool is never used.
+
+A pooled connection runs `SELECT 1` when it is checked out, so one the
+server or the network dropped while it was idle is replaced instead of
+failing the request, and one handed back broken is closed.
+"""
+from django.db.backends.base.base import NO_DB_ALIAS
+from django.db.backends.postgresql import base, creation
+from django.db.backends.postgresql.base import IsolationLevel
+
+from airport_service.postgresql_pool.pool import (
+    get_pool,
+    close_pool,
+    PoolTimeout,
+)
+
+# Same value for psycopg2 and psycopg 3
+TRANSACTION_STATUS_IDLE = 0
+
+
+def pool_name(alias, database_name):
+    return f"{alias}/{database_name}"
+
+
+class DatabaseCreation(creation.DatabaseCreation):
+    def _destroy_test_db(self, test_database_name, verbosity):
+        # Idle pooled sessions would keep the test database in use
+        close_pool(pool_name(self.connection.alias, test_database_name))
+        super()._destroy_test_db(test_database_name, verbosity)
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+    creation_class = DatabaseCreation
+
+    def get_pool_options(self):
+        options = self.settings_dict["OPTIONS"].get("pool") or {}
+
+        return {} if options is True else options
+
+    @property
+    def is_pooled(self):
+        # Short-lived maintenance connections, e.g. for creating databases
+        return self.alias != NO_DB_ALIAS
+
+    @property
+    def pool(self):
+        # One pool per database name, the test runner renames it
+        return get_pool(
+            pool_name(self.alias, self.settings_dict["NAME"]),
+            **self.get_pool_options(),
+        )
+
+    def get_connection_params(self):
+        conn_params = super().get_connection_params()
+        conn_params.pop("pool", None)
+
+        return conn_params
+
+    def get_new_connection(self, conn_params):
+        if not self.is_pooled:
+            return super().get_new_connection(conn_params)
+
+        options = self.settings_dict["OPTIONS"]
+        self.isolation_level = IsolationLevel(
+            options.get("isolation_level", IsolationLevel.READ_COMMITTED)
+        )
+
+        def connect():
+            return super(DatabaseWrapper, self).get_new_connection(
+                conn_params
+            )
+
+        try:
+            self.pool.fill(connect)
+            return self.pool.getconn(connect, check=self._is_alive)
+        except PoolTimeout as error:
+            raise self.Database.OperationalError(str(error)) from error
+
+    def _is_alive(self, connection):
+        """Round trip to the server, for the idle connections"""
+        if connection.closed:
+            return False
+
+        try:
+            with connection.cursor() as cursor:
+                cursor.execute("SELECT 1")
+            # Without autocommit the query opened a transaction
+            if connection.info.transaction_status != TRANSACTION_STATUS_IDLE:
+                connection.rollback()
+        except self.Database.Error:
+            return False
+
+        return True
+
+    def _is_reusable(self, connection):
+        """Roll back what is left open so the next user starts clean"""
+        if connection.closed:
+            return False
+
+        if connection.info.transaction_status != TRANSACTION_STATUS_IDLE:
+            try:
+                connection.rollback()
+            except self.Database.Error:
+                return False
+
+        return True
+
+    def _close(self):
+        if not self.is_pooled:
+            return super()._close()
+
+        if self.connection is not None:
+            with self.wrap_database_errors:
+                self.pool.putconn(self.connection, check=self._is_reusable)
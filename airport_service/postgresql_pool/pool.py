@@ -0,0 +1,243 @@
+import os
+import threading
+import time
+from collections import deque
+
+
+class PoolTimeout(Exception):
+    pass
+
+
+class PoolStats:
+    """Counters of how long callers waited for a connection"""
+
+    def __init__(self):
+        self.requests = 0
+        self.waits = 0
+        self.wait_time = 0.0
+        self.max_wait_time = 0.0
+        self.timeouts = 0
+        self.connections_opened = 0
+        self.connections_discarded = 0
+
+    def record_wait(self, seconds, waited):
+        self.requests += 1
+        self.wait_time += seconds
+        self.max_wait_time = max(self.max_wait_time, seconds)
+
+        if waited:
+            self.waits += 1
+
+    def as_dict(self):
+        return {
+            "requests": self.requests,
+            "waits": self.waits,
+            "timeouts": self.timeouts,
+            "wait_time_total_ms": round(self.wait_time * 1000, 3),
+            "wait_time_avg_ms": round(
+                self.wait_time * 1000 / self.requests, 3
+            ) if self.requests else 0.0,
+            "wait_time_max_ms": round(self.max_wait_time * 1000, 3),
+            "connections_opened": self.connections_opened,
+            "connections_discarded": self.connections_discarded,
+        }
+
+
+class ConnectionPool:
+    """
+    Thread-safe pool of DB-API connections of one process.
+
+    Up to ``max_size`` connections are opened on demand, callers block for
+    at most ``timeout`` seconds when all of them are in use. Connections
+    inherited from a parent process after a fork are dropped, never reused.
+    The ``check`` callables of ``getconn`` and ``putconn`` tell whether a
+    connection still works, the broken ones are closed and free a slot.
+    """
+
+    def __init__(self, min_size=1, max_size=10, timeout=30.0):
+        if not 0 <= min_size <= max_size or max_size < 1:
+            raise ValueError(
+                "Pool sizes must satisfy 0 <= min_size <= max_size, "
+                "max_size >= 1"
+            )
+
+        self.min_size = min_size
+        self.max_size = max_size
+        self.timeout = timeout
+        self.stats = PoolStats()
+        self._condition = threading.Condition()
+        self._reset()
+
+    def _reset(self):
+        self._pid = os.getpid()
+        self._idle = deque()
+        self._size = 0
+
+    def _check_fork(self):
+        # The sockets belong to the parent, closing them here would
+        # terminate its sessions
+        if self._pid != os.getpid():
+            self._reset()
+
+    def _open(self, connect):
+        try:
+            connection = connect()
+        except Exception:
+            with self._condition:
+                self._size -= 1
+                self._condition.notify()
+            raise
+
+        with self._condition:
+            self.stats.connections_opened += 1
+
+        return connection
+
+    @staticmethod
+    def _works(connection, check):
+        if check is None:
+            return True
+
+        try:
+            return check(connection)
+        except Exception:
+            return False
+
+    def _discard(self, connection):
+        with self._condition:
+            self._size -= 1
+            self.stats.connections_discarded += 1
+            self._condition.notify()
+
+        try:
+            connection.close()
+        except Exception:
+            pass
+
+    def fill(self, connect):
+        """Open connections until ``min_size`` of them exist"""
+        while True:
+            with self._condition:
+                self._check_fork()
+
+                if self._size >= self.min_size:
+                    return
+
+                self._size += 1
+
+            connection = self._open(connect)
+            self.putconn(connection)
+
+    def _checkout(self, deadline):
+        """
+        Idle connection, or None with a slot reserved for a new one, and
+        whether it had to wait. Called with the lock held.
+        """
+        waited = False
+
+        while True:
+            if self._idle:
+                return self._idle.pop(), waited
+
+            if self._size < self.max_size:
+                self._size += 1
+                return None, waited
+
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                self.stats.timeouts += 1
+                raise PoolTimeout(
+                    f"No connection available in the pool after "
+                    f"{self.timeout} seconds ({self.max_size} in use)"
+                )
+
+            waited = True
+            self._condition.wait(remaining)
+
+    def getconn(self, connect, check=None):
+        started = time.monotonic()
+        deadline = started + self.timeout
+        waited = False
+
+        while True:
+            with self._condition:
+                self._check_fork()
+                connection, waited_now = self._checkout(deadline)
+                waited = waited or waited_now
+
+            # Out of the lock, the check may be a round trip to the server
+            if connection is None or self._works(connection, check):
+                break
+
+            self._discard(connection)
+
+        with self._condition:
+            self.stats.record_wait(time.monotonic() - started, waited)
+
+        if connection is None:
+            connection = self._open(connect)
+
+        return connection
+
+    def putconn(self, connection, discard=False, check=None):
+        # Left to the parent process, see _check_fork()
+        if self._pid != os.getpid():
+            return
+
+        if discard or not self._works(connection, check):
+            self._discard(connection)
+            return
+
+        with self._condition:
+            self._idle.append(connection)
+            self._condition.notify()
+
+    def closeall(self):
+        with self._condition:
+            self._check_fork()
+            idle, self._idle = self._idle, deque()
+            self._size -= len(idle)
+
+        for connection in idle:
+            connection.close()
+
+    def snapshot(self):
+        with self._condition:
+            return {
+                "min_size": self.min_size,
+                "max_size": self.max_size,
+                "size": self._size,
+                "idle": len(self._idle),
+                "in_use": self._size - len(self._idle),
+                **self.stats.as_dict(),
+            }
+
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+def get_pool(name, **options):
+    """Pool registered under name, created with options on first use"""
+    with _pools_lock:
+        if name not in _pools:
+            _pools[name] = ConnectionPool(**options)
+
+        return _pools[name]
+
+
+def close_pool(name):
+    """Close the idle connections of a pool and forget it"""
+    with _pools_lock:
+        pool = _pools.pop(name, None)
+
+    if pool is not None:
+        pool.closeall()
+
+
+def pool_stats():
+    """Usage and wait time metrics of the pools of this process"""
+    with _pools_lock:
+        pools = dict(_pools)
+
+    return {name: pool.snapshot() for name, pool in pools.items()}
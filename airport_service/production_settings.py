@@ -0,0 +1,81 @@
+"""
+Production settings for airport_service project.
+
+Select them with DJANGO_SETTINGS_MODULE=airport_service.production_settings.
+They extend the development settings, drop the debug tooling, keep
+database connections open between requests and cache compiled templates.
+"""
+import os
+
+from airport_service.settings import *  # noqa: F401,F403
+from airport_service.settings import (
+    DATABASES,
+    DEBUG_APPS,
+    INSTALLED_APPS,
+    MIDDLEWARE,
+    REST_FRAMEWORK,
+    TEMPLATES,
+)
+
+PRODUCTION = True
+
+DEBUG = False
+
+ALLOWED_HOSTS = [
+    host for host in os.getenv("ALLOWED_HOSTS", "").split(",") if host
+]
+
+INTERNAL_IPS = []
+
+INSTALLED_APPS = [app for app in INSTALLED_APPS if app not in DEBUG_APPS]
+
+MIDDLEWARE = [
+    middleware
+    for middleware in MIDDLEWARE
+    if middleware.split(".")[0] not in DEBUG_APPS
+]
+
+TEMPLATES = [
+    {
+        **template,
+        "APP_DIRS": False,
+        "OPTIONS": {
+            **template["OPTIONS"],
+            "context_processors": [
+                processor
+                for processor in template["OPTIONS"]["context_processors"]
+                if processor != "django.template.context_processors.debug"
+            ],
+            "loaders": [
+                (
+                    "django.template.loaders.cached.Loader",
+                    [
+                        "django.template.loaders.filesystem.Loader",
+                        "django.template.loaders.app_directories.Loader",
+                    ],
+                ),
+            ],
+        },
+    }
+    for template in TEMPLATES
+]
+
+# Persistent connections, checked before reuse so a connection dropped
+# by the server is replaced instead of failing the request. A pooled
+# database hands its connection back to the pool after each request.
+DATABASES = {
+    alias: {
+        **database,
+        "CONN_MAX_AGE": (
+            0 if "pool" in database.get("OPTIONS", {})
+            else int(os.getenv("CONN_MAX_AGE", 60))
+        ),
+        "CONN_HEALTH_CHECKS": True,
+    }
+    for alias, database in DATABASES.items()
+}
+
+REST_FRAMEWORK = {
+    **REST_FRAMEWORK,
+    "DEFAULT_RENDERER_CLASSES": ("airport.renderers.ORJSONRenderer",),
+}
@@ -35,6 +35,9 @@ INTERNAL_IPS = [
     "127.0.0.1",
 ]
 
+# Debug-only apps, left out of the production profile
+DEBUG_APPS = ("debug_toolbar",)
+
 # Application definition
 
 INSTALLED_APPS = [
@@ -54,6 +57,7 @@ INSTALLED_APPS = [
 MIDDLEWARE = [
     "django.middleware.security.SecurityMiddleware",
     "debug_toolbar.middleware.DebugToolbarMiddleware",
+    "airport_service.db_router.ReplicaRoutingMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.common.CommonMiddleware",
     "django.middleware.csrf.CsrfViewMiddleware",
@@ -100,9 +104,62 @@ DATABASES = {
         "PASSWORD": os.getenv("POSTGRES_PASSWORD"),
         "HOST": os.getenv("POSTGRES_HOST"),
         "PORT": os.getenv("POSTGRES_PORT"),
+        # Server-side cursors break behind a transaction-mode pooler
+        # such as PgBouncer
+        "DISABLE_SERVER_SIDE_CURSORS": (
+            os.getenv("DB_TRANSACTION_POOLER", "False") == "True"
+        ),
     }
 }
 
+# In-process connection pool, see airport_service/postgresql_pool
+DB_POOL = os.getenv("DB_POOL", "False") == "True"
+
+if DB_POOL:
+    DATABASES["default"]["ENGINE"] = "airport_service.postgresql_pool"
+    DATABASES["default"]["OPTIONS"] = {
+        "pool": {
+            "min_size": int(os.getenv("DB_POOL_MIN_SIZE", 2)),
+            "max_size": int(os.getenv("DB_POOL_MAX_SIZE", 10)),
+            "timeout": float(os.getenv("DB_POOL_TIMEOUT", 10)),
+        },
+    }
+
+# Read replicas, e.g. POSTGRES_REPLICA_HOSTS=replica-1,replica-2
+DATABASE_REPLICAS = []
+
+for index, host in enumerate(
+    filter(None, os.getenv("POSTGRES_REPLICA_HOSTS", "").split(",")),
+    start=1
+):
+    DATABASES[f"replica_{index}"] = {
+        **DATABASES["default"],
+        "HOST": host,
+        "TEST": {"MIRROR": "default"},
+    }
+    DATABASE_REPLICAS.append(f"replica_{index}")
+
+DATABASE_ROUTERS = ["airport_service.db_router.PrimaryReplicaRouter"]
+
+# How long a user reads from the primary after a write
+REPLICA_PIN_SECONDS = int(os.getenv("REPLICA_PIN_SECONDS", 10))
+
+# Shared cache for throttling counters and replica pins, every worker
+# process gets its own local memory cache without REDIS_URL
+if os.getenv("REDIS_URL"):
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.redis.RedisCache",
+            "LOCATION": os.getenv("REDIS_URL"),
+        }
+    }
+else:
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+        }
+    }
+
 # Password validation
 # https://docs.djangoproject.com/en/4.2/ref/settings/#auth-password-validators
 
@@ -127,6 +184,35 @@ AUTH_PASSWORD_VALIDATORS = [
 
 AUTH_USER_MODEL = "user.User"
 
+# New passwords are hashed with PASSWORD_HASHER, the hashes made by the
+# other hashers are replaced on login
+PASSWORD_HASHER = os.getenv(
+    "PASSWORD_HASHER", "django.contrib.auth.hashers.PBKDF2PasswordHasher"
+)
+PASSWORD_HASHERS = [
+    PASSWORD_HASHER,
+    *(
+        hasher
+        for hasher in (
+            "django.contrib.auth.hashers.PBKDF2PasswordHasher",
+            "django.contrib.auth.hashers.PBKDF2SHA1PasswordHasher",
+            "django.contrib.auth.hashers.Argon2PasswordHasher",
+            "django.contrib.auth.hashers.BCryptSHA256PasswordHasher",
+            "django.contrib.auth.hashers.ScryptPasswordHasher",
+        )
+        if hasher != PASSWORD_HASHER
+    ),
+]
+
+LOGIN_HASHER_WORKERS = int(
+    os.getenv("LOGIN_HASHER_WORKERS", os.cpu_count() or 1)
+)
+LOGIN_HASHER_QUEUE_SIZE = int(os.getenv("LOGIN_HASHER_QUEUE_SIZE", 64))
+LOGIN_HASHER_TIMEOUT = float(os.getenv("LOGIN_HASHER_TIMEOUT", 5))
+LAST_LOGIN_UPDATE_INTERVAL = timedelta(
+    seconds=int(os.getenv("LAST_LOGIN_UPDATE_INTERVAL", 3600))
+)
+
 # Internationalization
 # https://docs.djangoproject.com/en/4.2/topics/i18n/
 
@@ -144,11 +230,52 @@ USE_TZ = True
 STATIC_URL = "static/"
 
 MEDIA_URL = "/media/"
+# CDN serving the media files, e.g. https://cdn.example.com/media/
+MEDIA_BASE_URL = os.getenv("MEDIA_BASE_URL", "")
 
 # MEDIA_ROOT = BASE_DIR / "media"
 
 MEDIA_ROOT = "/vol/web/media"
 
+STORAGES = {
+    # Files named by the hash of their content, stored once
+    "default": {"BACKEND": "airport.storage.ContentHashStorage"},
+    "staticfiles": {
+        "BACKEND": "django.contrib.staticfiles.storage.StaticFilesStorage",
+    },
+}
+# Media files are immutable, browsers and CDNs may keep them for a year
+MEDIA_CACHE_MAX_AGE = int(os.getenv("MEDIA_CACHE_MAX_AGE", 31536000))
+# "x-sendfile" or "x-accel-redirect" to let the web server send them
+MEDIA_OFFLOAD = os.getenv("MEDIA_OFFLOAD", "")
+MEDIA_ACCEL_REDIRECT_LOCATION = os.getenv(
+    "MEDIA_ACCEL_REDIRECT_LOCATION", "/protected-media/"
+)
+
+# Widths and formats of the resized copies of airplane images
+IMAGE_VARIANT_WIDTHS = [
+    int(width)
+    for width in os.getenv("IMAGE_VARIANT_WIDTHS", "160,640,1280").split(",")
+]
+IMAGE_VARIANT_FORMATS = os.getenv(
+    "IMAGE_VARIANT_FORMATS", "webp,jpeg"
+).split(",")
+IMAGE_VARIANT_QUALITY = int(os.getenv("IMAGE_VARIANT_QUALITY", 80))
+# Threads per process resizing images in the background
+IMAGE_WORKERS = int(os.getenv("IMAGE_WORKERS", 2))
+# Resize images in the request instead, once the upload is committed
+IMAGE_VARIANTS_INLINE = os.getenv("IMAGE_VARIANTS_INLINE", "False") == "True"
+
+# Store receiving presigned image uploads: "s3" or the "local" stand-in
+IMAGE_UPLOAD_BACKEND = os.getenv("IMAGE_UPLOAD_BACKEND", "local")
+IMAGE_UPLOAD_S3_BUCKET = os.getenv("IMAGE_UPLOAD_S3_BUCKET", "")
+IMAGE_UPLOAD_S3_ENDPOINT_URL = os.getenv("IMAGE_UPLOAD_S3_ENDPOINT_URL", "")
+IMAGE_UPLOAD_LOCAL_ROOT = os.getenv(
+    "IMAGE_UPLOAD_LOCAL_ROOT", "/vol/web/uploads"
+)
+IMAGE_UPLOAD_URL_EXPIRES = int(os.getenv("IMAGE_UPLOAD_URL_EXPIRES", 900))
+IMAGE_UPLOAD_MAX_SIZE = int(os.getenv("IMAGE_UPLOAD_MAX_SIZE", 10 * 2**20))
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/4.2/ref/settings/#default-auto-field
 
@@ -156,16 +283,28 @@ DEFAULT_AUTO_FIELD = "django.db.models.BigAutoField"
 
 REST_FRAMEWORK = {
     "DEFAULT_SCHEMA_CLASS": "drf_spectacular.openapi.AutoSchema",
+    "DEFAULT_RENDERER_CLASSES": (
+        "airport.renderers.ORJSONRenderer",
+        "rest_framework.renderers.BrowsableAPIRenderer",
+    ),
+    "DEFAULT_PARSER_CLASSES": (
+        "airport.parsers.ORJSONParser",
+        "rest_framework.parsers.FormParser",
+        "rest_framework.parsers.MultiPartParser",
+    ),
     "DEFAULT_THROTTLE_CLASSES": [
-        "rest_framework.throttling.AnonRateThrottle",
-        "rest_framework.throttling.UserRateThrottle",
+        "airport.throttling.AnonSlidingWindowThrottle",
+        "airport.throttling.UserSlidingWindowThrottle",
     ],
     "DEFAULT_THROTTLE_RATES": {"anon": "100/day", "user": "1000/day"},
     "DEFAULT_AUTHENTICATION_CLASSES": (
-        "rest_framework_simplejwt.authentication.JWTAuthentication",
+        "user.authentication.ClaimsJWTAuthentication",
     ),
 }
 
+# Extra throttle units tolerated on top of the rate of a scope
+THROTTLE_BURSTS = {"anon": 10, "user": 50}
+
 SPECTACULAR_SETTINGS = {
     "TITLE": "Airport Management API",
     "DESCRIPTION": "Order tickets for your flights",
@@ -183,7 +322,44 @@ SIMPLE_JWT = {
     "ACCESS_TOKEN_LIFETIME": timedelta(minutes=5),
     "REFRESH_TOKEN_LIFETIME": timedelta(days=1),
     "ROTATE_REFRESH_TOKENS": False,
+    "TOKEN_OBTAIN_SERIALIZER": (
+        "user.serializers.LoginSerializer"
+    ),
 }
 
+# Validated access tokens are reused for that long by a process
+JWT_CLAIMS_CACHE_SECONDS = int(os.getenv("JWT_CLAIMS_CACHE_SECONDS", 30))
+# Delay for a revoked token to be rejected by every process
+JWT_REVOCATION_REFRESH_SECONDS = int(
+    os.getenv("JWT_REVOCATION_REFRESH_SECONDS", 10)
+)
+
+IDEMPOTENCY_KEY_TTL = timedelta(hours=24)
+
+# Shortest time between two flights of an airplane or a crew member
+FLIGHT_MIN_TURNAROUND_MINUTES = int(
+    os.getenv("FLIGHT_MIN_TURNAROUND_MINUTES", 45)
+)
+# How far after a delayed flight its impact on the next ones is computed
+DELAY_PROPAGATION_HOURS = int(os.getenv("DELAY_PROPAGATION_HOURS", 72))
+
+# Duty limits of the crews by position, "default" for the others:
+# longest duty period, shortest rest ending one, flight hours a month
+CREW_DUTY_RULES = {
+    "default": {
+        "max_duty_hours": 13,
+        "min_rest_hours": 10,
+        "max_monthly_hours": 100,
+    },
+    "Flight Attendant": {
+        "max_duty_hours": 14,
+        "min_rest_hours": 10,
+        "max_monthly_hours": 110,
+    },
+}
+
+# Attempts to send a refund to Stripe before it's left to a manual refund
+REFUND_MAX_ATTEMPTS = int(os.getenv("REFUND_MAX_ATTEMPTS", 5))
+
 STRIPE_PUBLIC_KEY = os.getenv("STRIPE_PUBLIC_KEY")
 STRIPE_SECRET_KEY = os.getenv("STRIPE_SECRET_KEY")
@@ -14,3 +14,7 @@ from django.core.wsgi import get_wsgi_application
 os.environ.setdefault("DJANGO_SETTINGS_MODULE", "airport_service.settings")
 
 application = get_wsgi_application()
+
+from airport.checks import enforce_production_profile  # noqa: E402
+
+enforce_production_profile()
@@ -0,0 +1,34 @@
+"""
+Gunicorn configuration for the production profile.
+
+Serve WSGI with `gunicorn -c gunicorn.conf.py airport_service.wsgi` or
+ASGI by also setting GUNICORN_WORKER_CLASS=uvicorn.workers.UvicornWorker
+and using `airport_service.asgi`.
+"""
+import multiprocessing
+import os
+
+bind = os.getenv("GUNICORN_BIND", "0.0.0.0:8000")
+workers = int(
+    os.getenv("GUNICORN_WORKERS", multiprocessing.cpu_count() * 2 + 1)
+)
+worker_class = os.getenv("GUNICORN_WORKER_CLASS", "sync")
+threads = int(os.getenv("GUNICORN_THREADS", 1))
+
+# Import Django and the project once in the master, workers are forked
+# with the application already loaded
+preload_app = True
+
+timeout = int(os.getenv("GUNICORN_TIMEOUT", 30))
+keepalive = int(os.getenv("GUNICORN_KEEPALIVE", 5))
+max_requests = int(os.getenv("GUNICORN_MAX_REQUESTS", 2000))
+max_requests_jitter = int(os.getenv("GUNICORN_MAX_REQUESTS_JITTER", 200))
+
+accesslog = "-"
+
+
+def post_fork(server, worker):
+    """Never share database connections opened in the master"""
+    from django.db import connections
+
+    connections.close_all()
@@ -0,0 +1,191 @@
+"""
+JWT authentication without a user query.
+
+Access tokens issued by /api/user/token/ carry the claims the API needs
+(id, email, is_staff, full name), so the user is built from the token
+instead of being loaded from the database. Validated tokens are kept in a
+small per-process cache for JWT_CLAIMS_CACHE_SECONDS, which skips the
+signature check of a token seen a moment ago.
+
+Tokens issued before a user's `tokens_valid_after` (set when the
+password, is_staff or is_active change) are rejected, compared with the
+sub-second `issued_at` claim of the token as `iat` is truncated to the
+second. Those times are
+kept in memory as a dict of user id to timestamp, reloaded at most every
+JWT_REVOCATION_REFRESH_SECONDS and shared through the cache, so a
+revocation reaches every worker within that delay.
+"""
+import math
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.utils import timezone
+from django.utils.translation import gettext_lazy as _
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.settings import api_settings
+
+from user.models import ClaimsUser
+
+USER_CLAIMS = ("email", "is_staff", "full_name")
+
+REVOCATIONS_CACHE_KEY = "jwt-revocations"
+
+# Issue time of the token with its fraction of a second
+ISSUED_AT_CLAIM = "issued_at"
+
+
+def token_lifetime():
+    return max(
+        api_settings.ACCESS_TOKEN_LIFETIME,
+        api_settings.REFRESH_TOKEN_LIFETIME,
+    )
+
+
+def issued_before(token, timestamp):
+    """Whether the token may have been issued before the timestamp"""
+    if ISSUED_AT_CLAIM in token:
+        return token[ISSUED_AT_CLAIM] < timestamp
+
+    # Issued up to a second after its "iat"
+    return token.get("iat", 0) < math.ceil(timestamp)
+
+
+class RevocationList:
+    """Times before which the tokens of a user are no longer valid"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._revoked = {}
+        self._loaded_at = None
+
+    def _load(self):
+        revoked = cache.get(REVOCATIONS_CACHE_KEY)
+
+        if revoked is None:
+            since = timezone.now() - token_lifetime()
+            revoked = {
+                user_id: valid_after.timestamp()
+                for user_id, valid_after in get_user_model()
+                .objects.filter(tokens_valid_after__gt=since)
+                .values_list("id", "tokens_valid_after")
+            }
+            cache.set(
+                REVOCATIONS_CACHE_KEY,
+                revoked,
+                timeout=settings.JWT_REVOCATION_REFRESH_SECONDS,
+            )
+
+        return revoked
+
+    def revoked_before(self, user_id):
+        now = time.monotonic()
+        refresh = settings.JWT_REVOCATION_REFRESH_SECONDS
+
+        with self._lock:
+            if self._loaded_at is None or now - self._loaded_at >= refresh:
+                self._revoked = self._load()
+                self._loaded_at = now
+
+            return self._revoked.get(user_id)
+
+    def invalidate(self):
+        cache.delete(REVOCATIONS_CACHE_KEY)
+
+        with self._lock:
+            self._loaded_at = None
+
+
+revocations = RevocationList()
+
+
+class ClaimsCache:
+    """Bounded cache of validated tokens, kept for a few seconds"""
+
+    def __init__(self, max_size=10_000):
+        self.max_size = max_size
+        self._lock = threading.Lock()
+        self._tokens = OrderedDict()
+
+    def get(self, raw_token):
+        now = time.monotonic()
+
+        with self._lock:
+            entry = self._tokens.get(raw_token)
+
+            if entry is None:
+                return None
+
+            cached_at, token = entry
+
+            if now - cached_at >= settings.JWT_CLAIMS_CACHE_SECONDS:
+                del self._tokens[raw_token]
+                return None
+
+            return token
+
+    def set(self, raw_token, token):
+        with self._lock:
+            self._tokens[raw_token] = (time.monotonic(), token)
+            self._tokens.move_to_end(raw_token)
+
+            while len(self._tokens) > self.max_size:
+                self._tokens.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._tokens.clear()
+
+
+claims_cache = ClaimsCache()
+
+
+class ClaimsJWTAuthentication(JWTAuthentication):
+    """
+    JWTAuthentication building the user from the token claims.
+    Tokens without the claims fall back to loading the user.
+    """
+
+    def get_validated_token(self, raw_token):
+        token = claims_cache.get(raw_token)
+
+        # The token may have expired since it was cached
+        if token is not None and token["exp"] > time.time():
+            return token
+
+        token = super().get_validated_token(raw_token)
+        claims_cache.set(raw_token, token)
+
+        return token
+
+    def get_user(self, validated_token):
+        try:
+            user_id = validated_token[api_settings.USER_ID_CLAIM]
+        except KeyError:
+            return super().get_user(validated_token)
+
+        revoked_before = revocations.revoked_before(user_id)
+
+        if revoked_before is not None and issued_before(
+            validated_token, revoked_before
+        ):
+            raise AuthenticationFailed(
+                _("Token has been revoked"), code="token_revoked"
+            )
+
+        if any(claim not in validated_token for claim in USER_CLAIMS):
+            return super().get_user(validated_token)
+
+        user = ClaimsUser(
+            id=user_id,
+            email=validated_token["email"],
+            is_staff=validated_token["is_staff"],
+            full_name=validated_token["full_name"],
+        )
+        user._state.adding = False
+
+        return user
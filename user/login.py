@@ -0,0 +1,141 @@
+"""
+Credential checks of /api/user/token/.
+
+Password hashes are computed in a thread pool of LOGIN_HASHER_WORKERS
+per process (the PBKDF2 and Argon2 hashers release the GIL), so a burst
+of logins can't take every CPU away from other requests. Logins waiting
+for a free hasher beyond LOGIN_HASHER_QUEUE_SIZE, or longer than
+LOGIN_HASHER_TIMEOUT seconds, are answered with 503.
+
+A hash made by an older hasher is replaced on login by one of the
+preferred hasher. last_login is only written with simplejwt's
+UPDATE_LAST_LOGIN (off by default), then at most once per
+LAST_LOGIN_UPDATE_INTERVAL.
+"""
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import check_password, make_password
+from django.db.models import Q
+from django.utils import timezone
+from django.utils.translation import gettext_lazy as _
+from rest_framework import status
+from rest_framework.exceptions import APIException
+
+LOGIN_FIELDS = (
+    "id",
+    "email",
+    "password",
+    "first_name",
+    "last_name",
+    "is_staff",
+    "is_active",
+    "last_login",
+)
+
+
+class LoginBusy(APIException):
+    status_code = status.HTTP_503_SERVICE_UNAVAILABLE
+    default_detail = _("Too many logins in progress, try again later.")
+    default_code = "login_busy"
+
+
+class HasherPool:
+    """Thread pool with a bounded number of waiting password checks"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._pid = None
+        self._executor = None
+        self._slots = None
+
+    def _ensure(self):
+        # Threads don't survive a fork, each worker process needs its own
+        with self._lock:
+            if self._pid != os.getpid():
+                workers = settings.LOGIN_HASHER_WORKERS
+                self._executor = ThreadPoolExecutor(
+                    max_workers=workers, thread_name_prefix="login-hasher"
+                )
+                self._slots = threading.BoundedSemaphore(
+                    workers + settings.LOGIN_HASHER_QUEUE_SIZE
+                )
+                self._pid = os.getpid()
+
+            return self._executor, self._slots
+
+    def run(self, func, *args):
+        executor, slots = self._ensure()
+
+        if not slots.acquire(timeout=settings.LOGIN_HASHER_TIMEOUT):
+            raise LoginBusy()
+
+        try:
+            return executor.submit(func, *args).result()
+        finally:
+            slots.release()
+
+    def shutdown(self):
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=False)
+            self._pid = self._executor = self._slots = None
+
+
+hasher_pool = HasherPool()
+
+
+def _check(raw_password, encoded):
+    if encoded is None:
+        # Unknown user: spend the time a known one would take
+        make_password(raw_password)
+        return False, None
+
+    rehashed = []
+    valid = check_password(raw_password, encoded, setter=rehashed.append)
+
+    return valid, make_password(rehashed[0]) if rehashed else None
+
+
+def authenticate_credentials(username, raw_password):
+    """Return the user with these credentials or None"""
+    user_model = get_user_model()
+    user = (
+        user_model.objects.only(*LOGIN_FIELDS)
+        .filter(**{user_model.USERNAME_FIELD: username})
+        .first()
+    )
+
+    valid, new_password = hasher_pool.run(
+        _check, raw_password, user.password if user else None
+    )
+
+    if not valid:
+        return None
+
+    if new_password is not None:
+        # Not a password change, the user's tokens stay valid
+        user_model.objects.filter(pk=user.pk, password=user.password).update(
+            password=new_password
+        )
+        user.password = new_password
+
+    return user
+
+
+def record_login(user):
+    """Update last_login unless it was updated recently"""
+    now = timezone.now()
+    updated_before = now - settings.LAST_LOGIN_UPDATE_INTERVAL
+
+    if user.last_login is not None and user.last_login > updated_before:
+        return
+
+    get_user_model().objects.filter(
+        Q(last_login__isnull=True) | Q(last_login__lte=updated_before),
+        pk=user.pk,
+    ).update(last_login=now)
+    user.last_login = now
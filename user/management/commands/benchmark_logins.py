@@ -0,0 +1,126 @@
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from unittest import mock
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import get_hasher
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+from django.test import Client, override_settings
+from django.urls import reverse
+from rest_framework_simplejwt.views import TokenObtainPairView
+
+from user.login import hasher_pool
+
+BENCHMARK_PASSWORD = "benchmark-password"
+
+
+def available_cores():
+    if hasattr(os, "sched_getaffinity"):
+        return len(os.sched_getaffinity(0))
+
+    return os.cpu_count() or 1
+
+
+class Command(BaseCommand):
+    """
+    Django command to measure the logins per second
+    /api/user/token/ handles, in total and per CPU core
+    """
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--requests",
+            type=int,
+            default=200,
+            help="Number of logins to send",
+        )
+        parser.add_argument(
+            "--concurrency",
+            type=int,
+            default=20,
+            help="Number of logins in flight at the same time",
+        )
+        parser.add_argument(
+            "--users",
+            type=int,
+            default=20,
+            help="Number of benchmark users logging in",
+        )
+        parser.add_argument(
+            "--workers",
+            type=int,
+            default=None,
+            help="Size of the hasher pool (LOGIN_HASHER_WORKERS)",
+        )
+
+    def create_users(self, count):
+        user_model = get_user_model()
+        emails = [f"benchmark-{i}@example.com" for i in range(count)]
+        existing = set(
+            user_model.objects.filter(email__in=emails).values_list(
+                "email", flat=True
+            )
+        )
+
+        for email in emails:
+            if email not in existing:
+                user_model.objects.create_user(
+                    email=email,
+                    username=email,
+                    password=BENCHMARK_PASSWORD,
+                )
+
+        return emails
+
+    def handle(self, *args, **options):
+        workers = options["workers"] or settings.LOGIN_HASHER_WORKERS
+        emails = self.create_users(options["users"])
+        url = reverse("user:token_obtain_pair")
+        client = Client()
+
+        def login(i):
+            response = client.post(
+                url,
+                {
+                    "email": emails[i % len(emails)],
+                    "password": BENCHMARK_PASSWORD,
+                },
+            )
+            close_old_connections()
+            return response.status_code
+
+        cores = available_cores()
+        self.stdout.write(
+            f"{options['requests']} logins with {get_hasher().algorithm}, "
+            f"{workers} hasher workers, "
+            f"concurrency {options['concurrency']}, {cores} cores"
+        )
+
+        # Throttling would turn most of the logins into 429s
+        with override_settings(
+            ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, "testserver"],
+            LOGIN_HASHER_WORKERS=workers,
+        ), mock.patch.object(TokenObtainPairView, "throttle_classes", ()):
+            hasher_pool.shutdown()
+            started = time.perf_counter()
+
+            with ThreadPoolExecutor(
+                max_workers=options["concurrency"]
+            ) as executor:
+                statuses = list(
+                    executor.map(login, range(options["requests"]))
+                )
+
+            elapsed = time.perf_counter() - started
+            hasher_pool.shutdown()
+
+        failed = sum(1 for code in statuses if code != 200)
+        rate = len(statuses) / elapsed
+        self.stdout.write(
+            f"{rate:10.1f} logins/s {rate / cores:10.1f} logins/s per core "
+            f"{elapsed * 1000 / len(statuses):8.2f} ms/login "
+            f"({failed} failed)"
+        )
@@ -0,0 +1,31 @@
+# Generated by Django 4.2.3 on 2026-10-19 01:43
+
+from django.db import migrations, models
+import user.models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("user", "0003_alter_user_managers_alter_user_email"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="ClaimsUser",
+            fields=[],
+            options={
+                "proxy": True,
+                "indexes": [],
+                "constraints": [],
+            },
+            bases=("user.user",),
+            managers=[
+                ("objects", user.models.UserManager()),
+            ],
+        ),
+        migrations.AddField(
+            model_name="user",
+            name="tokens_valid_after",
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+    ]
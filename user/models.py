@@ -1,5 +1,6 @@
 from django.contrib.auth.models import AbstractUser, BaseUserManager
-from django.db import models
+from django.db import models, transaction
+from django.utils import timezone
 from django.utils.translation import gettext as _
 
 
@@ -39,9 +40,12 @@ class UserManager(BaseUserManager):
 
 class User(AbstractUser):
     email = models.EmailField(_("email address"), unique=True)
+    tokens_valid_after = models.DateTimeField(null=True, blank=True)
 
     USERNAME_FIELD = "email"
     REQUIRED_FIELDS = []
+    # Changing any of them revokes the tokens issued before
+    TOKEN_REVOKING_FIELDS = ("password", "is_staff", "is_active")
     objects = UserManager()
 
     def __str__(self):
@@ -50,3 +54,56 @@ class User(AbstractUser):
     @property
     def full_name(self):
         return f"{self.first_name} {self.last_name}"
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        user = super().from_db(db, field_names, values)
+        user._loaded_token_state = user._token_state()
+        return user
+
+    def _token_state(self):
+        return tuple(
+            self.__dict__.get(field) for field in self.TOKEN_REVOKING_FIELDS
+        )
+
+    def save(self, *args, **kwargs):
+        loaded_state = getattr(self, "_loaded_token_state", None)
+
+        if loaded_state is not None and loaded_state != self._token_state():
+            from user.authentication import revocations
+
+            self.tokens_valid_after = timezone.now()
+            transaction.on_commit(revocations.invalidate)
+            update_fields = kwargs.get("update_fields")
+
+            if update_fields is not None:
+                kwargs["update_fields"] = {
+                    *update_fields, "tokens_valid_after"
+                }
+
+        super().save(*args, **kwargs)
+        self._loaded_token_state = self._token_state()
+
+
+class ClaimsUser(User):
+    """
+    User built from the claims of an access token, without a query.
+    Only the fields carried by the token are set, so it can't be saved.
+    """
+
+    class Meta:
+        proxy = True
+
+    def __init__(self, *args, full_name="", **kwargs):
+        super().__init__(*args, **kwargs)
+        self._full_name = full_name
+
+    @property
+    def full_name(self):
+        return self._full_name
+
+    def save(self, *args, **kwargs):
+        raise TypeError("A user built from token claims can't be saved")
+
+    def delete(self, *args, **kwargs):
+        raise TypeError("A user built from token claims can't be deleted")
@@ -1,5 +1,10 @@
 from django.contrib.auth import get_user_model
-from rest_framework import serializers
+from rest_framework import serializers, exceptions
+from rest_framework_simplejwt.serializers import TokenObtainPairSerializer
+from rest_framework_simplejwt.settings import api_settings
+
+from user.authentication import ISSUED_AT_CLAIM
+from user.login import authenticate_credentials, record_login
 
 
 class UserSerializer(serializers.ModelSerializer):
@@ -30,3 +35,38 @@ class UserSerializer(serializers.ModelSerializer):
             user.save()
 
         return user
+
+
+class ClaimsTokenObtainPairSerializer(TokenObtainPairSerializer):
+    """Token pair carrying the claims the API authenticates with"""
+
+    @classmethod
+    def get_token(cls, user):
+        token = super().get_token(user)
+        token["email"] = user.email
+        token["is_staff"] = user.is_staff
+        token["full_name"] = user.full_name
+        token[ISSUED_AT_CLAIM] = token.current_time.timestamp()
+
+        return token
+
+
+class LoginSerializer(ClaimsTokenObtainPairSerializer):
+    """Token pair for the credentials, checked in the hasher pool"""
+
+    def validate(self, attrs):
+        self.user = authenticate_credentials(
+            attrs[self.username_field], attrs["password"]
+        )
+
+        if not api_settings.USER_AUTHENTICATION_RULE(self.user):
+            raise exceptions.AuthenticationFailed(
+                self.error_messages["no_active_account"],
+                "no_active_account",
+            )
+
+        if api_settings.UPDATE_LAST_LOGIN:
+            record_login(self.user)
+        refresh = self.get_token(self.user)
+
+        return {"refresh": str(refresh), "access": str(refresh.access_token)}
@@ -0,0 +1,195 @@
+from datetime import datetime, timedelta, timezone
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APIClient, APIRequestFactory
+from rest_framework_simplejwt.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.tokens import AccessToken
+from rest_framework_simplejwt.utils import aware_utcnow
+
+from user.authentication import (
+    ClaimsJWTAuthentication,
+    claims_cache,
+    revocations,
+)
+from user.models import ClaimsUser
+
+TOKEN_URL = reverse("user:token_obtain_pair")
+TOKEN_REFRESH_URL = reverse("user:token_refresh")
+ME_URL = reverse("user:manage")
+ORDER_URL = reverse("airport:order-list")
+
+User = get_user_model()
+
+
+@override_settings(JWT_REVOCATION_REFRESH_SECONDS=60)
+class ClaimsJWTAuthenticationTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        claims_cache.clear()
+        revocations.invalidate()
+        self.client = APIClient()
+        self.user = User.objects.create_user(
+            email="test@test.com",
+            password="testpass",
+            first_name="John",
+            last_name="Doe",
+        )
+
+    def obtain_tokens(self, password="testpass", issued_ago=0, issued_at=None):
+        # Tokens hold their issue time in whole seconds
+        if issued_at is None:
+            issued_at = aware_utcnow() - timedelta(seconds=issued_ago)
+
+        with mock.patch(
+            "rest_framework_simplejwt.tokens.aware_utcnow",
+            return_value=issued_at,
+        ):
+            response = self.client.post(
+                TOKEN_URL, {"email": "test@test.com", "password": password}
+            )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        return response.data
+
+    def authenticate(self, access):
+        request = APIRequestFactory().get(
+            ORDER_URL, HTTP_AUTHORIZATION=f"Bearer {access}"
+        )
+
+        return ClaimsJWTAuthentication().authenticate(request)
+
+    def test_access_token_carries_claims(self):
+        token = AccessToken(self.obtain_tokens()["access"])
+
+        self.assertEqual(token["email"], "test@test.com")
+        self.assertFalse(token["is_staff"])
+        self.assertEqual(token["full_name"], "John Doe")
+
+    def test_user_built_from_claims_without_queries(self):
+        access = self.obtain_tokens()["access"]
+        self.authenticate(access)
+
+        with self.assertNumQueries(0):
+            user, _ = self.authenticate(access)
+
+        self.assertIsInstance(user, ClaimsUser)
+        self.assertEqual(user.pk, self.user.pk)
+        self.assertEqual(user.full_name, "John Doe")
+        self.assertFalse(user.is_staff)
+        self.assertTrue(user.is_authenticated)
+
+    def test_user_from_claims_can_not_be_saved(self):
+        user, _ = self.authenticate(self.obtain_tokens()["access"])
+
+        with self.assertRaises(TypeError):
+            user.save()
+
+    def test_orders_listed_with_claims_user(self):
+        access = self.obtain_tokens()["access"]
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {access}")
+
+        response = self.client.get(ORDER_URL)
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_token_without_claims_loads_user(self):
+        access = str(AccessToken.for_user(self.user))
+
+        user, _ = self.authenticate(access)
+
+        self.assertNotIsInstance(user, ClaimsUser)
+        self.assertEqual(user.pk, self.user.pk)
+
+    def test_password_change_revokes_tokens(self):
+        tokens = self.obtain_tokens(issued_ago=5)
+        self.authenticate(tokens["access"])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user.set_password("newpass")
+            self.user.save()
+
+        with self.assertRaises(AuthenticationFailed):
+            self.authenticate(tokens["access"])
+
+        refreshed = self.client.post(
+            TOKEN_REFRESH_URL, {"refresh": tokens["refresh"]}
+        ).data["access"]
+
+        with self.assertRaises(AuthenticationFailed):
+            self.authenticate(refreshed)
+
+        user, _ = self.authenticate(self.obtain_tokens("newpass")["access"])
+
+        self.assertEqual(user.pk, self.user.pk)
+
+    def revoke_tokens_at(self, valid_after):
+        User.objects.filter(pk=self.user.pk).update(
+            tokens_valid_after=valid_after
+        )
+        revocations.invalidate()
+
+    def test_revocation_in_same_second_as_issue(self):
+        second = aware_utcnow().replace(microsecond=0)
+        before = self.obtain_tokens(
+            issued_at=second + timedelta(milliseconds=200)
+        )["access"]
+        after = self.obtain_tokens(
+            issued_at=second + timedelta(milliseconds=700)
+        )["access"]
+
+        self.revoke_tokens_at(second + timedelta(milliseconds=500))
+
+        with self.assertRaises(AuthenticationFailed):
+            self.authenticate(before)
+
+        user, _ = self.authenticate(after)
+
+        self.assertEqual(user.pk, self.user.pk)
+
+    def test_token_without_issued_at_revoked_in_same_second(self):
+        token = AccessToken.for_user(self.user)
+        issued_at = token["iat"]
+
+        self.revoke_tokens_at(
+            datetime.fromtimestamp(issued_at + 0.5, tz=timezone.utc)
+        )
+
+        with self.assertRaises(AuthenticationFailed):
+            self.authenticate(str(token))
+
+    def test_staff_change_revokes_tokens(self):
+        access = self.obtain_tokens(issued_ago=5)["access"]
+
+        with self.captureOnCommitCallbacks(execute=True):
+            user = User.objects.get(pk=self.user.pk)
+            user.is_staff = True
+            user.save()
+
+        with self.assertRaises(AuthenticationFailed):
+            self.authenticate(access)
+
+    def test_name_change_keeps_tokens(self):
+        access = self.obtain_tokens(issued_ago=5)["access"]
+
+        with self.captureOnCommitCallbacks(execute=True):
+            user = User.objects.get(pk=self.user.pk)
+            user.first_name = "Jane"
+            user.save()
+
+        user, _ = self.authenticate(access)
+
+        self.assertEqual(user.pk, self.user.pk)
+
+    def test_manage_user_view_reads_user_from_database(self):
+        access = self.obtain_tokens()["access"]
+        User.objects.filter(pk=self.user.pk).update(first_name="Jane")
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {access}")
+
+        response = self.client.get(ME_URL)
+
+        self.assertEqual(response.data["first_name"], "Jane")
@@ -0,0 +1,142 @@
+from datetime import timedelta
+
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.settings import api_settings
+
+from user.login import hasher_pool
+
+TOKEN_URL = reverse("user:token_obtain_pair")
+
+User = get_user_model()
+
+update_last_login = mock.patch.object(
+    api_settings, "UPDATE_LAST_LOGIN", True
+)
+
+
+class LoginTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        hasher_pool.shutdown()
+        self.client = APIClient()
+        self.user = User.objects.create_user(
+            email="test@test.com", password="testpass"
+        )
+
+    def tearDown(self):
+        hasher_pool.shutdown()
+
+    def login(self, email="test@test.com", password="testpass"):
+        return self.client.post(
+            TOKEN_URL, {"email": email, "password": password}
+        )
+
+    def test_login_returns_token_pair(self):
+        response = self.login()
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertIn("access", response.data)
+        self.assertIn("refresh", response.data)
+
+    def test_login_with_wrong_password(self):
+        response = self.login(password="wrongpass")
+
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_login_of_unknown_user(self):
+        response = self.login(email="unknown@test.com")
+
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_login_of_inactive_user(self):
+        User.objects.filter(pk=self.user.pk).update(is_active=False)
+
+        response = self.login()
+
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_last_login_is_not_written_by_default(self):
+        self.login()
+        self.user.refresh_from_db()
+
+        self.assertIsNone(self.user.last_login)
+
+    @update_last_login
+    def test_first_login_sets_last_login(self):
+        self.login()
+        self.user.refresh_from_db()
+
+        self.assertIsNotNone(self.user.last_login)
+
+    @update_last_login
+    def test_recent_last_login_is_not_updated(self):
+        last_login = timezone.now() - timedelta(minutes=5)
+        User.objects.filter(pk=self.user.pk).update(last_login=last_login)
+
+        self.login()
+        self.user.refresh_from_db()
+
+        self.assertEqual(self.user.last_login, last_login)
+
+    @update_last_login
+    def test_old_last_login_is_updated(self):
+        last_login = timezone.now() - timedelta(days=1)
+        User.objects.filter(pk=self.user.pk).update(last_login=last_login)
+
+        self.login()
+        self.user.refresh_from_db()
+
+        self.assertGreater(self.user.last_login, last_login)
+
+    def test_old_hash_is_replaced_on_login(self):
+        User.objects.filter(pk=self.user.pk).update(
+            password=make_password("testpass", hasher="pbkdf2_sha1")
+        )
+
+        response = self.login()
+        self.user.refresh_from_db()
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(self.user.password.startswith("pbkdf2_sha256$"))
+        self.assertIsNone(self.user.tokens_valid_after)
+        self.assertEqual(self.login().status_code, status.HTTP_200_OK)
+
+    @override_settings(
+        PASSWORD_HASHERS=[
+            "django.contrib.auth.hashers.Argon2PasswordHasher",
+            "django.contrib.auth.hashers.PBKDF2PasswordHasher",
+        ]
+    )
+    def test_login_moves_hash_to_preferred_hasher(self):
+        self.login()
+        self.user.refresh_from_db()
+
+        self.assertTrue(self.user.password.startswith("argon2"))
+
+    @override_settings(
+        LOGIN_HASHER_WORKERS=1,
+        LOGIN_HASHER_QUEUE_SIZE=0,
+        LOGIN_HASHER_TIMEOUT=0.01,
+    )
+    def test_login_rejected_when_hashers_are_busy(self):
+        _, slots = hasher_pool._ensure()
+        slots.acquire()
+
+        try:
+            response = self.login()
+        finally:
+            slots.release()
+
+        self.assertEqual(
+            response.status_code, status.HTTP_503_SERVICE_UNAVAILABLE
+        )
+        self.assertEqual(self.login().status_code, status.HTTP_200_OK)